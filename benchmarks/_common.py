@@ -0,0 +1,79 @@
+"""Helpers shared by the Lambda benchmarks.
+
+Benchmarks run against the vendored dependencies in ``lambda_function/`` with
+fake credentials, and answer SageMaker calls from a ``before-send`` hook so
+that serialization, signing and parsing run for real without any network.
+"""
+import io
+import os
+import statistics
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda_function")
+
+
+def setup_environment():
+    """Put the Lambda package first on sys.path and set fake AWS settings."""
+    if LAMBDA_DIR not in sys.path:
+        sys.path.insert(0, LAMBDA_DIR)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "AKIDBENCHMARK")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark-secret")
+    os.environ.setdefault("AWS_REGION", "us-east-2")
+    os.environ.setdefault("SAGEMAKER_ENDPOINT_NAME", "bench-endpoint")
+
+
+class FakeRawResponse(io.BytesIO):
+    """Minimal urllib3-like response body understood by botocore."""
+
+    def stream(self, **kwargs):
+        while True:
+            chunk = self.read(8192)
+            if not chunk:
+                break
+            yield chunk
+
+
+def canned_response(body=b'{"result": "ok"}', status_code=200, headers=None):
+    """Return a before-send handler that answers every request with ``body``."""
+    from botocore.awsrequest import AWSResponse
+
+    def handler(request, **kwargs):
+        response_headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+        response_headers.update(headers or {})
+        return AWSResponse(request.url, status_code, response_headers, FakeRawResponse(body))
+
+    return handler
+
+
+def install_canned_response(body=b'{"result": "ok"}', **kwargs):
+    """Register a canned response on boto3's default session.
+
+    Clients copy the session's event handlers when they are created, so this
+    must run before the first client is built.
+    """
+    import boto3
+
+    handler = canned_response(body, **kwargs)
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register("before-send.sagemaker-runtime", handler)
+    return handler
+
+
+def summarize(samples_seconds):
+    """Return p50/p99/mean in milliseconds for a list of durations."""
+    ms = sorted(s * 1000.0 for s in samples_seconds)
+    quantiles = statistics.quantiles(ms, n=100, method="inclusive")
+    return {
+        "count": len(ms),
+        "p50_ms": round(quantiles[49], 4),
+        "p99_ms": round(quantiles[98], 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+    }
+
+
+def print_table(rows, columns):
+    """Print dict rows as a fixed-width table."""
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
@@ -0,0 +1,52 @@
+"""Warm-invocation latency with and without the client registry.
+
+"before" clears the registry ahead of every call, reproducing the old
+behaviour of building a ``sagemaker-runtime`` client per invocation.
+"after" keeps the client cached as the handler now does on a warm container.
+
+    python benchmarks/bench_client_reuse.py --iterations 500
+"""
+import argparse
+import json
+import time
+
+from _common import install_canned_response, print_table, setup_environment, summarize
+
+setup_environment()
+
+import clients  # noqa: E402
+import lambda_function  # noqa: E402
+
+
+def run(iterations, rebuild_client):
+    event = {"body": json.dumps({"features": list(range(32))})}
+    clients.reset_clients()
+    lambda_function.lambda_handler(event, None)
+    samples = []
+    for _ in range(iterations):
+        if rebuild_client:
+            clients.reset_clients()
+        start = time.perf_counter()
+        response = lambda_function.lambda_handler(event, None)
+        samples.append(time.perf_counter() - start)
+        assert response["statusCode"] == 200, response
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    install_canned_response()
+    lambda_function.logger.setLevel("WARNING")
+    rows = []
+    for label, rebuild in (("before (client per call)", True), ("after (cached client)", False)):
+        row = summarize(run(args.iterations, rebuild))
+        row["mode"] = label
+        rows.append(row)
+    print_table(rows, ["mode", "count", "p50_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    main()
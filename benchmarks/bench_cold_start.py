@@ -0,0 +1,235 @@
+"""Cold start of the Lambda package: import, first invocation and peak RSS.
+
+Every sample is a fresh interpreter started with ``-X importtime`` that
+imports ``lambda_function`` and runs one invocation against the local
+SageMaker stub (``sagemaker_stub.py``), so the first client creation,
+credential lookup, signing and HTTP connection are all included. Two
+package layouts are measured:
+
+- ``vendored``: ``lambda_function/`` as deployed, with its own boto3,
+  botocore, urllib3, dateutil, six, jmespath and s3transfer;
+- ``site-packages``: only the handler's own modules, so the dependencies
+  come from the interpreter's site-packages, as with the boto3 bundled in
+  the Lambda runtime. Skipped when boto3 is not installed there.
+
+One discarded run per layout writes the ``.pyc`` caches first, so the
+samples measure a deployed package rather than the bytecode compiler.
+
+The ``-X importtime`` lines are ranked into the slowest modules of the
+tracked packages (median self time across runs). Results are written as
+JSON; ``--compare`` prints the change against an earlier file and
+``--fail-over`` exits non-zero when cold start or peak RSS regressed by
+more than the given percentage, for CI.
+
+    python benchmarks/bench_cold_start.py --runs 10 --output cold-start.json
+    python benchmarks/bench_cold_start.py --compare main.json --fail-over 10
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from _common import LAMBDA_DIR, print_table, setup_environment
+
+setup_environment()
+
+from sagemaker_stub import start_server  # noqa: E402
+
+VENDORED = ("boto3", "botocore", "s3transfer", "urllib3", "dateutil", "jmespath", "six")
+TRACKED = ("botocore", "boto3", "urllib3", "dateutil", "six")
+METRICS = ("process_ms", "import_ms", "first_invoke_ms", "peak_rss_mb")
+
+PROBE = """
+import json, resource, time
+start = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+response = lambda_function.lambda_handler({"body": '{"features": [1, 2, 3]}'}, None)
+invoked = time.perf_counter()
+assert response["statusCode"] == 200, response
+import botocore
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_invoke_ms": (invoked - imported) * 1000,
+    # ru_maxrss is in KiB on Linux
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "botocore": botocore.__file__,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) != 3 or not parts[0].isdigit():
+            continue
+        modules[parts[2]] = (int(parts[0]), int(parts[1]))
+    return modules
+
+
+def handler_only_package(destination):
+    """Copy the handler's own modules, leaving the vendored packages behind."""
+    os.makedirs(destination)
+    for name in os.listdir(LAMBDA_DIR):
+        if name.endswith(".py") and name[:-3] not in VENDORED:
+            shutil.copy2(os.path.join(LAMBDA_DIR, name), destination)
+    return destination
+
+
+def site_packages_has_boto3():
+    proc = subprocess.run(
+        [sys.executable, "-c", "import boto3"],
+        cwd=tempfile.gettempdir(), env=_env(None), capture_output=True,
+    )
+    return proc.returncode == 0
+
+
+def _env(endpoint_url):
+    env = dict(os.environ)
+    for name in ("PYTHONPATH", "BOTOCORE_MODEL_BUNDLE", "INFERENCE_METRICS_ENABLED"):
+        env.pop(name, None)
+    if endpoint_url:
+        env["SAGEMAKER_RUNTIME_ENDPOINT_URL"] = endpoint_url
+    return env
+
+
+def sample(package_dir, endpoint_url):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=package_dir, env=_env(endpoint_url), capture_output=True, text=True,
+    )
+    process_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"Cold-start probe failed in {package_dir}:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = process_ms
+    result["modules"] = parse_importtime(proc.stderr)
+    return result
+
+
+def summarize_mode(samples, packages, top):
+    summary = {m: round(statistics.median(s[m] for s in samples), 2) for m in METRICS}
+    summary["botocore"] = samples[0]["botocore"]
+
+    per_module = defaultdict(list)
+    for s in samples:
+        for module, timings in s["modules"].items():
+            if module.split(".")[0] in packages:
+                per_module[module].append(timings)
+    ranked = []
+    for module, timings in per_module.items():
+        ranked.append({
+            "module": module,
+            "self_ms": round(statistics.median(t[0] for t in timings) / 1000, 2),
+            "cumulative_ms": round(statistics.median(t[1] for t in timings) / 1000, 2),
+        })
+    ranked.sort(key=lambda r: r["self_ms"], reverse=True)
+    package_ms = defaultdict(float)
+    for row in ranked:
+        package_ms[row["module"].split(".")[0]] += row["self_ms"]
+    summary["package_self_ms"] = {p: round(package_ms.get(p, 0.0), 2) for p in packages}
+    summary["slowest_modules"] = ranked[:top]
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=LAMBDA_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, fail_over):
+    """Print metric deltas against ``baseline``; return the regressions."""
+    rows, regressions = [], []
+    for mode, result in current["modes"].items():
+        base = baseline.get("modes", {}).get(mode)
+        if not base or "skipped" in base or "skipped" in result:
+            continue
+        for metric in METRICS:
+            before, after = base[metric], result[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            rows.append({"mode": mode, "metric": metric, "baseline": before, "current": after,
+                         "change_pct": round(change, 1)})
+            if fail_over is not None and metric in ("process_ms", "peak_rss_mb") and change > fail_over:
+                regressions.append(f"{mode} {metric} +{change:.1f}%")
+    print(f"Compared with {baseline.get('commit') or 'baseline'}")
+    print_table(rows, ["mode", "metric", "baseline", "current", "change_pct"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to report per layout")
+    parser.add_argument("--packages", default=",".join(TRACKED), help="comma-separated packages to rank")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON from an earlier run")
+    parser.add_argument("--fail-over", type=float, default=None,
+                        help="exit 1 if process_ms or peak_rss_mb regressed by more than this percentage")
+    args = parser.parse_args()
+    packages = tuple(p.strip() for p in args.packages.split(",") if p.strip())
+
+    server, endpoint_url = start_server()
+    results = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "commit": git_commit(),
+        "runs": args.runs,
+        "modes": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        layouts = [("vendored", LAMBDA_DIR)]
+        if site_packages_has_boto3():
+            layouts.append(("site-packages", handler_only_package(os.path.join(tmp, "handler"))))
+        for mode, package_dir in layouts:
+            sample(package_dir, endpoint_url)
+            samples = [sample(package_dir, endpoint_url) for _ in range(args.runs)]
+            results["modes"][mode] = summarize_mode(samples, packages, args.top)
+        if len(layouts) == 1:
+            results["modes"]["site-packages"] = {"skipped": "boto3 is not installed in site-packages"}
+    server.shutdown()
+    server.server_close()
+
+    rows = []
+    for mode, result in results["modes"].items():
+        row = {"mode": mode}
+        row.update(result if "skipped" not in result else {"process_ms": f"skipped: {result['skipped']}"})
+        rows.append(row)
+    print(f"Cold start, median of {args.runs} fresh interpreters")
+    print_table(rows, ["mode", *METRICS])
+    for mode, result in results["modes"].items():
+        if "skipped" in result:
+            continue
+        print()
+        print(f"Slowest imports ({mode}): " + ", ".join(f"{p} {ms} ms" for p, ms in result["package_self_ms"].items()))
+        print_table(result["slowest_modules"], ["module", "self_ms", "cumulative_ms"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(baseline, results, args.fail_over)
+        if regressions:
+            print(f"Cold-start regression over {args.fail_over}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
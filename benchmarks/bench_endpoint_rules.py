@@ -0,0 +1,114 @@
+"""Endpoint resolution with botocore's interpreted rulesets vs. compiled ones.
+
+"cold" builds a provider and resolves one endpoint, as a new process does
+for its first client: botocore's ``EndpointProvider`` (building the rule
+tree) against ``endpoint_rules.CompiledEndpointProvider`` loading the
+code a model bundle ships next to the ruleset. "varied" resolves distinct
+parameter sets (S3 buckets, ``Endpoint`` overrides) so that every one
+misses the provider's result cache. "compile" is the one-off cost of
+compiling a ruleset that is in no cache.
+
+    python benchmarks/bench_endpoint_rules.py --iterations 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from _common import print_table, setup_environment
+
+setup_environment()
+
+from botocore.endpoint_provider import EndpointProvider  # noqa: E402
+from botocore.loaders import Loader  # noqa: E402
+
+import endpoint_rules  # noqa: E402
+import model_bundle  # noqa: E402
+
+SERVICES = ("sagemaker-runtime", "sts", "s3")
+
+
+def varied_params(service, i):
+    if service == "s3":
+        return {"Region": "us-west-2", "Bucket": f"bucket-{i}", "UseArnRegion": bool(i % 2)}
+    return {"Region": "us-east-2", "Endpoint": f"https://host-{i}.example.com"}
+
+
+def first_params(service):
+    if service == "s3":
+        return {"Region": "us-east-2", "Bucket": "bench-bucket"}
+    return {"Region": "us-east-2"}
+
+
+def bench_cold(provider_class, ruleset, partitions, service, repeat, precompiled=None):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        # A copy has a new id, so nothing is reused from the in-memory cache
+        endpoint_rules.reset_endpoint_rules()
+        data = dict(ruleset)
+        if precompiled is not None:
+            endpoint_rules.register_precompiled(data, precompiled)
+        provider_class(data, partitions).resolve_endpoint(**first_params(service))
+    return (time.perf_counter() - started) / repeat
+
+
+def bench_varied(provider, service, iterations):
+    params = [varied_params(service, i) for i in range(iterations)]
+    started = time.perf_counter()
+    for p in params:
+        provider.resolve_endpoint(**p)
+    return (time.perf_counter() - started) / iterations
+
+
+def bench_compile(ruleset):
+    started = time.perf_counter()
+    endpoint_rules.compile_code(ruleset)
+    return time.perf_counter() - started
+
+
+def row(service, level, mode, seconds, baseline=None):
+    result = {"service": service, "level": level, "mode": mode, "us": round(seconds * 1e6, 1)}
+    if baseline is not None:
+        result["speedup"] = f"{baseline / seconds:.2f}x"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3000, help="distinct parameter sets per mode")
+    parser.add_argument("--repeat", type=int, default=50, help="cold provider builds per mode")
+    args = parser.parse_args()
+
+    loader = Loader()
+    partitions = loader.load_data("partitions")
+    rows = []
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        for service in SERVICES:
+            # Plain dicts, as loaded from a model bundle
+            ruleset = model_bundle.strip_docs(loader.load_service_model(service, "endpoint-rule-set-1"))
+            precompiled = endpoint_rules.precompiled_path(os.path.join(bundle_dir, service))
+            endpoint_rules.write_code(precompiled, endpoint_rules.compile_code(ruleset))
+            cold_before = bench_cold(EndpointProvider, ruleset, partitions, service, args.repeat)
+            cold_after = bench_cold(
+                endpoint_rules.CompiledEndpointProvider, ruleset, partitions, service, args.repeat, precompiled
+            )
+            os.environ["ENDPOINT_RULES_COMPILE_AFTER"] = "0"
+            varied_before = bench_varied(EndpointProvider(ruleset, partitions), service, args.iterations)
+            varied_after = bench_varied(
+                endpoint_rules.CompiledEndpointProvider(ruleset, partitions), service, args.iterations
+            )
+            del os.environ["ENDPOINT_RULES_COMPILE_AFTER"]
+            rows += [
+                row(service, "cold", "before (EndpointProvider)", cold_before),
+                row(service, "cold", "after (bundled code)", cold_after, cold_before),
+                row(service, "varied", "before (EndpointProvider)", varied_before),
+                row(service, "varied", "after (compiled)", varied_after, varied_before),
+                row(service, "compile", "one-off", bench_compile(ruleset)),
+            ]
+
+    print("Endpoint ruleset resolution, microseconds per provider build or per resolution")
+    print_table(rows, ["service", "level", "mode", "us", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
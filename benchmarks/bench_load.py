@@ -0,0 +1,144 @@
+"""Open-loop load test of the handler against the local SageMaker stub.
+
+Starts ``sagemaker_stub`` on a free port (or uses ``--endpoint-url``), points
+``SAGEMAKER_RUNTIME_ENDPOINT_URL`` at it and calls ``lambda_handler`` at a
+fixed target rate, so every request goes through real botocore
+serialization, SigV4 signing, urllib3 connection pooling and HTTP.
+
+Requests are scheduled on a fixed timetable rather than sent back to back:
+latency is measured from each request's scheduled start, so when the
+handler falls behind the queueing delay shows up in the percentiles instead
+of silently lowering the offered load.
+
+    python benchmarks/bench_load.py --rps 200 --duration 10 --latency lognormal:20,0.5 --throttle-rps 150
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import print_table, setup_environment
+
+setup_environment()
+
+from sagemaker_stub import Simulation, start_server  # noqa: E402
+
+
+def percentiles(samples_seconds):
+    ms = sorted(s * 1000.0 for s in samples_seconds)
+    quantiles = statistics.quantiles(ms, n=1000, method="inclusive") if len(ms) > 1 else ms * 999
+    return {
+        "count": len(ms),
+        "p50_ms": round(quantiles[499], 3),
+        "p90_ms": round(quantiles[899], 3),
+        "p99_ms": round(quantiles[989], 3),
+        "p99.9_ms": round(quantiles[998], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def histogram(samples_seconds, width=50):
+    """Latency histogram with power-of-two millisecond buckets, as text lines."""
+    buckets = Counter(max(0, math.ceil(math.log2(max(s * 1000.0, 1e-3)))) for s in samples_seconds)
+    if not buckets:
+        return []
+    peak = max(buckets.values())
+    lines = []
+    for exponent in range(min(buckets), max(buckets) + 1):
+        n = buckets.get(exponent, 0)
+        bar = "#" * max(1 if n else 0, round(width * n / peak))
+        lines.append(f"<= {2 ** exponent:>6} ms  {n:>7}  {bar}")
+    return lines
+
+
+def run(handler, event, rps, duration, workers):
+    """Offer ``rps`` requests per second for ``duration`` seconds."""
+    total = int(rps * duration)
+    results = []
+    lock = threading.Lock()
+
+    def one(scheduled):
+        try:
+            status = handler(event, None).get("statusCode", 200)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            results.append((elapsed, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, scheduled)
+    wall = time.perf_counter() - start
+    return results, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rps", type=float, default=100)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=32, help="concurrent handler calls")
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    parser.add_argument("--stream", action="store_true", help="use InvokeEndpointWithResponseStream")
+    parser.add_argument("--endpoint-url", default=None, help="an already running stub; otherwise one is started")
+    parser.add_argument("--latency", default="lognormal:20,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rps", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    server = None
+    endpoint_url = args.endpoint_url
+    if endpoint_url is None:
+        simulation = Simulation(args.latency, args.error_rate, args.throttle_rps, seed=args.seed)
+        server, endpoint_url = start_server(simulation)
+    os.environ["SAGEMAKER_RUNTIME_ENDPOINT_URL"] = endpoint_url
+
+    import lambda_function
+
+    lambda_function.logger.setLevel("CRITICAL")
+    event = {"body": json.dumps({"data": "x" * args.payload_bytes}), "stream": args.stream}
+    # Warm up: build the client and open a connection outside the measurement
+    lambda_function.lambda_handler(event, None)
+
+    results, wall = run(lambda_function.lambda_handler, event, args.rps, args.duration, args.workers)
+    latencies = [elapsed for elapsed, _ in results]
+    statuses = Counter(str(status) for _, status in results)
+    summary = percentiles(latencies)
+    summary.update({
+        "target_rps": args.rps,
+        "achieved_rps": round(len(results) / wall, 1),
+        "ok_rps": round(statuses.get("200", 0) / wall, 1),
+    })
+
+    print(f"Offered {args.rps:g} rps for {args.duration:g}s against {endpoint_url}")
+    print_table([summary], ["target_rps", "achieved_rps", "ok_rps", "count", "p50_ms", "p90_ms", "p99_ms",
+                            "p99.9_ms", "max_ms"])
+    print()
+    print_table([{"status": s, "count": n} for s, n in sorted(statuses.items())], ["status", "count"])
+    print()
+    print("\n".join(histogram(latencies)))
+    if server is not None:
+        print()
+        print(f"Stub served: {server.simulation.counts}")
+        server.shutdown()
+        server.server_close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "statuses": dict(statuses), "histogram": histogram(latencies)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Cold-start cost of the full botocore JSON models vs. the trimmed bundle.
+
+Each sample is a fresh interpreter that imports ``clients`` under
+``-X importtime`` and then creates a ``sagemaker-runtime`` client. The JSON
+run uses ``lambda_function/`` as-is; the bundle run uses a package built with
+``model_bundle.package`` in a temporary directory.
+
+    python benchmarks/bench_model_bundle.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _common import LAMBDA_DIR, print_table, setup_environment
+
+setup_environment()
+
+import model_bundle  # noqa: E402
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import clients
+imported = time.perf_counter()
+clients.get_client('sagemaker-runtime')
+created = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'client_ms': (created - imported) * 1000}))
+"""
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def importtime_ms(stderr, module):
+    """Cumulative import time of ``module`` from -X importtime output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    return None
+
+
+def sample(package_dir):
+    env = dict(os.environ)
+    env.pop("BOTOCORE_MODEL_BUNDLE", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=package_dir, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["importtime_ms"] = importtime_ms(proc.stderr, "clients")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if model_bundle.find_bundle():
+        parser.error("remove lambda_function/model_bundle so the JSON run measures the full models")
+    with tempfile.TemporaryDirectory() as tmp:
+        package_dir = os.path.join(tmp, "lambda")
+        model_bundle.package(package_dir)
+        rows = []
+        for label, path in (
+            ("json (full botocore/data)", LAMBDA_DIR),
+            ("marshal bundle", package_dir),
+        ):
+            samples = [sample(path) for _ in range(args.runs)]
+            rows.append({
+                "mode": label,
+                "package_mb": round(dir_size(path) / 1e6, 2),
+                "importtime_ms": round(statistics.median(s["importtime_ms"] for s in samples), 1),
+                "client_ms": round(statistics.median(s["client_ms"] for s in samples), 1),
+            })
+    print_table(rows, ["mode", "package_mb", "importtime_ms", "client_ms"])
+
+
+if __name__ == "__main__":
+    main()
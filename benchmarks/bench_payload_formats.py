@@ -0,0 +1,189 @@
+"""Serialization cost and size of JSON vs. binary inference payloads.
+
+For a float32 feature vector, compares ``json.dumps``/``json.loads`` against
+``application/x-npy`` and ``application/x-recordio-protobuf`` built with the
+standard library only (``array`` plus hand-written npy header, protobuf and
+RecordIO framing), so no numpy or protobuf install is needed. It then runs
+the handler end to end with each format to show what the pass-through path
+costs on top of the SageMaker call.
+
+    python benchmarks/bench_payload_formats.py --features 10000 --iterations 200
+"""
+import argparse
+import array
+import base64
+import json
+import random
+import struct
+import sys
+import time
+
+from _common import install_canned_response, print_table, setup_environment, summarize
+
+setup_environment()
+
+import clients  # noqa: E402
+import lambda_function  # noqa: E402
+
+RECORDIO_MAGIC = 0xCED7230A
+
+
+def _float32(values):
+    data = array.array("f", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def encode_npy(values):
+    header = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    # Pad so magic + version + length + header is a multiple of 64
+    header = header.ljust(64 * ((10 + len(header) + 1 + 63) // 64) - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1") + _float32(values)
+
+
+def decode_npy(data):
+    (header_len,) = struct.unpack_from("<H", data, 8)
+    values = array.array("f")
+    values.frombytes(data[10 + header_len:])
+    return values
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, payload):
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def encode_recordio_protobuf(values):
+    """One SageMaker ``Record`` with ``features['values']`` as a Float32Tensor."""
+    tensor = _field(1, _float32(values))
+    value = _field(2, tensor)
+    entry = _field(1, b"values") + _field(2, value)
+    record = _field(1, entry)
+    padding = b"\x00" * (-len(record) % 4)
+    return struct.pack("<II", RECORDIO_MAGIC, len(record)) + record + padding
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _submessage(message, number):
+    """First length-delimited field ``number`` in an encoded message."""
+    pos = 0
+    while True:
+        tag, pos = _read_varint(message, pos)
+        size, pos = _read_varint(message, pos)
+        if tag >> 3 == number:
+            return message[pos:pos + size]
+        pos += size
+
+
+def decode_recordio_protobuf(data):
+    _, length = struct.unpack_from("<II", data)
+    message = memoryview(data)[8:8 + length]
+    # Record.features entry -> entry value -> Value.float32_tensor -> values
+    for number in (1, 2, 2, 1):
+        message = _submessage(message, number)
+    values = array.array("f")
+    values.frombytes(message)
+    return values
+
+
+FORMATS = {
+    "application/json": (lambda v: json.dumps(v).encode("utf-8"), json.loads),
+    "application/x-npy": (encode_npy, decode_npy),
+    "application/x-recordio-protobuf": (encode_recordio_protobuf, decode_recordio_protobuf),
+}
+
+
+def time_cpu(func, arg, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.process_time()
+        func(arg)
+        samples.append(time.process_time() - start)
+    return samples
+
+
+def bench_serialization(values, iterations):
+    rows = []
+    for content_type, (encode, decode) in FORMATS.items():
+        body = encode(values)
+        assert len(decode(body)) == len(values)
+        encode_ms = summarize(time_cpu(encode, values, iterations))
+        decode_ms = summarize(time_cpu(decode, body, iterations))
+        rows.append({
+            "format": content_type,
+            "bytes": len(body),
+            "encode_p50_ms": encode_ms["p50_ms"],
+            "decode_p50_ms": decode_ms["p50_ms"],
+        })
+    return rows
+
+
+def bench_handler(values, iterations):
+    rows = []
+    for content_type, (encode, _) in FORMATS.items():
+        body = encode(values)
+        if content_type == "application/json":
+            event = {"body": body.decode("utf-8")}
+        else:
+            event = {
+                "body": base64.b64encode(body).decode("ascii"),
+                "isBase64Encoded": True,
+                "headers": {"Content-Type": content_type},
+            }
+        clients.reset_clients()
+        install_canned_response(body, headers={"Content-Type": content_type})
+        lambda_function.lambda_handler(event, None)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = lambda_function.lambda_handler(event, None)
+            samples.append(time.perf_counter() - start)
+            assert response["statusCode"] == 200, response
+        row = summarize(samples)
+        row["format"] = content_type
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--features", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    values = [rng.uniform(-1, 1) for _ in range(args.features)]
+    lambda_function.logger.setLevel("WARNING")
+
+    print(f"Serialization, {args.features} float32 features (CPU time)")
+    print_table(bench_serialization(values, args.iterations),
+                ["format", "bytes", "encode_p50_ms", "decode_p50_ms"])
+    print()
+    print("Handler round trip with a canned endpoint response")
+    print_table(bench_handler(values, args.iterations), ["format", "count", "p50_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    main()
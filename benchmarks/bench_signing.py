@@ -0,0 +1,100 @@
+"""SigV4 signs per second with botocore's signer vs. the cached signer.
+
+"signer" re-signs a captured ``InvokeEndpoint`` request with a new auth
+instance per call, as ``RequestSigner`` does: ``SigV4Auth`` ("before")
+against ``signing.CachedSigV4Auth`` ("after"). "client" runs whole
+``invoke_endpoint`` calls, answered from a ``before-send`` hook, with and
+without ``signing.enable_signing_cache`` on the client.
+
+    python benchmarks/bench_signing.py --iterations 20000
+"""
+import argparse
+import copy
+import time
+
+from _common import canned_response, print_table, setup_environment
+
+setup_environment()
+
+import botocore.auth  # noqa: E402
+import botocore.session  # noqa: E402
+
+import signing  # noqa: E402
+
+BODY = b'{"features": [' + b", ".join(str(i).encode() for i in range(32)) + b"]}"
+
+
+def make_client(cached):
+    client = botocore.session.get_session().create_client("sagemaker-runtime", region_name="us-east-2")
+    client.meta.events.register("before-send", canned_response())
+    if cached:
+        signing.enable_signing_cache(client)
+    return client
+
+
+def captured_request():
+    """The ``AWSRequest`` botocore signs for ``InvokeEndpoint``, before signing."""
+    captured = []
+    client = make_client(cached=False)
+    client.meta.events.register(
+        "before-sign", lambda request, **kwargs: captured.append(copy.deepcopy(request))
+    )
+    client.invoke_endpoint(EndpointName="bench-endpoint", Body=BODY, ContentType="application/json")
+    credentials = client._request_signer._credentials.get_frozen_credentials()
+    return captured[0], credentials
+
+
+def bench_signer(cls, request, credentials, iterations):
+    for _ in range(100):
+        cls(credentials, "sagemaker", "us-east-2").add_auth(request)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cls(credentials, "sagemaker", "us-east-2").add_auth(request)
+    return time.perf_counter() - start
+
+
+def bench_client(cached, iterations):
+    client = make_client(cached)
+    for _ in range(50):
+        client.invoke_endpoint(EndpointName="bench-endpoint", Body=BODY, ContentType="application/json")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.invoke_endpoint(EndpointName="bench-endpoint", Body=BODY, ContentType="application/json")
+    return time.perf_counter() - start
+
+
+def row(level, mode, elapsed, iterations, baseline=None):
+    result = {
+        "level": level,
+        "mode": mode,
+        "per_second": round(iterations / elapsed),
+        "us_per_call": round(elapsed / iterations * 1e6, 2),
+    }
+    if baseline is not None:
+        result["speedup"] = f"{baseline / elapsed:.2f}x"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10000, help="signs per signer mode")
+    parser.add_argument("--calls", type=int, default=2000, help="invoke_endpoint calls per client mode")
+    args = parser.parse_args()
+
+    request, credentials = captured_request()
+    before = bench_signer(botocore.auth.SigV4Auth, request, credentials, args.iterations)
+    after = bench_signer(signing.CachedSigV4Auth, request, credentials, args.iterations)
+    client_before = bench_client(False, args.calls)
+    client_after = bench_client(True, args.calls)
+
+    print(f"SigV4 signing of InvokeEndpoint ({len(BODY)} byte body)")
+    print_table([
+        row("signer", "before (SigV4Auth)", before, args.iterations),
+        row("signer", "after (CachedSigV4Auth)", after, args.iterations, before),
+        row("client", "before (v4)", client_before, args.calls),
+        row("client", "after (v4-cached)", client_after, args.calls, client_before),
+    ], ["level", "mode", "per_second", "us_per_call", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
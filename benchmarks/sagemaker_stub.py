@@ -0,0 +1,251 @@
+"""Local stand-in for the SageMaker runtime API.
+
+Speaks the ``sagemaker-runtime`` REST-JSON wire protocol for
+``InvokeEndpoint`` (``POST /endpoints/<name>/invocations``) and
+``InvokeEndpointWithResponseStream`` (``.../invocations-response-stream``,
+answered as ``application/vnd.amazon.eventstream`` frames), so a real
+botocore client pointed at it through ``SAGEMAKER_RUNTIME_ENDPOINT_URL``
+serializes, signs, sends and parses exactly as it would against AWS.
+
+Model behaviour is simulated:
+
+- latency is drawn per request from a distribution such as ``fixed:20``,
+  ``uniform:10,50``, ``normal:30,5``, ``lognormal:20,0.5`` (median ms,
+  sigma) or ``exp:25`` (mean ms);
+- ``error_rate`` of requests fail with ``ModelError`` (424);
+- above ``throttle_rps`` (a token bucket) requests get
+  ``ThrottlingException``, which botocore retries like the real thing.
+
+The response echoes the request body unless a fixed one is given. Requests
+without a SigV4 ``Authorization`` header are rejected, as AWS would.
+
+    python benchmarks/sagemaker_stub.py --port 8081 --latency lognormal:20,0.5 --throttle-rps 100
+"""
+import argparse
+import binascii
+import json
+import logging
+import math
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PATH = re.compile(r"^/endpoints/(?P<endpoint>[^/]+)/(?P<operation>invocations|invocations-response-stream)$")
+
+
+def encode_message(headers, payload):
+    """Encode one ``application/vnd.amazon.eventstream`` message."""
+    encoded_headers = b""
+    for name, value in headers.items():
+        name_bytes, value_bytes = name.encode(), value.encode()
+        encoded_headers += struct.pack("!B", len(name_bytes)) + name_bytes
+        encoded_headers += struct.pack("!BH", 7, len(value_bytes)) + value_bytes
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack("!II", total_length, len(encoded_headers))
+    prelude += struct.pack("!I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + encoded_headers + payload
+    return message + struct.pack("!I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+def payload_part(data):
+    return encode_message(
+        {":message-type": "event", ":event-type": "PayloadPart", ":content-type": "application/octet-stream"},
+        data,
+    )
+
+
+def parse_latency(spec):
+    """Turn a distribution spec (milliseconds) into ``sample(rng) -> seconds``."""
+    name, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if name == "fixed":
+        ms = values[0] if values else 0.0
+        return lambda rng: ms / 1000.0
+    if name == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high) / 1000.0
+    if name == "normal":
+        mean, stdev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stdev)) / 1000.0
+    if name == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000.0
+    if name == "exp":
+        (mean,) = values
+        return lambda rng: rng.expovariate(1.0 / mean) / 1000.0
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+class TokenBucket:
+    """``rate`` requests per second with bursts of up to ``rate``."""
+
+    def __init__(self, rate, clock=time.monotonic):
+        self.rate = rate
+        self._clock = clock
+        self._tokens = rate
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Simulation:
+    """Per-request outcome and latency, plus counters of what was served."""
+
+    def __init__(self, latency="fixed:0", error_rate=0.0, throttle_rps=None, response=None,
+                 stream_parts=4, part_interval=0.0, seed=None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(throttle_rps) if throttle_rps else None
+        self.response = response
+        self.stream_parts = max(1, stream_parts)
+        self.part_interval = part_interval
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"ok": 0, "error": 0, "throttled": 0}
+
+    def plan(self):
+        """Return ``(outcome, delay_seconds)`` for the next request."""
+        if self.bucket is not None and not self.bucket.try_acquire():
+            outcome, delay = "throttled", 0.0
+        else:
+            with self._lock:
+                delay = self.latency(self._rng)
+                outcome = "error" if self._rng.random() < self.error_rate else "ok"
+        with self._lock:
+            self.counts[outcome] += 1
+        return outcome, delay
+
+
+class SageMakerStubHandler(BaseHTTPRequestHandler):
+    """Answers InvokeEndpoint and InvokeEndpointWithResponseStream."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        match = PATH.match(self.path.split("?", 1)[0])
+        if match is None:
+            self._error(404, "UnknownOperationException", f"No operation at {self.path}")
+            return
+        if not self.headers.get("Authorization", "").startswith("AWS4-HMAC-SHA256 "):
+            self._error(403, "MissingAuthenticationTokenException", "Request is missing a SigV4 signature")
+            return
+
+        simulation = self.server.simulation
+        outcome, delay = simulation.plan()
+        if outcome == "throttled":
+            self._error(400, "ThrottlingException", "Rate exceeded")
+            return
+        time.sleep(delay)
+        if outcome == "error":
+            self._error(424, "ModelError", "Received server error (500) from primary", OriginalStatusCode=500)
+            return
+
+        body = simulation.response if simulation.response is not None else payload
+        accept = self.headers.get("Accept")
+        content_type = accept if accept and accept != "*/*" else self.headers.get("Content-Type", "application/json")
+        if match.group("operation") == "invocations":
+            self._reply(200, body, {"Content-Type": content_type, "x-Amzn-Invoked-Production-Variant": "AllTraffic"})
+        else:
+            self._stream(body, content_type)
+
+    def _reply(self, status, body, headers):
+        self.send_response(status)
+        self.send_header("x-amzn-RequestId", str(uuid.uuid4()))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, code, message, **fields):
+        body = json.dumps(dict({"message": message}, **fields)).encode()
+        self._reply(status, body, {"Content-Type": "application/json", "x-amzn-ErrorType": code})
+
+    def _stream(self, body, content_type):
+        self.send_response(200)
+        self.send_header("x-amzn-RequestId", str(uuid.uuid4()))
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("X-Amzn-SageMaker-Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        simulation = self.server.simulation
+        size = -(-len(body) // simulation.stream_parts) or 1
+        for index, start in enumerate(range(0, len(body), size)):
+            if index and simulation.part_interval:
+                time.sleep(simulation.part_interval)
+            frame = payload_part(body[start:start + size])
+            self.wfile.write(f"{len(frame):X}\r\n".encode("ascii") + frame + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def make_server(host="127.0.0.1", port=8081, simulation=None):
+    """Build a threaded stub server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), SageMakerStubHandler)
+    server.daemon_threads = True
+    server.simulation = simulation or Simulation()
+    return server
+
+
+def start_server(simulation=None, host="127.0.0.1", port=0):
+    """Serve on a background thread and return ``(server, endpoint_url)``."""
+    server = make_server(host, port, simulation)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. fixed:20, uniform:10,50, lognormal:20,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rps", type=float, default=None)
+    parser.add_argument("--response", default=None, help="fixed response body instead of echoing the request")
+    parser.add_argument("--stream-parts", type=int, default=4)
+    parser.add_argument("--part-interval-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    simulation = Simulation(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rps=args.throttle_rps,
+        response=args.response.encode() if args.response is not None else None,
+        stream_parts=args.stream_parts,
+        part_interval=args.part_interval_ms / 1000.0,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, simulation)
+    logger.info(f"SageMaker runtime stub listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Served: {simulation.counts}")
+
+
+if __name__ == "__main__":
+    main()
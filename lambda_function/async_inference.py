@@ -0,0 +1,164 @@
+"""Asynchronous SageMaker inference for large or slow requests.
+
+``InvokeEndpoint`` rejects payloads over 6 MB and gives up after 60 s of
+model time. Such requests go to an endpoint configured for asynchronous
+inference instead: the payload is staged to S3, ``InvokeEndpointAsync`` is
+called with its location, and the handler answers 202 with the inference ID
+and output location right away.
+
+The mode is picked per request: payloads of at least
+``SAGEMAKER_ASYNC_THRESHOLD_BYTES`` (6 MB) go async, as do events with
+``"async": true`` (long model runtimes) or an ``inputLocation`` already in
+S3. Everything else stays synchronous.
+
+When the model finishes, SageMaker publishes to the endpoint's success or
+error SNS topic. Subscribed to the handler (directly, or forwarded through
+EventBridge), those notifications are collected here: results are read
+from their output location and logged, failures logged with their reason,
+and both counted in the EMF metrics. A result that cannot be read (no
+output location, or an S3 error) is reported on its own completion with an
+``error`` rather than failing the rest of the batch.
+
+Async mode needs ``SAGEMAKER_ASYNC_ENDPOINT_NAME`` and
+``SAGEMAKER_ASYNC_INPUT_BUCKET``; ``SAGEMAKER_ASYNC_INPUT_PREFIX``
+(``async-inputs/``) sets where payloads are staged.
+"""
+import json
+import logging
+import os
+import uuid
+from urllib.parse import urlsplit
+
+from clients import get_client
+from instrumentation import count
+from payload_formats import request_content_type, response_accept
+from payload_logging import PayloadLog, should_log_full
+
+logger = logging.getLogger(__name__)
+
+SYNC_PAYLOAD_LIMIT = 6 * 1024 * 1024
+DEFAULT_INPUT_PREFIX = 'async-inputs/'
+
+
+def async_endpoint_name():
+    return os.environ.get('SAGEMAKER_ASYNC_ENDPOINT_NAME')
+
+
+def async_threshold():
+    return int(os.environ.get('SAGEMAKER_ASYNC_THRESHOLD_BYTES', SYNC_PAYLOAD_LIMIT))
+
+
+def payload_size(payload):
+    return len(payload.encode('utf-8') if isinstance(payload, str) else payload)
+
+
+def should_invoke_async(event, payload):
+    """Whether this request goes to the asynchronous endpoint."""
+    if not async_endpoint_name():
+        return False
+    if 'async' in event:
+        return bool(event['async'])
+    return bool(event.get('inputLocation')) or payload_size(payload) >= async_threshold()
+
+
+def split_s3_uri(uri):
+    parts = urlsplit(uri)
+    return parts.netloc, parts.path.lstrip('/')
+
+
+def stage_payload(s3, payload, content_type):
+    """Upload ``payload`` for an async request and return its ``s3://`` URI."""
+    bucket = os.environ['SAGEMAKER_ASYNC_INPUT_BUCKET']
+    key = f"{os.environ.get('SAGEMAKER_ASYNC_INPUT_PREFIX', DEFAULT_INPUT_PREFIX)}{uuid.uuid4()}"
+    s3.put_object(Bucket=bucket, Key=key, Body=payload, ContentType=content_type)
+    return f"s3://{bucket}/{key}"
+
+
+def submit(sagemaker_client, event, payload, s3=None):
+    """Stage the payload if needed, start async inference and build the 202 response."""
+    content_type = request_content_type(event)
+    input_location = event.get('inputLocation')
+    if not input_location:
+        input_location = stage_payload(s3 or get_client('s3'), payload, content_type)
+    params = {
+        'EndpointName': async_endpoint_name(),
+        'ContentType': content_type,
+        'InputLocation': input_location,
+    }
+    accept = response_accept(event)
+    if accept:
+        params['Accept'] = accept
+    if event.get('inferenceId'):
+        params['InferenceId'] = event['inferenceId']
+    response = sagemaker_client.invoke_endpoint_async(**params)
+    count('AsyncInvocations')
+    logger.info(f"Started async inference {response['InferenceId']} for {input_location}")
+    return {
+        'statusCode': 202,
+        'body': json.dumps({
+            'inferenceId': response['InferenceId'],
+            'inputLocation': input_location,
+            'outputLocation': response.get('OutputLocation'),
+            'failureLocation': response.get('FailureLocation'),
+        }),
+    }
+
+
+def _notifications(event):
+    """Decoded SageMaker async notifications carried by SNS or EventBridge."""
+    if isinstance(event.get('detail'), dict) and 'invocationStatus' in event['detail']:
+        return [event['detail']]
+    notifications = []
+    for record in event.get('Records') or []:
+        if record.get('EventSource') != 'aws:sns':
+            continue
+        try:
+            message = json.loads(record['Sns']['Message'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if isinstance(message, dict) and 'invocationStatus' in message:
+            notifications.append(message)
+    return notifications
+
+
+def is_completion_event(event):
+    return bool(_notifications(event))
+
+
+def collect_completions(event, s3=None):
+    """Record every async completion in ``event`` and summarise them."""
+    completions = []
+    for message in _notifications(event):
+        inference_id = message.get('inferenceId')
+        endpoint_name = message.get('requestParameters', {}).get('endpointName')
+        response_parameters = message.get('responseParameters', {})
+        if message['invocationStatus'] == 'Completed':
+            location = response_parameters.get('sageMakerOutputLocation')
+            completion = {'inferenceId': inference_id, 'status': 'Completed', 'outputLocation': location}
+            count('AsyncCompleted')
+            # One unreadable result must not fail the rest of the batch
+            try:
+                if not location:
+                    raise ValueError("Notification has no output location")
+                bucket, key = split_s3_uri(location)
+                result = (s3 or get_client('s3')).get_object(Bucket=bucket, Key=key)['Body'].read()
+            except Exception as e:
+                logger.error(f"Could not read result of async inference {inference_id}: {str(e)}")
+                count('AsyncResultReadErrors')
+                completion['error'] = str(e)
+            else:
+                logger.info(
+                    "Async inference %s completed: %s", inference_id,
+                    PayloadLog('response', endpoint_name, result, should_log_full(logger)),
+                )
+            completions.append(completion)
+        else:
+            location = response_parameters.get('sageMakerFailureLocation')
+            reason = message.get('failureReason')
+            logger.error(f"Async inference {inference_id} failed: {reason}")
+            count('AsyncFailed')
+            completions.append({
+                'inferenceId': inference_id, 'status': message['invocationStatus'],
+                'failureLocation': location, 'failureReason': reason,
+            })
+    return {'statusCode': 200, 'body': json.dumps({'completions': completions})}
@@ -0,0 +1,170 @@
+"""Multi-record inference for a single Lambda invocation.
+
+Records are either fanned out concurrently over a bounded thread pool (one
+``invoke_endpoint`` per record) or, for models that accept JSON arrays,
+packed into a single endpoint call whose array response is split back into
+per-record results. Results always come back in input order.
+
+SQS batches (``{"Records": [...]}`` from an event source mapping) are fanned
+out the same way, one call per message body, and answered with a partial
+batch response so that only failed messages are redelivered. The mapping
+must enable ``ReportBatchItemFailures``. FIFO queues keep message-group
+ordering: messages run one at a time and everything after the first
+failure is reported as failed.
+
+Binary results (a binary ``accept`` type, or simply not UTF-8) are base64
+encoded and flagged with ``isBase64Encoded``, as single-record responses
+are in ``payload_formats``.
+"""
+import base64
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from deadlines import TIMEOUT_ERRORS
+from overload_protection import LoadShed
+from payload_formats import is_binary, response_accept
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def max_workers():
+    return max(1, int(os.environ.get('SAGEMAKER_BATCH_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+
+
+def pack_enabled(event):
+    if 'pack' in event:
+        return bool(event['pack'])
+    return os.environ.get('SAGEMAKER_BATCH_MODE', 'fanout').lower() == 'pack'
+
+
+def record_body(record):
+    """Return the request body for one record; non-strings are JSON encoded."""
+    if isinstance(record, (str, bytes)):
+        return record
+    return json.dumps(record)
+
+
+def _ok(index, body, accept=None):
+    if isinstance(body, bytes) and not is_binary(accept):
+        try:
+            body = body.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    if isinstance(body, bytes):
+        return {
+            'index': index, 'statusCode': 200,
+            'body': base64.b64encode(body).decode('ascii'), 'isBase64Encoded': True,
+        }
+    return {'index': index, 'statusCode': 200, 'body': body}
+
+
+def _error(index, exc):
+    if isinstance(exc, TIMEOUT_ERRORS):
+        status = 504
+    elif isinstance(exc, LoadShed):
+        status = 503
+    else:
+        status = 500
+    return {'index': index, 'statusCode': status, 'body': f"Error invoking SageMaker: {str(exc)}"}
+
+
+def _run_one(invoke, index, record, accept=None):
+    try:
+        return _ok(index, invoke(record_body(record)), accept)
+    except Exception as e:
+        logger.error(f"Record {index} failed: {str(e)}")
+        return _error(index, e)
+
+
+def fan_out(invoke, records, workers=None, accept=None):
+    """Call ``invoke(body)`` for every record on a bounded pool.
+
+    Per-record failures are captured so one bad record does not fail the
+    rest of the batch.
+    """
+    workers = min(workers or max_workers(), len(records)) or 1
+
+    def run(index):
+        return _run_one(invoke, index, records[index], accept)
+
+    if workers == 1:
+        return [run(i) for i in range(len(records))]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, range(len(records))))
+
+
+def pack(invoke, records):
+    """Send all records as one JSON array and split the array response."""
+    try:
+        items = [json.loads(r) if isinstance(r, (str, bytes)) else r for r in records]
+        predictions = json.loads(invoke(json.dumps(items)))
+        if not isinstance(predictions, list) or len(predictions) != len(records):
+            raise ValueError(
+                f"Packed response has {len(predictions) if isinstance(predictions, list) else 'no'} "
+                f"items for {len(records)} records"
+            )
+    except Exception as e:
+        logger.error(f"Packed batch failed: {str(e)}")
+        return [_error(i, e) for i in range(len(records))]
+    return [_ok(i, json.dumps(p)) for i, p in enumerate(predictions)]
+
+
+def batch_status(results):
+    """200 if every record succeeded, 500 if none did, otherwise 207."""
+    failed = sum(1 for r in results if r['statusCode'] != 200)
+    if not failed:
+        return 200
+    return 500 if failed == len(results) else 207
+
+
+def is_sqs_event(event):
+    records = event.get('Records')
+    return bool(records) and isinstance(records, list) and all(
+        r.get('eventSource') == 'aws:sqs' for r in records
+    )
+
+
+def _is_fifo(records):
+    return records[0].get('eventSourceARN', '').endswith('.fifo')
+
+
+def invoke_sqs_batch(invoke, event):
+    """Run every SQS message and report the failed ones as ``batchItemFailures``."""
+    records = event['Records']
+    bodies = [r['body'] for r in records]
+    if _is_fifo(records):
+        results = []
+        for index, body in enumerate(bodies):
+            result = _run_one(invoke, index, body)
+            results.append(result)
+            if result['statusCode'] != 200:
+                # Later messages may share its group; redeliver them in order
+                skipped = RuntimeError("Skipped after an earlier failure in a FIFO batch")
+                results.extend(_error(i, skipped) for i in range(index + 1, len(bodies)))
+                break
+    else:
+        results = fan_out(invoke, bodies)
+    failures = [
+        {'itemIdentifier': records[r['index']]['messageId']}
+        for r in results if r['statusCode'] != 200
+    ]
+    if failures:
+        logger.warning(f"{len(failures)} of {len(records)} SQS messages failed")
+    return {'batchItemFailures': failures}
+
+
+def invoke_batch(invoke, event):
+    """Run every record in ``event['records']`` and build the handler response."""
+    records = event['records']
+    if pack_enabled(event):
+        results = pack(invoke, records)
+    else:
+        results = fan_out(invoke, records, accept=response_accept(event))
+    return {
+        'statusCode': batch_status(results),
+        'body': json.dumps({'results': results}),
+    }
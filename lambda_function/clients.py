@@ -0,0 +1,86 @@
+"""Process-wide boto3 client registry reused across warm Lambda invocations.
+
+Creating a client loads and parses the service model, builds the endpoint
+ruleset and resolves credentials, which is far more expensive than the
+inference call itself on a warm container. Clients are created lazily on
+first use and kept for the lifetime of the process. All of them share the
+default session's credentials, resolved through the provider pinned by
+``CREDENTIAL_PROVIDER`` (see ``credential_providers``), and resolve
+endpoints with compiled rulesets (see ``endpoint_rules``).
+"""
+import os
+import threading
+
+import boto3
+import botocore.session
+
+import credential_providers
+import endpoint_rules
+import model_bundle
+
+_clients = {}
+_lock = threading.Lock()
+_session_ready = False
+
+
+def _config_key(config):
+    if config is None:
+        return None
+    options = getattr(config, '_user_provided_options', {})
+    return tuple(sorted((name, repr(value)) for name, value in options.items()))
+
+
+def _default_region():
+    return os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
+
+
+def _setup_default_session():
+    """Point boto3's default session at the trimmed model bundle, if shipped,
+    and at the shared credential resolver, if configured, and switch
+    endpoint resolution to compiled rulesets."""
+    global _session_ready
+    if _session_ready:
+        return
+    bundle_dir = model_bundle.find_bundle()
+    if bundle_dir is not None and boto3.DEFAULT_SESSION is None:
+        core_session = botocore.session.get_session()
+        model_bundle.install(bundle_dir, core_session)
+        boto3.setup_default_session(botocore_session=core_session)
+    if credential_providers.shared_resolution_enabled():
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        credential_providers.install(boto3.DEFAULT_SESSION._session)
+    endpoint_rules.install()
+    _session_ready = True
+
+
+def get_client(service_name, region_name=None, endpoint_url=None, config=None):
+    """Return a cached client for the service/region/endpoint/config combination.
+
+    The client is built through ``boto3.client`` so tests that patch it keep
+    working, as long as the registry is cleared with ``reset_clients`` first.
+    """
+    region_name = region_name or _default_region()
+    key = (service_name, region_name, endpoint_url, _config_key(config))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                _setup_default_session()
+                client = boto3.client(
+                    service_name,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=config,
+                )
+                _clients[key] = client
+    return client
+
+
+def reset_clients():
+    """Drop every cached client, forcing the next call to rebuild it."""
+    global _session_ready
+    with _lock:
+        _clients.clear()
+        _session_ready = False
@@ -0,0 +1,337 @@
+"""Pinned credential provider for containers and Lambda.
+
+botocore's default ``CredentialResolver`` walks a dozen providers in order:
+environment, assume-role profiles, web identity, SSO, shared files,
+``credential_process``, container metadata and finally the EC2 instance
+metadata service. When IMDS is unreachable (Kubernetes pods without host
+networking, local runs) the last probe costs its connect timeout times
+its attempts on every process start.
+
+``CREDENTIAL_PROVIDER`` pins the chain to the one provider that applies:
+
+- ``env``: ``AWS_ACCESS_KEY_ID``/``AWS_SECRET_ACCESS_KEY`` (Lambda, the
+  ``aws-creds`` secret in k8s);
+- ``web-identity``: ``AWS_WEB_IDENTITY_TOKEN_FILE`` and ``AWS_ROLE_ARN``
+  (EKS IAM roles for service accounts);
+- ``container``: ``AWS_CONTAINER_CREDENTIALS_RELATIVE_URI``/``FULL_URI``
+  (ECS tasks, EKS Pod Identity);
+- ``auto``: whichever of the above the environment configures, else the
+  full chain;
+- ``chain`` (default): botocore's full chain, unchanged.
+
+If the pinned provider finds nothing, the full chain is used after all,
+with a warning. The resolved credentials are shared by every session the
+resolver is installed on, so clients built by ``clients.get_client`` (and
+any other session in the process) resolve once.
+
+Temporary credentials are wrapped in ``BackgroundRefreshCredentials``: in
+the advisory window (15 minutes before expiry) a request starts a refresh
+on a background thread and signs with the current credentials; only the
+mandatory window (10 minutes) blocks, as botocore always does. Set
+``CREDENTIAL_ASYNC_REFRESH=false`` to keep botocore's inline refresh.
+
+``CREDENTIAL_REFRESHER_ENABLED=true`` goes further, for any
+``RefreshableCredentials`` including the default chain's: one
+``CredentialRefresher`` daemon thread refreshes them
+``CREDENTIAL_REFRESH_LEAD_SECONDS`` (900) before expiry and swaps in the
+new frozen set with a single assignment. Requests never take the refresh
+lock then, and block only if the credentials have actually expired
+(the refresher failed for longer than the lead time).
+"""
+import logging
+import os
+import threading
+import time
+
+from botocore.credentials import (
+    AssumeRoleWithWebIdentityProvider,
+    ContainerProvider,
+    CredentialResolver,
+    EnvProvider,
+    ReadOnlyCredentials,
+    RefreshableCredentials,
+    _get_client_creator,
+    create_credential_resolver,
+)
+
+from instrumentation import count, record
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ('env', 'web-identity', 'container')
+DEFAULT_REFRESH_LEAD_SECONDS = 15 * 60
+RETRY_SECONDS = 30
+
+_credentials = None
+_resolved = False
+_refresher = None
+_lock = threading.Lock()
+_refresher_lock = threading.Lock()
+
+
+def configured_provider():
+    """The provider named by ``CREDENTIAL_PROVIDER``, or ``None`` for the full chain."""
+    name = os.environ.get('CREDENTIAL_PROVIDER', 'chain').lower()
+    if name == 'auto':
+        return detect_provider()
+    if name in PROVIDERS:
+        return name
+    if name != 'chain':
+        logger.warning(f"Unknown CREDENTIAL_PROVIDER {name!r}, using the default chain")
+    return None
+
+
+def detect_provider(environ=None):
+    """Pick the provider the environment configures, in botocore's chain order."""
+    environ = os.environ if environ is None else environ
+    if environ.get('AWS_ACCESS_KEY_ID') and environ.get('AWS_SECRET_ACCESS_KEY'):
+        return 'env'
+    if environ.get('AWS_WEB_IDENTITY_TOKEN_FILE') and environ.get('AWS_ROLE_ARN'):
+        return 'web-identity'
+    if ContainerProvider.ENV_VAR in environ or ContainerProvider.ENV_VAR_FULL in environ:
+        return 'container'
+    return None
+
+
+def async_refresh_enabled():
+    return os.environ.get('CREDENTIAL_ASYNC_REFRESH', 'true').lower() == 'true'
+
+
+def refresher_enabled():
+    return os.environ.get('CREDENTIAL_REFRESHER_ENABLED', 'false').lower() == 'true'
+
+
+def shared_resolution_enabled():
+    """Whether sessions should resolve through ``SharedCredentialResolver``."""
+    return configured_provider() is not None or refresher_enabled()
+
+
+def create_provider(name, session):
+    """Build the single botocore provider for ``name``."""
+    if name == 'env':
+        return EnvProvider()
+    if name == 'web-identity':
+        return AssumeRoleWithWebIdentityProvider(
+            load_config=lambda: session.full_config,
+            client_creator=_get_client_creator(session, session.get_config_variable('region')),
+            profile_name=session.get_config_variable('profile') or 'default',
+        )
+    if name == 'container':
+        return ContainerProvider()
+    raise ValueError(f"Unknown credential provider: {name}")
+
+
+class BackgroundRefreshCredentials(RefreshableCredentials):
+    """``RefreshableCredentials`` whose advisory refresh runs on a background thread.
+
+    Readers keep getting the current frozen credentials while the refresh
+    runs; ``_protected_refresh`` swaps ``_frozen_credentials`` in a single
+    assignment once the new set has arrived. Once registered with a
+    ``CredentialRefresher`` readers leave refreshing to its thread and only
+    refresh inline when the credentials have expired.
+    """
+
+    _refresher = None
+
+    @classmethod
+    def wrap(cls, credentials):
+        """Copy loaded ``RefreshableCredentials``; anything else is returned as is."""
+        if not isinstance(credentials, RefreshableCredentials) or isinstance(credentials, cls):
+            return credentials
+        frozen = credentials.get_frozen_credentials()
+        return cls(
+            access_key=frozen.access_key,
+            secret_key=frozen.secret_key,
+            token=frozen.token,
+            expiry_time=credentials._expiry_time,
+            refresh_using=credentials._refresh_using,
+            method=credentials.method,
+            account_id=frozen.account_id,
+        )
+
+    def _refresh(self):
+        if self._refresher is not None:
+            if self._is_expired():
+                with self._refresh_lock:
+                    if self._is_expired():
+                        self._protected_refresh(is_mandatory=True)
+            return
+        if not self.refresh_needed(self._advisory_refresh_timeout):
+            return
+        if self.refresh_needed(self._mandatory_refresh_timeout):
+            # Too close to expiry to keep signing with the old set
+            super()._refresh()
+            return
+        if self._refresh_lock.acquire(False):
+            threading.Thread(target=self._background_refresh, name='credential-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        # Runs with self._refresh_lock held by the thread that started it
+        started = time.perf_counter()
+        try:
+            if self.refresh_needed(self._advisory_refresh_timeout):
+                self._protected_refresh(is_mandatory=False)
+                count('CredentialBackgroundRefreshes')
+        except Exception as e:
+            logger.warning(f"Background credential refresh failed: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+        record('CredentialRefreshLatency', time.perf_counter() - started)
+
+    def refresh_now(self):
+        """Fetch a new set without holding the lock, then swap it in."""
+        metadata = self._refresh_using()
+        with self._refresh_lock:
+            self._set_from_data(metadata)
+            self._frozen_credentials = ReadOnlyCredentials(
+                self._access_key, self._secret_key, self._token, self._account_id
+            )
+
+
+class CredentialRefresher:
+    """Daemon thread that refreshes registered credentials ahead of expiry.
+
+    Each credential set is refreshed ``lead_seconds`` before it expires, or
+    halfway through its remaining lifetime if that is shorter than the lead;
+    failures are retried every ``retry_seconds``.
+    """
+
+    def __init__(self, lead_seconds=None, retry_seconds=RETRY_SECONDS, clock=time.monotonic):
+        if lead_seconds is None:
+            lead_seconds = int(os.environ.get('CREDENTIAL_REFRESH_LEAD_SECONDS', DEFAULT_REFRESH_LEAD_SECONDS))
+        self.lead_seconds = lead_seconds
+        self.retry_seconds = retry_seconds
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._schedule = {}
+        self._stopped = False
+        self._thread = None
+
+    def register(self, credentials):
+        """Take over refreshing ``credentials`` (a ``BackgroundRefreshCredentials``)."""
+        with self._condition:
+            credentials._refresher = self
+            self._schedule[credentials] = self._clock() + self._delay(credentials)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='credential-refresher', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _delay(self, credentials):
+        remaining = credentials._seconds_remaining()
+        return max(remaining - self.lead_seconds, remaining / 2, 0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                now = self._clock()
+                due = [c for c, at in self._schedule.items() if at <= now]
+                if not due:
+                    self._condition.wait(min(self._schedule.values()) - now if self._schedule else None)
+                    continue
+            for credentials in due:
+                delay = self._refresh(credentials)
+                with self._condition:
+                    if credentials in self._schedule:
+                        self._schedule[credentials] = self._clock() + delay
+
+    def _refresh(self, credentials):
+        started = time.perf_counter()
+        try:
+            credentials.refresh_now()
+        except Exception as e:
+            logger.warning(f"Credential refresh failed, retrying in {self.retry_seconds}s: {str(e)}")
+            count('CredentialRefreshFailures')
+            return self.retry_seconds
+        record('CredentialRefreshLatency', time.perf_counter() - started)
+        count('CredentialBackgroundRefreshes')
+        return max(self._delay(credentials), 1)
+
+    def stop(self):
+        """Stop the thread; registered credentials go back to inline refresh."""
+        with self._condition:
+            self._stopped = True
+            for credentials in self._schedule:
+                credentials._refresher = None
+            self._schedule.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def get_refresher():
+    """Return the process-wide ``CredentialRefresher``."""
+    global _refresher
+    if _refresher is None:
+        with _refresher_lock:
+            if _refresher is None:
+                _refresher = CredentialRefresher()
+    return _refresher
+
+
+class SharedCredentialResolver(CredentialResolver):
+    """Resolver that hands every session the process-wide credentials."""
+
+    def __init__(self, session, provider_name=None):
+        super().__init__(providers=[])
+        self._session = session
+        self.provider_name = provider_name
+
+    def load_credentials(self):
+        return get_credentials(self._session, self.provider_name)
+
+
+def _resolve(session, provider_name):
+    started = time.perf_counter()
+    credentials = None
+    if provider_name is not None:
+        credentials = CredentialResolver([create_provider(provider_name, session)]).load_credentials()
+        if credentials is None:
+            logger.warning(f"No credentials from the {provider_name} provider, falling back to the default chain")
+            count('CredentialProviderFallbacks')
+    if credentials is None:
+        credentials = create_credential_resolver(session).load_credentials()
+    if credentials is not None and (async_refresh_enabled() or refresher_enabled()):
+        credentials = BackgroundRefreshCredentials.wrap(credentials)
+        if refresher_enabled() and isinstance(credentials, BackgroundRefreshCredentials):
+            get_refresher().register(credentials)
+    record('CredentialResolveLatency', time.perf_counter() - started)
+    return credentials
+
+
+def get_credentials(session, provider_name=None):
+    """Resolve credentials once per process through ``provider_name`` (or the chain)."""
+    global _credentials, _resolved
+    if not _resolved:
+        with _lock:
+            if not _resolved:
+                _credentials = _resolve(session, provider_name)
+                _resolved = True
+    return _credentials
+
+
+def install(session):
+    """Share (and pin, if configured) ``session``'s credential resolution.
+
+    Returns whether the resolver was installed; it is not when neither
+    ``CREDENTIAL_PROVIDER`` nor ``CREDENTIAL_REFRESHER_ENABLED`` is set.
+    Must run before the session first loads credentials.
+    """
+    if not shared_resolution_enabled():
+        return False
+    session.register_component('credential_provider', SharedCredentialResolver(session, configured_provider()))
+    return True
+
+
+def reset_credentials():
+    """Forget the process-wide credentials and stop the refresher thread."""
+    global _credentials, _resolved, _refresher
+    with _lock:
+        _credentials = None
+        _resolved = False
+    with _refresher_lock:
+        refresher, _refresher = _refresher, None
+    if refresher is not None:
+        refresher.stop()
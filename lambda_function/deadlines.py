@@ -0,0 +1,130 @@
+"""Deadline-aware timeouts and retry budgets from the Lambda context.
+
+botocore's defaults (60 s connect/read, several retries) can outlast the
+Lambda timeout, so a slow endpoint burns the whole invocation and fails
+anyway. ``Deadline`` turns ``context.get_remaining_time_in_millis()`` into a
+``botocore.config.Config`` whose read timeout and attempt count fit in the
+remaining time, minus a safety margin for returning the response.
+
+Every attempt gets a read timeout of at least the expected model latency:
+retries are only added when the budget fits several such attempts, and a
+single attempt gets the whole remaining budget. With the default 3 s
+Lambda timeout that is one attempt of about 2.25 s, not two of 1 s.
+
+Timeouts are bucketed so the client registry holds at most a handful of
+differently configured clients per container.
+
+Settings: ``SAGEMAKER_DEADLINE_MARGIN_MS`` (500), ``SAGEMAKER_MIN_ATTEMPT_MS``
+(1000, the shortest attempt worth making), ``SAGEMAKER_EXPECTED_LATENCY_MS``
+(2000, the read timeout each retried attempt needs), ``SAGEMAKER_MAX_ATTEMPTS``
+(3) and ``SAGEMAKER_CONNECT_TIMEOUT`` (2 s).
+"""
+import os
+import time
+
+from botocore.config import Config
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+DEFAULT_MARGIN_MS = 500
+DEFAULT_MIN_ATTEMPT_MS = 1000
+DEFAULT_EXPECTED_LATENCY_MS = 2000
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_CONNECT_TIMEOUT = 2.0
+READ_TIMEOUT_BUCKETS = (1, 2, 4, 8, 15, 30, 60)
+# A single attempt's timeout is rounded down to this, not to a bucket
+SINGLE_ATTEMPT_STEP = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting a call that cannot finish in time."""
+
+
+# Reported as 504 rather than 500 so callers can tell "ran out of time"
+# from "the endpoint failed"
+TIMEOUT_ERRORS = (DeadlineExceeded, ConnectTimeoutError, ReadTimeoutError)
+
+
+class Deadline:
+    """Remaining time for this invocation, measured from construction."""
+
+    def __init__(self, remaining_ms, margin_ms=None, min_attempt_ms=None, max_attempts=None,
+                 expected_latency_ms=None, clock=time.monotonic):
+        self._clock = clock
+        margin_ms = _env_number('SAGEMAKER_DEADLINE_MARGIN_MS', DEFAULT_MARGIN_MS, margin_ms)
+        self.expires_at = clock() + (remaining_ms - margin_ms) / 1000.0
+        self.min_attempt = _env_number('SAGEMAKER_MIN_ATTEMPT_MS', DEFAULT_MIN_ATTEMPT_MS, min_attempt_ms) / 1000.0
+        self.max_attempts = int(_env_number('SAGEMAKER_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS, max_attempts))
+        self.expected_latency = _env_number(
+            'SAGEMAKER_EXPECTED_LATENCY_MS', DEFAULT_EXPECTED_LATENCY_MS, expected_latency_ms
+        ) / 1000.0
+
+    @classmethod
+    def from_context(cls, context, **kwargs):
+        """Build a deadline from a Lambda context, or None outside Lambda."""
+        get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+        if get_remaining is None:
+            return None
+        return cls(get_remaining(), **kwargs)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._clock())
+
+    def can_attempt(self):
+        return self.remaining() >= self.min_attempt
+
+    def check(self):
+        if not self.can_attempt():
+            raise DeadlineExceeded(
+                f"{self.remaining() * 1000:.0f} ms left, need at least {self.min_attempt * 1000:.0f} ms"
+            )
+
+    def attempts(self):
+        """Most attempts whose read timeout still covers ``expected_latency``, at least one."""
+        remaining = self.remaining()
+        for attempts in range(self.max_attempts, 1, -1):
+            if _bucket(remaining / attempts) >= self.expected_latency:
+                return attempts
+        return 1
+
+    def read_timeout(self, attempts=None):
+        """Largest timeout that lets every attempt finish in time.
+
+        Retried attempts use a bucketed timeout; a single attempt gets the
+        whole budget, rounded down to ``SINGLE_ATTEMPT_STEP``.
+        """
+        attempts = attempts or self.attempts()
+        remaining = self.remaining()
+        if attempts > 1:
+            return _bucket(remaining / attempts)
+        steps = int(min(remaining, READ_TIMEOUT_BUCKETS[-1]) // SINGLE_ATTEMPT_STEP)
+        return max(steps * SINGLE_ATTEMPT_STEP, SINGLE_ATTEMPT_STEP)
+
+    def client_config(self):
+        attempts = self.attempts()
+        read_timeout = self.read_timeout(attempts)
+        connect_timeout = min(
+            float(os.environ.get('SAGEMAKER_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)), read_timeout
+        )
+        return Config(
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': 'standard', 'total_max_attempts': attempts},
+        )
+
+    def guard(self, invoke):
+        """Wrap ``invoke`` so calls that cannot finish in time fail fast."""
+        def guarded(payload):
+            self.check()
+            return invoke(payload)
+        return guarded
+
+
+def _bucket(seconds):
+    fitting = [b for b in READ_TIMEOUT_BUCKETS if b <= seconds]
+    return fitting[-1] if fitting else READ_TIMEOUT_BUCKETS[0]
+
+
+def _env_number(name, default, override):
+    if override is not None:
+        return override
+    return float(os.environ.get(name, default))
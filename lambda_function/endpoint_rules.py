@@ -0,0 +1,462 @@
+"""Endpoint rulesets compiled to Python code, cached in memory and on disk.
+
+botocore's ``EndpointProvider`` builds a ``RuleSet`` object tree from the
+service's ``endpoint-rule-set-1`` data when a client is created, then
+interprets it for every new parameter set: each condition goes through
+``call_function`` (argument resolution, a ``getattr`` by converted name,
+an assignment check), and every tree rule copies the scope dict for each
+child. Only the final results are memoized, 100 per provider, so varied
+parameters (many S3 buckets, many ``Endpoint`` overrides) keep paying
+for the walk.
+
+``compile_ruleset`` turns the rules into Python source instead: one
+function per tree rule, conditions as nested ``if`` statements, assigned
+values as local variables, ``isSet``/``not``/``getAttr`` and the equality
+checks inlined, and the remaining library functions bound once per
+provider. ``CompiledEndpointProvider`` runs that code with botocore's own
+parameter handling, result types and errors, and falls back to the
+interpreted ``RuleSet`` for anything the compiler does not support.
+
+Compiled code objects are kept per ruleset object, for the most recent
+``MAX_CACHED_RULESETS`` (32) of them. ``model_bundle`` compiles each
+bundled ruleset at build time and writes the code next to it; the bundle loader registers that file when it loads
+the ruleset, so a cold start loads code instead of building a tree.
+Other rulesets are interpreted until they have missed the result cache
+``ENDPOINT_RULES_COMPILE_AFTER`` (100) times, then compiled (``0``
+compiles them up front). With ``ENDPOINT_RULES_CACHE_DIR`` set, that
+code is also written there with ``marshal``, under a digest of the
+ruleset and this compiler's version, and later processes load it instead
+of compiling again. File names carry the interpreter's cache tag, so code
+from another Python version is never loaded.
+
+``install`` makes botocore's endpoint resolver use the compiled provider
+for every client created afterwards. Disabled with
+``ENDPOINT_RULES_COMPILED=false``.
+"""
+import builtins
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import botocore.regions
+from botocore.endpoint_provider import (
+    CACHE_SIZE,
+    STRING_FORMATTER,
+    TEMPLATE_STRING_RE,
+    EndpointProvider,
+    RuleSet,
+    RuleSetEndpoint,
+    RuleSetStandardLibrary,
+)
+from botocore.exceptions import EndpointResolutionError
+from botocore.utils import lru_cache_weakref
+
+from instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+COMPILER_VERSION = 1
+CACHE_EXT = '.marshal'
+DEFAULT_COMPILE_AFTER = CACHE_SIZE
+# Each session's loader hands out its own copy of a ruleset; a bound keeps
+# processes that create many sessions from pinning every copy
+MAX_CACHED_RULESETS = 32
+
+# Inlined equality checks; other types take the library call for its error
+PRELUDE = '''\
+def _boolean_equals(a, b):
+    if a.__class__ is bool and b.__class__ is bool:
+        return a is b
+    return lib_boolean_equals(a, b)
+
+
+def _string_equals(a, b):
+    if a.__class__ is str and b.__class__ is str:
+        return a == b
+    return lib_string_equals(a, b)
+'''
+BOOLEAN_FUNCTIONS = ('is_set', '_not', 'boolean_equals', 'string_equals')
+LIBRARY_NAMES = tuple(name for name in dir(RuleSetStandardLibrary) if not name.startswith('__'))
+
+_compiled = OrderedDict()
+_precompiled = OrderedDict()
+_lock = threading.Lock()
+
+
+class UnsupportedRuleset(Exception):
+    """The ruleset uses something the compiler cannot express."""
+
+
+def compiled_endpoints_enabled():
+    return os.environ.get('ENDPOINT_RULES_COMPILED', 'true').lower() == 'true'
+
+
+class _Compiler:
+    """Generates the source of a ``resolve(p)`` function for one ruleset."""
+
+    def __init__(self, ruleset_data):
+        self.parameters = set(ruleset_data['parameters'])
+        self.functions = []
+        self.counter = 0
+        self._lib = RuleSetStandardLibrary(None)
+
+    def compile(self, rules):
+        body = self.rules(rules, {}, 1)
+        self.functions.append('def resolve(p):\n' + body)
+        return PRELUDE + '\n\n' + '\n\n'.join(self.functions)
+
+    def name(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def rules(self, rules, scope, depth):
+        lines = []
+        for rule in rules:
+            lines.extend(self.rule(rule, scope, depth))
+        lines.append('    ' * depth + 'return None')
+        return '\n'.join(lines) + '\n'
+
+    def rule(self, rule, scope, depth):
+        lines = []
+        for condition in rule.get('conditions', []):
+            test, scope = self.condition(condition, scope)
+            lines.append('    ' * depth + f'if {test}:')
+            depth += 1
+        indent = '    ' * depth
+        rule_type = rule.get('type')
+        if rule_type == 'endpoint':
+            lines.append(indent + f'return {self.endpoint(rule["endpoint"], scope)}')
+        elif rule_type == 'error':
+            lines.append(indent + f'raise EndpointResolutionError(msg={self.value(rule["error"], scope)})')
+        elif rule_type == 'tree':
+            lines.extend(self.tree(rule['rules'], scope, indent))
+        else:
+            raise UnsupportedRuleset(f"Unknown rule type: {rule_type}")
+        return lines
+
+    def tree(self, rules, scope, indent):
+        # Each tree rule is its own function: nesting stays shallow and the
+        # children see exactly the variables assigned on the way down
+        function = self.name('_tree')
+        names = sorted(scope.values())
+        args = ', '.join(['p'] + names)
+        self.functions.append(f'def {function}({args}):\n' + self.rules(rules, dict(scope), 1))
+        return [indent + f'result = {function}({args})', indent + 'if result:', indent + '    return result']
+
+    def condition(self, condition, scope):
+        expression, function = self.call(condition, scope)
+        if 'assign' in condition:
+            assign = condition['assign']
+            if assign in scope or assign in self.parameters:
+                raise UnsupportedRuleset(f"Assignment {assign} shadows another variable")
+            var = self.name('v')
+            scope = dict(scope, **{assign: var})
+            return f'({var} := {expression}) is not False and {var} is not None', scope
+        if function in BOOLEAN_FUNCTIONS:
+            return expression, scope
+        return f'(r := {expression}) is not False and r is not None', scope
+
+    def call(self, signature, scope):
+        function = self._lib.convert_func_name(signature['fn'])
+        if function not in LIBRARY_NAMES:
+            raise UnsupportedRuleset(f"Unknown function: {signature['fn']}")
+        argv = signature['argv']
+        args = [self.value(arg, scope) for arg in argv]
+        if function == 'is_set' and len(args) == 1:
+            return f'({args[0]} is not None)', function
+        if function == '_not' and len(args) == 1:
+            return f'(not {args[0]})', function
+        if function in ('boolean_equals', 'string_equals') and len(args) == 2:
+            return f'_{function}({args[0]}, {args[1]})', function
+        if function == 'get_attr' and len(args) == 2 and self.plain_path(argv[1]):
+            return args[0] + ''.join(f'[{part!r}]' for part in argv[1].split('.')), function
+        return f'lib_{function}({", ".join(args)})', function
+
+    def plain_path(self, path):
+        # Without an index ``get_attr`` is plain subscription, errors included
+        return isinstance(path, str) and '[' not in path and not TEMPLATE_STRING_RE.search(path)
+
+    def value(self, value, scope):
+        if isinstance(value, dict) and 'fn' in value:
+            if 'assign' in value:
+                raise UnsupportedRuleset("Assignment outside a condition")
+            return self.call(value, scope)[0]
+        if isinstance(value, dict) and 'ref' in value:
+            ref = value['ref']
+            return scope[ref] if ref in scope else f'p.get({ref!r})'
+        if isinstance(value, str) and TEMPLATE_STRING_RE.search(value):
+            return self.template(value, scope)
+        return self.literal(value)
+
+    def template(self, value, scope):
+        parts = []
+        for literal, reference, _, _ in STRING_FORMATTER.parse(value):
+            if literal:
+                parts.append(repr(literal))
+            if reference is not None:
+                name, *attrs = reference.split('#')
+                expression = scope[name] if name in scope else f'p[{name!r}]'
+                parts.append('str(' + expression + ''.join(f'[{attr!r}]' for attr in attrs) + ')')
+        return '(' + ' + '.join(parts or ["''"]) + ')'
+
+    def literal(self, value):
+        if value is None or isinstance(value, (bool, int, str)):
+            return repr(value)
+        if isinstance(value, list):
+            return '[' + ', '.join(self.literal(v) for v in value) + ']'
+        if isinstance(value, dict):
+            return '{' + ', '.join(f'{k!r}: {self.literal(v)}' for k, v in value.items()) + '}'
+        raise UnsupportedRuleset(f"Unsupported literal: {value!r}")
+
+    def properties(self, properties, scope):
+        # ``EndpointRule.resolve_properties`` only resolves template strings
+        if isinstance(properties, list):
+            return '[' + ', '.join(self.properties(v, scope) for v in properties) + ']'
+        if isinstance(properties, dict):
+            return '{' + ', '.join(f'{k!r}: {self.properties(v, scope)}' for k, v in properties.items()) + '}'
+        if isinstance(properties, str) and TEMPLATE_STRING_RE.search(properties):
+            return self.template(properties, scope)
+        return self.literal(properties)
+
+    def endpoint(self, endpoint, scope):
+        url = self.value(endpoint['url'], scope)
+        properties = self.properties(endpoint.get('properties', {}), scope)
+        headers = '{' + ', '.join(
+            f'{header!r}: [' + ', '.join(self.value(item, scope) for item in values) + ']'
+            for header, values in endpoint.get('headers', {}).items()
+        ) + '}'
+        return f'RuleSetEndpoint(url={url}, properties={properties}, headers={headers})'
+
+
+def compile_ruleset(ruleset_data):
+    """Python source defining ``resolve(p)`` for ``ruleset_data``.
+
+    ``p`` is the processed input parameters; ``resolve`` returns a
+    ``RuleSetEndpoint`` or ``None``, or raises ``EndpointResolutionError``
+    for error rules, like ``RuleSet.evaluate``.
+    """
+    return _Compiler(ruleset_data).compile(ruleset_data['rules'])
+
+
+def compile_code(ruleset_data):
+    """``compile_ruleset`` as a code object, ready to ``marshal``."""
+    return compile(compile_ruleset(ruleset_data), '<endpoint-rules>', 'exec')
+
+
+def ruleset_digest(ruleset_data):
+    """Cache key for the compiled form of ``ruleset_data``."""
+    try:
+        # Bundled rulesets are plain dicts, which marshal serializes far
+        # faster than json; version 2 has no back-references, so the bytes
+        # do not depend on reference counts
+        serialized = marshal.dumps(ruleset_data, 2)
+    except ValueError:
+        serialized = json.dumps(ruleset_data, separators=(',', ':')).encode()
+    digest = hashlib.sha256(serialized)
+    digest.update(str(COMPILER_VERSION).encode())
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, f'{digest}.{sys.implementation.cache_tag}{CACHE_EXT}')
+
+
+def precompiled_path(ruleset_path):
+    """Where a model bundle keeps the code for the ruleset at ``ruleset_path`` (no extension)."""
+    return f'{ruleset_path}.compiled.{sys.implementation.cache_tag}{CACHE_EXT}'
+
+
+def write_code(path, code):
+    """``marshal`` ``code`` to ``path``, atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so concurrent readers never see a partial file
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as fp:
+        fp.write(marshal.dumps(code))
+    os.replace(temp_path, path)
+    return path
+
+
+def _read_code(path):
+    try:
+        with open(path, 'rb') as fp:
+            return marshal.loads(fp.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable compiled ruleset {path}: {str(e)}")
+        return None
+
+
+def register_precompiled(ruleset_data, path):
+    """Note that the code for the loaded ``ruleset_data`` may be at ``path``.
+
+    Called by the bundle loader, which knows which file the data came
+    from, so the ruleset never has to be hashed.
+    """
+    with _lock:
+        _remember(_precompiled, ruleset_data, path)
+
+
+def _lookup(cache, ruleset_data):
+    entry = cache.get(id(ruleset_data))
+    # Entries hold their data, so its id is not reused while they exist;
+    # checking identity as well means a stale entry can never match
+    if entry is not None and entry[0] is ruleset_data:
+        return entry
+    return None
+
+
+def _remember(cache, ruleset_data, value):
+    """Keep ``value`` for ``ruleset_data``, dropping the oldest entries past the bound."""
+    entry = (ruleset_data, value)
+    cache[id(ruleset_data)] = entry
+    cache.move_to_end(id(ruleset_data))
+    while len(cache) > MAX_CACHED_RULESETS:
+        cache.popitem(last=False)
+    return entry
+
+
+def _compile_or_load(ruleset_data):
+    cache_dir = os.environ.get('ENDPOINT_RULES_CACHE_DIR')
+    path = cache_path(cache_dir, ruleset_digest(ruleset_data)) if cache_dir else None
+    code = _read_code(path) if path is not None else None
+    if code is not None:
+        count('EndpointRulesetCacheHits')
+        return code
+    try:
+        code = compile_code(ruleset_data)
+    except (UnsupportedRuleset, KeyError, TypeError, SyntaxError, RecursionError) as e:
+        logger.warning(f"Endpoint ruleset not compiled, interpreting it instead: {str(e)}")
+        count('EndpointRulesetCompileFailures')
+        return None
+    count('EndpointRulesetCompiles')
+    if path is not None:
+        try:
+            write_code(path, code)
+        except OSError as e:
+            logger.debug(f"Compiled ruleset not cached: {str(e)}")
+    return code
+
+
+def _entry(ruleset_data, compile_missing):
+    entry = _lookup(_compiled, ruleset_data)
+    if entry is None:
+        with _lock:
+            entry = _lookup(_compiled, ruleset_data)
+            if entry is None:
+                precompiled = _lookup(_precompiled, ruleset_data)
+                code = _read_code(precompiled[1]) if precompiled is not None else None
+                if code is not None:
+                    count('EndpointRulesetCacheHits')
+                elif compile_missing:
+                    code = _compile_or_load(ruleset_data)
+                else:
+                    return None
+                entry = _remember(_compiled, ruleset_data, code)
+    return entry
+
+
+def compiled_code(ruleset_data):
+    """The code object for ``ruleset_data``, compiling it if needed.
+
+    Returns ``None`` if it does not compile. Cached per ruleset object
+    (see ``MAX_CACHED_RULESETS``); the loader hands every client of a
+    session the same one.
+    """
+    return _entry(ruleset_data, compile_missing=True)[1]
+
+
+def _namespace(rule_lib):
+    namespace = {
+        '__builtins__': builtins,
+        'RuleSetEndpoint': RuleSetEndpoint,
+        'EndpointResolutionError': EndpointResolutionError,
+    }
+    for name in LIBRARY_NAMES:
+        namespace[f'lib_{name}'] = getattr(rule_lib, name)
+    return namespace
+
+
+class CompiledRuleSet(RuleSet):
+    """``RuleSet`` that evaluates compiled code instead of a rule tree."""
+
+    def __init__(self, code, version, parameters, rules, partitions, documentation=None):
+        self.version = version
+        self.parameters = self._ingest_parameter_spec(parameters)
+        self.rules = None
+        self.rule_lib = RuleSetStandardLibrary(partitions)
+        self.documentation = documentation
+        namespace = _namespace(self.rule_lib)
+        exec(code, namespace)
+        self._resolve = namespace['resolve']
+
+    def evaluate(self, input_parameters):
+        self.process_input_parameters(input_parameters)
+        return self._resolve(input_parameters)
+
+
+class CompiledEndpointProvider(EndpointProvider):
+    """``EndpointProvider`` backed by ``CompiledRuleSet`` where the ruleset compiles.
+
+    Code already compiled in this process or shipped in the model bundle
+    is used from the start. Otherwise the ruleset is interpreted until
+    ``ENDPOINT_RULES_COMPILE_AFTER`` (100, the size of the result cache)
+    resolutions have missed the cache, then compiled or loaded from
+    ``ENDPOINT_RULES_CACHE_DIR``: compiling S3's rules takes about as long
+    as 150 interpreted resolutions, which short-lived processes would never
+    win back.
+    """
+
+    def __init__(self, ruleset_data, partition_data):
+        self._pending = None
+        self._misses = 0
+        compile_after = int(os.environ.get('ENDPOINT_RULES_COMPILE_AFTER', DEFAULT_COMPILE_AFTER))
+        entry = _entry(ruleset_data, compile_missing=compile_after <= 0)
+        if entry is not None and entry[1] is not None:
+            self.ruleset = CompiledRuleSet(entry[1], **ruleset_data, partitions=partition_data)
+            return
+        super().__init__(ruleset_data, partition_data)
+        if entry is None:
+            self._pending = (ruleset_data, partition_data, compile_after)
+
+    @lru_cache_weakref(maxsize=CACHE_SIZE)
+    def resolve_endpoint(self, **input_parameters):
+        if self._pending is not None:
+            self._count_miss()
+        return EndpointProvider.resolve_endpoint.__wrapped__(self, **input_parameters)
+
+    def _count_miss(self):
+        self._misses += 1
+        pending = self._pending
+        if pending is None or self._misses < pending[2]:
+            return
+        self._pending = None
+        ruleset_data, partition_data, _ = pending
+        code = compiled_code(ruleset_data)
+        if code is not None:
+            self.ruleset = CompiledRuleSet(code, **ruleset_data, partitions=partition_data)
+
+
+def install():
+    """Resolve endpoints of clients created from now on with compiled rulesets.
+
+    Returns whether the compiled provider is in use.
+    """
+    if not compiled_endpoints_enabled():
+        return False
+    botocore.regions.EndpointProvider = CompiledEndpointProvider
+    return True
+
+
+def reset_endpoint_rules():
+    """Restore botocore's provider and forget every compiled ruleset."""
+    botocore.regions.EndpointProvider = EndpointProvider
+    with _lock:
+        _compiled.clear()
+        _precompiled.clear()
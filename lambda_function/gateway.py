@@ -0,0 +1,411 @@
+"""Long-running HTTP gateway around ``lambda_handler``.
+
+Lambda invokes the handler once per event; on Kubernetes the same logic
+serves sustained traffic from this asyncio server instead::
+
+    python gateway.py --port 8000 --metrics-port 8080
+
+``Dockerfile.gateway`` builds the image ``k8s/deployment.yaml`` runs.
+
+Routes:
+
+- ``POST /invocations``: the request body is the inference payload, passed
+  to the handler as an API Gateway proxy event (headers, content type and
+  ``Accept`` included; binary bodies base64 encoded);
+- ``POST /events``: the JSON body is a complete Lambda event, e.g.
+  ``{"records": [...]}`` batches;
+- ``GET /metrics``: Prometheus text exposition of request counts, latency
+  histograms, in-flight requests and endpoint errors;
+- ``GET /healthz`` (liveness) and ``GET /readyz`` (readiness, 503 while
+  draining).
+
+HTTP/1.1 connections are kept alive for ``GATEWAY_KEEPALIVE_SECONDS`` (75)
+between requests. The handler is synchronous (botocore), so it runs on a
+thread pool with at most ``GATEWAY_MAX_CONCURRENCY`` (32) calls at once; up
+to ``GATEWAY_MAX_PENDING`` (128) more wait, and anything beyond is answered
+503 straight away. On SIGTERM the gateway stops accepting, reports not
+ready, closes idle connections and lets in-flight requests finish for up to
+``GATEWAY_DRAIN_SECONDS`` (25) before exiting.
+
+The per-invocation EMF metrics (``INFERENCE_METRICS_ENABLED``) assume one
+invocation at a time and are meant for Lambda; use ``/metrics`` here.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import signal
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from lambda_function import lambda_handler
+from payload_formats import is_binary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MAX_PENDING = 128
+DEFAULT_KEEPALIVE_SECONDS = 75.0
+DEFAULT_DRAIN_SECONDS = 25.0
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 32 * 1024 * 1024
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+INVOCATION_ROUTES = ('/invocations', '/events')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Metrics:
+    """Prometheus counters, gauge and histogram, updated on the event loop."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.requests = defaultdict(int)
+        self.endpoint_errors = defaultdict(int)
+        self.latency = {}
+        self.in_flight = 0
+        self.pending = 0
+
+    def observe(self, method, route, status, seconds):
+        self.requests[(method, route, str(status))] += 1
+        histogram = self.latency.setdefault(route, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+        if route in INVOCATION_ROUTES and status >= 500:
+            self.endpoint_errors[str(status)] += 1
+
+    def render(self):
+        lines = [
+            '# HELP gateway_requests_total HTTP requests handled, by method, route and status.',
+            '# TYPE gateway_requests_total counter',
+        ]
+        for key, value in sorted(self.requests.items()):
+            lines.append(f'gateway_requests_total{{{_labels(("method", "route", "status"), key)}}} {value}')
+        lines += [
+            '# HELP gateway_request_duration_seconds Time from request read to response written.',
+            '# TYPE gateway_request_duration_seconds histogram',
+        ]
+        for route, (counts, total, n) in sorted(self.latency.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'gateway_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {count}')
+            lines.append(f'gateway_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {n}')
+            lines.append(f'gateway_request_duration_seconds_sum{{route="{route}"}} {total}')
+            lines.append(f'gateway_request_duration_seconds_count{{route="{route}"}} {n}')
+        lines += [
+            '# HELP gateway_requests_in_flight Invocations currently running the handler.',
+            '# TYPE gateway_requests_in_flight gauge',
+            f'gateway_requests_in_flight {self.in_flight}',
+            '# HELP gateway_requests_pending Invocations waiting for a free handler slot.',
+            '# TYPE gateway_requests_pending gauge',
+            f'gateway_requests_pending {self.pending}',
+            '# HELP gateway_endpoint_errors_total Invocations answered with a 5xx, by status.',
+            '# TYPE gateway_endpoint_errors_total counter',
+        ]
+        for status, value in sorted(self.endpoint_errors.items()):
+            lines.append(f'gateway_endpoint_errors_total{{status="{status}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def build_event(method, target, headers, body):
+    """An API Gateway proxy event for one ``/invocations`` request."""
+    url = urlsplit(target)
+    event = {
+        'httpMethod': method,
+        'path': url.path,
+        'headers': headers,
+        'queryStringParameters': dict(parse_qsl(url.query)) or None,
+    }
+    if body:
+        if is_binary(headers.get('content-type')):
+            event['body'] = base64.b64encode(body).decode('ascii')
+            event['isBase64Encoded'] = True
+        else:
+            try:
+                event['body'] = body.decode('utf-8')
+            except UnicodeDecodeError:
+                event['body'] = base64.b64encode(body).decode('ascii')
+                event['isBase64Encoded'] = True
+    return event
+
+
+def http_result(response, accept=None):
+    """``(status, headers, body bytes)`` from a handler response dict."""
+    if 'statusCode' not in response:
+        # SQS partial batch responses carry no status
+        return 200, {'Content-Type': 'application/json'}, json.dumps(response).encode('utf-8')
+    status = response['statusCode']
+    body = response.get('body', '')
+    if response.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    elif not isinstance(body, bytes):
+        body = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+    headers = dict(response.get('headers') or {})
+    if not any(name.lower() == 'content-type' for name in headers):
+        if status >= 400:
+            headers['Content-Type'] = 'text/plain; charset=utf-8'
+        else:
+            headers['Content-Type'] = accept if accept and accept != '*/*' else 'application/json'
+    return status, headers, body
+
+
+class Gateway:
+    """asyncio HTTP/1.1 server dispatching to a synchronous handler."""
+
+    def __init__(self, handler=None, max_concurrency=None, max_pending=None, keepalive_seconds=None,
+                 drain_seconds=None):
+        self.handler = handler or lambda_handler
+        self.max_concurrency = max_concurrency or int(
+            os.environ.get('GATEWAY_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+        self.max_pending = max_pending if max_pending is not None else int(
+            os.environ.get('GATEWAY_MAX_PENDING', DEFAULT_MAX_PENDING))
+        self.keepalive_seconds = keepalive_seconds or float(
+            os.environ.get('GATEWAY_KEEPALIVE_SECONDS', DEFAULT_KEEPALIVE_SECONDS))
+        self.drain_seconds = drain_seconds if drain_seconds is not None else float(
+            os.environ.get('GATEWAY_DRAIN_SECONDS', DEFAULT_DRAIN_SECONDS))
+        self.metrics = Metrics()
+        self.draining = False
+        self._servers = []
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gateway')
+        self._slots = None
+        self._idle = set()
+        self._connections = set()
+        self._stopped = None
+
+    async def start(self, host='0.0.0.0', port=8000, metrics_port=None):
+        """Listen on ``port`` (and ``metrics_port``); returns the bound ports."""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._stopped = asyncio.Event()
+        ports = []
+        for p in (port, metrics_port):
+            if p is None:
+                continue
+            server = await asyncio.start_server(self._serve_connection, host, p, limit=MAX_HEADER_BYTES)
+            self._servers.append(server)
+            ports.append(server.sockets[0].getsockname()[1])
+        return ports
+
+    async def serve_forever(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(self.drain()))
+        await self._stopped.wait()
+
+    async def drain(self):
+        """Stop accepting, finish in-flight requests, then close everything."""
+        if self.draining:
+            return
+        self.draining = True
+        logger.info(f"Draining: {self.metrics.in_flight} in flight, {self.metrics.pending} pending")
+        for server in self._servers:
+            server.close()
+        for writer in list(self._idle):
+            writer.close()
+        deadline = time.monotonic() + self.drain_seconds
+        while (self.metrics.in_flight or self.metrics.pending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for writer in list(self._connections):
+            writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._executor.shutdown(wait=False)
+        self._stopped.set()
+
+    async def _serve_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while not self.draining:
+                self._idle.add(writer)
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_seconds)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HTTPError as e:
+                    await self._write(writer, e.status, {'Content-Type': 'text/plain; charset=utf-8'},
+                                      str(e).encode('utf-8'), keep_alive=False)
+                    return
+                finally:
+                    self._idle.discard(writer)
+                if request is None:
+                    return
+                method, target, version, headers, body = request
+                started = time.perf_counter()
+                route = self._route(urlsplit(target).path)
+                status, response_headers, response_body = await self._dispatch(method, route, target, headers, body)
+                keep_alive = self._keep_alive(version, headers) and not self.draining
+                await self._write(writer, status, response_headers, response_body, keep_alive)
+                self.metrics.observe(method, route, status, time.perf_counter() - started)
+                if not keep_alive:
+                    return
+        finally:
+            self._connections.discard(writer)
+            self._idle.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        else:
+            try:
+                length = int(headers.get('content-length') or 0)
+            except ValueError:
+                raise HTTPError(400, "Malformed Content-Length")
+            if length < 0:
+                raise HTTPError(400, "Malformed Content-Length")
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+            body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    async def _read_chunked(self, reader):
+        chunks, size = [], 0
+        while True:
+            line = await reader.readline()
+            try:
+                length = int(line.split(b';')[0].strip() or b'0', 16)
+            except ValueError:
+                raise HTTPError(400, "Malformed chunk size")
+            if length < 0:
+                raise HTTPError(400, "Malformed chunk size")
+            if length == 0:
+                # Trailers end with an empty line
+                while (await reader.readline()).strip():
+                    pass
+                return b''.join(chunks)
+            size += length
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+            chunks.append(await reader.readexactly(length))
+            await reader.readline()
+
+    @staticmethod
+    def _route(path):
+        if path in ('/', '/invocations'):
+            return '/invocations'
+        if path in ('/events', '/metrics', '/healthz', '/readyz'):
+            return path
+        return 'other'
+
+    @staticmethod
+    def _keep_alive(version, headers):
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def _dispatch(self, method, route, target, headers, body):
+        text = {'Content-Type': 'text/plain; charset=utf-8'}
+        if route == '/metrics' and method == 'GET':
+            return 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, \
+                self.metrics.render().encode('utf-8')
+        if route == '/healthz' and method == 'GET':
+            return 200, text, b'ok'
+        if route == '/readyz' and method == 'GET':
+            return (503, text, b'draining') if self.draining else (200, text, b'ready')
+        if route not in INVOCATION_ROUTES:
+            return 404, text, b'Not found'
+        if method != 'POST':
+            return 405, dict(text, Allow='POST'), b'Method not allowed'
+
+        if route == '/events':
+            try:
+                event = json.loads(body or b'{}')
+            except ValueError as e:
+                return 400, text, f"Invalid event JSON: {str(e)}".encode('utf-8')
+        else:
+            event = build_event(method, target, headers, body)
+        return await self._invoke(event, headers.get('accept'))
+
+    async def _invoke(self, event, accept):
+        text = {'Content-Type': 'text/plain; charset=utf-8'}
+        if self._slots.locked() and self.metrics.pending >= self.max_pending:
+            return 503, dict(text, **{'Retry-After': '1'}), b'Gateway at capacity'
+        self.metrics.pending += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.metrics.pending -= 1
+        self.metrics.in_flight += 1
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(self._executor, self.handler, event, None)
+            return http_result(response, accept)
+        except Exception as e:
+            logger.error(f"Handler failed: {str(e)}", exc_info=True)
+            return 500, text, f"Error invoking SageMaker: {str(e)}".encode('utf-8')
+        finally:
+            self.metrics.in_flight -= 1
+            self._slots.release()
+
+    async def _write(self, writer, status, headers, body, keep_alive):
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ''
+        lines = [f'HTTP/1.1 {status} {reason}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        lines.append(f'Content-Length: {len(body)}')
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        if keep_alive:
+            lines.append(f'Keep-Alive: timeout={int(self.keepalive_seconds)}')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def _run(args):
+    gateway = Gateway()
+    ports = await gateway.start(args.host, args.port, args.metrics_port)
+    logger.info(f"Gateway listening on {args.host}:{', '.join(str(p) for p in ports)}")
+    await gateway.serve_forever()
+    logger.info("Gateway drained")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-running HTTP gateway for SageMaker inference')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='also serve /metrics and health checks on this port')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Hedged SageMaker requests to cut tail latency.
+
+The primary request goes to the router's best target. If it has not
+returned within the configured percentile of recent latency, a duplicate is
+sent to the next best target (or the same endpoint when the table has only
+one, which usually lands on a different instance) and the first successful
+response wins. The loser is left to finish in the background and still
+feeds the router's latency estimates.
+
+Hedges are paid for from a credit budget that accrues a fixed fraction of a
+request per call, so duplicates stay bounded to that fraction of traffic.
+
+Enabled with ``SAGEMAKER_HEDGING_ENABLED=true``. Settings:
+``SAGEMAKER_HEDGE_PERCENTILE`` (95), ``SAGEMAKER_HEDGE_MAX_FRACTION`` (0.05)
+and ``SAGEMAKER_HEDGE_MAX_WORKERS`` (32).
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from instrumentation import count
+from routing import is_target_failure
+
+DEFAULT_PERCENTILE = 95.0
+DEFAULT_MAX_FRACTION = 0.05
+DEFAULT_MAX_WORKERS = 32
+DEFAULT_WINDOW = 200
+MIN_SAMPLES = 20
+MIN_DELAY_SECONDS = 0.005
+
+
+def hedging_enabled():
+    return os.environ.get('SAGEMAKER_HEDGING_ENABLED', 'false').lower() == 'true'
+
+
+class LatencyWindow:
+    """Most recent successful latencies, for percentile lookups."""
+
+    def __init__(self, size=DEFAULT_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100.0 * len(samples))) - 1))
+        return samples[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class HedgeBudget:
+    """Credits accrue ``max_fraction`` per request; a hedge spends one."""
+
+    def __init__(self, max_fraction=DEFAULT_MAX_FRACTION, max_credits=10.0):
+        self.max_fraction = max_fraction
+        self.max_credits = max_credits
+        self._credits = 0.0
+        self._lock = threading.Lock()
+
+    def on_request(self):
+        with self._lock:
+            self._credits = min(self.max_credits, self._credits + self.max_fraction)
+
+    def try_spend(self):
+        with self._lock:
+            # Tolerate float drift from summing fractions like 0.1
+            if self._credits >= 1.0 - 1e-9:
+                self._credits -= 1.0
+                return True
+            return False
+
+
+class Hedger:
+    """Send a backup request when the primary is slower than usual."""
+
+    def __init__(self, router, percentile=DEFAULT_PERCENTILE, budget=None,
+                 max_workers=DEFAULT_MAX_WORKERS, window=None):
+        self.router = router
+        self.percentile = percentile
+        self.budget = budget or HedgeBudget()
+        self.window = window or LatencyWindow()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+
+    def hedge_delay(self):
+        """How long to wait for the primary, or None while still warming up."""
+        if len(self.window) < MIN_SAMPLES:
+            return None
+        return max(MIN_DELAY_SECONDS, self.window.percentile(self.percentile))
+
+    def _submit(self, invoke, target, payload):
+        def run():
+            started = time.perf_counter()
+            try:
+                result = invoke(target, payload)
+            except Exception as e:
+                if is_target_failure(e):
+                    self.router.observe(target, time.perf_counter() - started, ok=False)
+                raise
+            elapsed = time.perf_counter() - started
+            self.router.observe(target, elapsed, ok=True)
+            self.window.add(elapsed)
+            return result
+        return self._executor.submit(run)
+
+    def call(self, invoke, payload):
+        """Route ``invoke(target, payload)``, hedging if the primary is slow."""
+        self.budget.on_request()
+        primary = self.router.choose()
+        first = self._submit(invoke, primary, payload)
+        delay = self.hedge_delay()
+        if delay is None:
+            return first.result()
+        done, _ = wait([first], timeout=delay)
+        if done or not self.budget.try_spend():
+            return first.result()
+
+        backup = self.router.choose(exclude=(primary,)) or primary
+        count('HedgedRequests')
+        second = self._submit(invoke, backup, payload)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        count('HedgeWins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(router):
+    """Return the process-wide hedger for ``router``."""
+    hedger = _hedgers.get(router)
+    if hedger is None:
+        with _hedgers_lock:
+            hedger = _hedgers.get(router)
+            if hedger is None:
+                hedger = Hedger(
+                    router,
+                    percentile=float(os.environ.get('SAGEMAKER_HEDGE_PERCENTILE', DEFAULT_PERCENTILE)),
+                    budget=HedgeBudget(float(os.environ.get('SAGEMAKER_HEDGE_MAX_FRACTION', DEFAULT_MAX_FRACTION))),
+                    max_workers=int(os.environ.get('SAGEMAKER_HEDGE_MAX_WORKERS', DEFAULT_MAX_WORKERS)),
+                )
+                _hedgers[router] = hedger
+    return hedger
+
+
+def reset_hedgers():
+    with _hedgers_lock:
+        _hedgers.clear()
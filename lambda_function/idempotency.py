@@ -0,0 +1,290 @@
+"""Idempotent inference for at-least-once event sources.
+
+EventBridge and SQS may deliver an event more than once, and every
+duplicate would otherwise run the same (expensive) inference again. Each
+request is therefore given an idempotency key:
+
+- the event's ``idempotencyKey`` field (``IDEMPOTENCY_KEY_FIELD``) or its
+  ``Idempotency-Key`` header, or
+- with ``IDEMPOTENCY_HASH_PAYLOAD=true``, a SHA-256 of the endpoint,
+  content type and payload. This is off by default: scheduled rules send
+  the same constant input every time and must not be collapsed.
+
+The first delivery claims the key with an IN_PROGRESS record and stores its
+response as COMPLETED; duplicates get that response back without calling
+the endpoint. A duplicate arriving while the first is still running gets
+409 (or, inside an SQS batch, a message failure so it is redelivered
+later). Failed calls and 5xx responses release the key so retries run.
+Store errors never fail a request: if the key cannot be claimed the
+request runs without it, and if the result cannot be stored (item too
+large, throttling) the key is released and the result still returned.
+
+Each SQS message is its own request: its key comes from the same field in
+the JSON message body, or the payload hash.
+
+Enabled with ``IDEMPOTENCY_ENABLED=true``. Records live in
+``IDEMPOTENCY_TABLE`` (DynamoDB table with an ``idempotency_key`` string
+hash key and TTL on ``expires_at``), claimed with a conditional write, or in
+process memory without one. Completed results are kept for
+``IDEMPOTENCY_TTL_SECONDS`` (3600); an IN_PROGRESS claim expires after
+``IDEMPOTENCY_IN_PROGRESS_SECONDS`` (900, the Lambda maximum) so a crashed
+invocation cannot block its key forever.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from boto3.dynamodb.conditions import Attr, ConditionExpressionBuilder
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from clients import get_client
+from instrumentation import count
+from payload_formats import header, request_content_type
+from result_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+DEFAULT_KEY_FIELD = 'idempotencyKey'
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_IN_PROGRESS_SECONDS = 900
+
+
+class RequestInProgress(Exception):
+    """Raised for a duplicate of a request that has not finished yet."""
+
+
+def key_field():
+    return os.environ.get('IDEMPOTENCY_KEY_FIELD', DEFAULT_KEY_FIELD)
+
+
+def hash_payload():
+    return os.environ.get('IDEMPOTENCY_HASH_PAYLOAD', 'false').lower() == 'true'
+
+
+def event_key(event, endpoint_name, payload):
+    """The idempotency key of a direct or EventBridge event, or None."""
+    key = event.get(key_field()) or header(event, 'idempotency-key')
+    if key:
+        return f"{endpoint_name}#{key}"
+    if hash_payload():
+        return f"{endpoint_name}#{cache_key(endpoint_name, request_content_type(event), payload)}"
+    return None
+
+
+def payload_key(payload, endpoint_name, content_type='application/json'):
+    """The idempotency key of one SQS message body, or None."""
+    key = None
+    if isinstance(payload, (str, bytes)) and payload[:1] in ('{', b'{'):
+        try:
+            body = json.loads(payload)
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            key = body.get(key_field())
+    if key:
+        return f"{endpoint_name}#{key}"
+    if hash_payload():
+        return f"{endpoint_name}#{cache_key(endpoint_name, content_type, payload)}"
+    return None
+
+
+class InMemoryStore:
+    """Process-local record store; also the local stand-in for DynamoDB."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, in_progress_seconds):
+        """Claim ``key``; returns None on success or the live record holding it."""
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record['expires_at'] > self._clock():
+                return dict(record)
+            self._records[key] = {'status': IN_PROGRESS, 'expires_at': self._clock() + in_progress_seconds}
+            return None
+
+    def complete(self, key, result, ttl_seconds):
+        with self._lock:
+            self._records[key] = {'status': COMPLETED, 'result': result, 'expires_at': self._clock() + ttl_seconds}
+
+    def release(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class DynamoDBStore:
+    """Record store backed by a DynamoDB table.
+
+    Keys are claimed with a conditional ``PutItem`` that only succeeds when
+    no live record exists, so concurrent duplicates in different containers
+    cannot both run. Expired records count as absent, since DynamoDB TTL
+    deletion is lazy.
+    """
+
+    def __init__(self, table_name, client=None, clock=time.time):
+        self.table_name = table_name
+        self._client = client or get_client('dynamodb')
+        self._clock = clock
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+        self._builder = ConditionExpressionBuilder()
+
+    def _serialize(self, item):
+        return {k: self._serializer.serialize(v) for k, v in item.items()}
+
+    def _condition(self, condition):
+        expression = self._builder.build_expression(condition)
+        self._builder.reset()
+        return {
+            'ConditionExpression': expression.condition_expression,
+            'ExpressionAttributeNames': expression.attribute_name_placeholders,
+            'ExpressionAttributeValues': self._serialize(expression.attribute_value_placeholders),
+        }
+
+    def _record(self, item):
+        item = {k: self._deserializer.deserialize(v) for k, v in item.items()}
+        record = {'status': item['status'], 'expires_at': int(item['expires_at'])}
+        if 'result' in item:
+            result = item['result']
+            # Byte results are stored as a DynamoDB binary attribute
+            record['result'] = result.value if isinstance(result, Binary) else result
+        elif 'result_json' in item:
+            record['result'] = json.loads(item['result_json'])
+        return record
+
+    def acquire(self, key, in_progress_seconds):
+        now = int(self._clock())
+        item = {'idempotency_key': key, 'status': IN_PROGRESS, 'expires_at': now + in_progress_seconds}
+        try:
+            self._client.put_item(
+                TableName=self.table_name,
+                Item=self._serialize(item),
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+                **self._condition(Attr('idempotency_key').not_exists() | Attr('expires_at').lte(now)),
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return self._record(e.response['Item'])
+        return None
+
+    def complete(self, key, result, ttl_seconds):
+        item = {'idempotency_key': key, 'status': COMPLETED, 'expires_at': int(self._clock() + ttl_seconds)}
+        if isinstance(result, (bytes, str)):
+            item['result'] = result
+        else:
+            # Handler responses hold ints, which DynamoDB would return as Decimal
+            item['result_json'] = json.dumps(result)
+        self._client.put_item(TableName=self.table_name, Item=self._serialize(item))
+
+    def release(self, key):
+        self._client.delete_item(TableName=self.table_name, Key={'idempotency_key': {'S': key}})
+
+
+class Idempotency:
+    """Runs each keyed request at most once within the record TTL."""
+
+    def __init__(self, store, ttl_seconds=DEFAULT_TTL_SECONDS, in_progress_seconds=DEFAULT_IN_PROGRESS_SECONDS):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.in_progress_seconds = in_progress_seconds
+
+    def call(self, key, func, *args, succeeded=None):
+        """Return ``func(*args)``, or the stored result of an earlier call.
+
+        Results for which ``succeeded(result)`` is false are not stored, so a
+        later delivery runs again. Raises ``RequestInProgress`` while another
+        delivery holds the key.
+        """
+        try:
+            record = self.store.acquire(key, self.in_progress_seconds)
+        except Exception as e:
+            # Without the store, run the request rather than fail it
+            logger.error(f"Could not claim idempotency key {key}, running without it: {str(e)}")
+            count('IdempotencyStoreErrors')
+            return func(*args)
+        if record is not None:
+            if record['status'] == COMPLETED:
+                count('IdempotentHits')
+                logger.info(f"Duplicate request {key}, returning the stored result")
+                return record['result']
+            count('IdempotentInProgress')
+            raise RequestInProgress(f"Request {key} is already in progress")
+        try:
+            result = func(*args)
+        except BaseException:
+            self._release(key)
+            raise
+        if succeeded is not None and not succeeded(result):
+            self._release(key)
+            return result
+        try:
+            self.store.complete(key, result, self.ttl_seconds)
+        except Exception as e:
+            # The result is still good; free the key so redeliveries are not
+            # answered 409 until the claim expires
+            logger.error(f"Could not store the result for idempotency key {key}: {str(e)}")
+            count('IdempotencyStoreErrors')
+            self._release(key)
+        return result
+
+    def _release(self, key):
+        try:
+            self.store.release(key)
+        except Exception as e:
+            logger.error(f"Could not release idempotency key {key}: {str(e)}")
+            count('IdempotencyStoreErrors')
+
+    def handle(self, key, handle):
+        """Run ``handle()`` for one event; 5xx responses are not stored."""
+        try:
+            return self.call(key, handle, succeeded=lambda r: r.get('statusCode', 200) < 500)
+        except RequestInProgress as e:
+            return {'statusCode': 409, 'body': str(e)}
+
+    def wrap(self, invoke, endpoint_name, content_type='application/json'):
+        """Return ``invoke`` deduplicated per payload, for SQS message bodies."""
+        def idempotent_invoke(payload):
+            key = payload_key(payload, endpoint_name, content_type)
+            if key is None:
+                return invoke(payload)
+            return self.call(key, invoke, payload)
+        return idempotent_invoke
+
+
+_idempotency = None
+_idempotency_lock = threading.Lock()
+
+
+def idempotency_enabled():
+    return os.environ.get('IDEMPOTENCY_ENABLED', 'false').lower() == 'true'
+
+
+def get_idempotency():
+    """Return the process-wide instance, built from the environment on first use."""
+    global _idempotency
+    if _idempotency is None:
+        with _idempotency_lock:
+            if _idempotency is None:
+                table_name = os.environ.get('IDEMPOTENCY_TABLE')
+                _idempotency = Idempotency(
+                    DynamoDBStore(table_name) if table_name else InMemoryStore(),
+                    ttl_seconds=int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', DEFAULT_TTL_SECONDS)),
+                    in_progress_seconds=int(
+                        os.environ.get('IDEMPOTENCY_IN_PROGRESS_SECONDS', DEFAULT_IN_PROGRESS_SECONDS)
+                    ),
+                )
+    return _idempotency
+
+
+def reset_idempotency():
+    global _idempotency
+    with _idempotency_lock:
+        _idempotency = None
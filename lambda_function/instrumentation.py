@@ -0,0 +1,164 @@
+"""Per-phase latency of SageMaker calls, emitted as CloudWatch EMF.
+
+botocore emits events at each stage of an API call. Handlers registered on
+the ``sagemaker-runtime`` client's emitter timestamp those stages, giving:
+
+- ``SerializeLatency``: ``before-parameter-build`` to ``before-call``
+  (endpoint resolution and request serialization)
+- ``SignLatency``: ``before-call`` to ``before-send`` (request creation and
+  SigV4 signing)
+- ``NetworkLatency``: ``before-send`` to ``before-parse``, summed over retries
+- ``ParseLatency``: ``before-parse`` to ``after-call``
+
+The handler adds ``ClientInitLatency``, ``BodyReadLatency`` and
+``EndToEndLatency``. One EMF JSON line per invocation is printed to stdout,
+where the Lambda log agent turns it into CloudWatch metrics.
+
+Enabled with ``INFERENCE_METRICS_ENABLED=true``; namespace from
+``INFERENCE_METRICS_NAMESPACE``. When disabled no handlers are registered
+and ``record`` is a single ``None`` check.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+DEFAULT_NAMESPACE = 'Orchestration/Inference'
+SERVICE_ID = 'sagemaker-runtime'
+
+_marks = threading.local()
+_active = None
+
+
+def metrics_enabled():
+    return os.environ.get('INFERENCE_METRICS_ENABLED', 'false').lower() == 'true'
+
+
+class InvocationMetrics:
+    """Phase durations and counters accumulated over one invocation."""
+
+    def __init__(self, namespace=None, clock=time.perf_counter):
+        self.namespace = namespace or os.environ.get('INFERENCE_METRICS_NAMESPACE', DEFAULT_NAMESPACE)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.latencies = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def add_latency(self, name, seconds):
+        with self._lock:
+            self.latencies[name] += seconds * 1000.0
+
+    def add_count(self, name, value=1):
+        with self._lock:
+            self.counts[name] += value
+
+    def to_emf(self, dimensions=None, timestamp=None):
+        """Build the EMF document for this invocation."""
+        dimensions = dimensions or {}
+        self.latencies.setdefault('EndToEndLatency', (self._clock() - self.started) * 1000.0)
+        metrics = [{'Name': name, 'Unit': 'Milliseconds'} for name in self.latencies]
+        metrics += [{'Name': name, 'Unit': 'Count'} for name in self.counts]
+        document = {
+            '_aws': {
+                'Timestamp': int((timestamp or time.time()) * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [sorted(dimensions)],
+                    'Metrics': metrics,
+                }],
+            },
+        }
+        document.update(dimensions)
+        document.update({name: round(value, 3) for name, value in self.latencies.items()})
+        document.update(self.counts)
+        return document
+
+
+def start_invocation():
+    """Make a fresh ``InvocationMetrics`` the target of recorded phases."""
+    global _active
+    _active = InvocationMetrics()
+    return _active
+
+
+def finish_invocation(dimensions=None, stream=None):
+    """Emit the active invocation's EMF line and clear it."""
+    global _active
+    metrics, _active = _active, None
+    if metrics is None:
+        return None
+    document = metrics.to_emf(dimensions)
+    (stream or sys.stdout).write(json.dumps(document, separators=(',', ':')) + '\n')
+    return document
+
+
+def record(name, seconds):
+    """Add a handler-measured phase; a no-op unless an invocation is active."""
+    if _active is not None:
+        _active.add_latency(name, seconds)
+
+
+def count(name, value=1):
+    """Add to a handler-level counter; a no-op unless an invocation is active."""
+    if _active is not None:
+        _active.add_count(name, value)
+
+
+def _mark(name):
+    now = time.perf_counter()
+    previous = getattr(_marks, 'last', None)
+    _marks.last = (name, now)
+    return previous, now
+
+
+def _on_before_parameter_build(**kwargs):
+    _mark('start')
+    _marks.attempts = 0
+
+
+def _on_before_call(**kwargs):
+    previous, now = _mark('serialized')
+    if previous is not None:
+        record('SerializeLatency', now - previous[1])
+
+
+def _on_before_send(**kwargs):
+    previous, now = _mark('sent')
+    if previous is not None and previous[0] == 'serialized':
+        record('SignLatency', now - previous[1])
+    _marks.attempts = getattr(_marks, 'attempts', 0) + 1
+
+
+def _on_before_parse(**kwargs):
+    previous, now = _mark('received')
+    if previous is not None and previous[0] == 'sent':
+        record('NetworkLatency', now - previous[1])
+
+
+def _on_after_call(**kwargs):
+    previous, now = _mark('parsed')
+    if previous is not None and previous[0] == 'received':
+        record('ParseLatency', now - previous[1])
+    if _active is not None:
+        _active.add_count('EndpointCalls')
+        _active.add_count('EndpointRetries', max(getattr(_marks, 'attempts', 1) - 1, 0))
+    _marks.last = None
+
+
+_HANDLERS = (
+    ('before-parameter-build', _on_before_parameter_build),
+    ('before-call', _on_before_call),
+    ('before-send', _on_before_send),
+    ('before-parse', _on_before_parse),
+    ('after-call', _on_after_call),
+)
+
+
+def instrument_client(client):
+    """Register the phase handlers on ``client``; repeat calls are no-ops."""
+    for event, handler in _HANDLERS:
+        client.meta.events.register(f'{event}.{SERVICE_ID}', handler, unique_id=f'phase-timing-{event}')
+    return client
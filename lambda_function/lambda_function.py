@@ -1,29 +1,102 @@
-import boto3
 import os
 import logging
+import time
+
+from async_inference import (
+    SYNC_PAYLOAD_LIMIT, collect_completions, is_completion_event, payload_size, should_invoke_async, submit,
+)
+from batching import invoke_batch, invoke_sqs_batch, is_sqs_event
+from clients import get_client, reset_clients
+from request_compression import configured_encoding, decode_body, enable_compression
+from deadlines import Deadline, TIMEOUT_ERRORS
+from hedging import get_hedger, hedging_enabled
+from idempotency import event_key, get_idempotency, idempotency_enabled
+from instrumentation import (
+    finish_invocation, instrument_client, metrics_enabled, record, start_invocation,
+)
+from overload_protection import LoadShed, get_protector, protect_client, protection_enabled
+from payload_formats import http_response, request_body, request_content_type, response_accept
+from payload_logging import PayloadLog, should_log_full
+from result_cache import cache_enabled, get_cache
+from routing import configured_routes, get_router
+from s3_batch import ProcessingIncomplete, is_s3_event, process_s3_event
+from signing import enable_signing_cache, signing_cache_enabled
+from streaming import collect, iter_payload_parts, streaming_enabled
+from warmers import is_warmer, warm
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def lambda_handler(event, context):
-    # Moved client creation into function so it can be mocked
-    sagemaker_client = boto3.client('sagemaker-runtime')
-    endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'default-endpoint')
-    payload = event.get("body", "{}")
+def invoke_endpoint(sagemaker_client, endpoint_name, payload, target_variant=None,
+                    content_type='application/json', accept=None):
+    full = should_log_full(logger)
+    logger.info("Invoking SageMaker endpoint: %s", PayloadLog('request', endpoint_name, payload, full))
+    params = {}
+    if target_variant:
+        params['TargetVariant'] = target_variant
+    if accept:
+        params['Accept'] = accept
+    response = sagemaker_client.invoke_endpoint(
+        EndpointName=endpoint_name,
+        ContentType=content_type,
+        Body=payload,
+        **params
+    )
+    read_started = time.perf_counter()
+    # Raw bytes: binary formats must not be decoded, and text is decoded
+    # once when the handler builds its response
+    result = decode_body(response, response['Body'].read())
+    record('BodyReadLatency', time.perf_counter() - read_started)
+    logger.info("SageMaker response: %s", PayloadLog('response', endpoint_name, result, full))
+    return result
+
+
+def handle_event(event, invoke, sagemaker_client, endpoint_name, idempotency=None):
+    # SQS event source mapping: one call per message, failed ones redelivered
+    if is_sqs_event(event):
+        if idempotency is not None:
+            # Each message is deduplicated on its own
+            invoke = idempotency.wrap(invoke, endpoint_name, request_content_type(event))
+        return invoke_sqs_batch(invoke, event)
+
+    # Duplicate deliveries get the first delivery's response back
+    if idempotency is not None:
+        key = event_key(event, endpoint_name, request_body(event))
+        if key is not None:
+            return idempotency.handle(key, lambda: handle_event(event, invoke, sagemaker_client, endpoint_name))
+
+    # Batch mode: {"records": [...]} runs every record in one invocation
+    if isinstance(event.get("records"), list):
+        return invoke_batch(invoke, event)
+
+    payload = request_body(event)
 
     try:
-        logger.info(f"Invoking SageMaker endpoint: {endpoint_name} with payload: {payload}")
-        response = sagemaker_client.invoke_endpoint(
-            EndpointName=endpoint_name,
-            ContentType='application/json',
-            Body=payload
-        )
-        result = response['Body'].read().decode('utf-8')
-        logger.info(f"SageMaker response: {result}")
+        # Too large or too slow for InvokeEndpoint: stage to S3 and go async
+        if should_invoke_async(event, payload):
+            return submit(sagemaker_client, event, payload)
+        if payload_size(payload) > SYNC_PAYLOAD_LIMIT:
+            return {
+                'statusCode': 413,
+                'body': f"Payload exceeds the {SYNC_PAYLOAD_LIMIT} byte synchronous limit "
+                        "and no async endpoint is configured"
+            }
 
+        result = invoke(payload)
+        return http_response(200, result, response_accept(event))
+
+    except LoadShed as e:
+        logger.warning(f"SageMaker request shed: {str(e)}")
+        return {
+            'statusCode': 503,
+            'body': f"SageMaker endpoint overloaded, request shed: {str(e)}"
+        }
+
+    except TIMEOUT_ERRORS as e:
+        logger.error(f"SageMaker invocation ran out of time: {str(e)}")
         return {
-            'statusCode': 200,
-            'body': result
+            'statusCode': 504,
+            'body': f"SageMaker invocation deadline exceeded: {str(e)}"
         }
 
     except Exception as e:
@@ -33,6 +106,112 @@ def lambda_handler(event, context):
             'body': f"Error invoking SageMaker: {str(e)}"
         }
 
+
+def lambda_handler(event, context):
+    metrics = start_invocation() if metrics_enabled() else None
+
+    # Fit timeouts and retries into the time Lambda has left, and refuse
+    # to start when not even one realistic attempt fits
+    deadline = Deadline.from_context(context)
+    if deadline is not None and not deadline.can_attempt():
+        logger.error(f"Only {deadline.remaining() * 1000:.0f} ms left, not invoking SageMaker")
+        return {
+            'statusCode': 504,
+            'body': "Insufficient time remaining to invoke SageMaker"
+        }
+
+    # Cached per container so warm invocations skip client construction;
+    # clients.get_client still builds it through boto3.client so it can be mocked
+    init_started = time.perf_counter()
+    sagemaker_client = get_client(
+        'sagemaker-runtime',
+        endpoint_url=os.environ.get('SAGEMAKER_RUNTIME_ENDPOINT_URL'),
+        config=deadline.client_config() if deadline is not None else None,
+    )
+    record('ClientInitLatency', time.perf_counter() - init_started)
+    if metrics is not None:
+        instrument_client(sagemaker_client)
+    if signing_cache_enabled():
+        enable_signing_cache(sagemaker_client)
+    encoding = configured_encoding()
+    if encoding is not None:
+        enable_compression(sagemaker_client, encoding)
+    endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'default-endpoint')
+    accept = response_accept(event)
+
+    # Shed load while the endpoint throttles instead of piling on retries
+    protection = protection_enabled()
+    if protection:
+        protect_client(sagemaker_client)
+    cache = get_cache() if cache_enabled() else None
+
+    def build_invoke(content_type, stream=False):
+        def call_endpoint(name, payload, variant=None):
+            if stream:
+                # Python Lambdas cannot stream their response, so the parts are
+                # collected; use streaming.py as a server to forward them live
+                return collect(iter_payload_parts(sagemaker_client, name, payload, content_type, variant, accept))
+            return invoke_endpoint(sagemaker_client, name, payload, variant, content_type, accept)
+
+        def invoke(payload):
+            return call_endpoint(endpoint_name, payload)
+
+        if protection:
+            invoke = get_protector(endpoint_name).wrap(invoke)
+
+        # Routing table: pick the fastest healthy endpoint/variant per request;
+        # hedging without a table duplicates to the same endpoint
+        routes = configured_routes()
+        hedging = hedging_enabled()
+        if routes or hedging:
+            router = get_router(routes or [{'endpoint': endpoint_name}])
+            route = get_hedger(router).call if hedging else router.call
+
+            def invoke_target(target, payload):
+                def call(body):
+                    return call_endpoint(target.endpoint_name, body, target.variant)
+                if protection:
+                    return get_protector(target.name).call(call, payload)
+                return call(payload)
+
+            def invoke(payload):
+                return route(invoke_target, payload)
+
+        if deadline is not None:
+            invoke = deadline.guard(invoke)
+
+        if cache is not None:
+            invoke = cache.wrap(invoke, endpoint_name, content_type, accept)
+        return invoke
+
+    s3_event = is_s3_event(event)
+    if is_warmer(event):
+        # Scheduled pings keep the container hot without paying for inference
+        response = warm(sagemaker_client)
+    elif is_completion_event(event):
+        # SNS/EventBridge notification that an async inference finished
+        response = collect_completions(event)
+    elif s3_event:
+        # S3 uploads: stream the object through the endpoint in batches
+        response = process_s3_event(event, get_client('s3'), build_invoke, deadline)
+    else:
+        idempotency = get_idempotency() if idempotency_enabled() else None
+        # Streaming goes through the same routing, protection, deadline and
+        # cache wrappers as a plain call
+        invoke = build_invoke(request_content_type(event), stream=streaming_enabled(event))
+        response = handle_event(event, invoke, sagemaker_client, endpoint_name, idempotency)
+
+    if metrics is not None:
+        if cache is not None:
+            cache.emit_metrics()
+        # SQS partial batch responses have no status; failures are per message
+        metrics.add_count('InvocationErrors', int(response.get('statusCode', 200) >= 500))
+        finish_invocation({'EndpointName': endpoint_name})
+    if s3_event and response['statusCode'] != 200:
+        # Fail the asynchronous invocation so Lambda retries from the checkpoint
+        raise ProcessingIncomplete(response['body'])
+    return response
+
 # ---------- 🔬 Unit Test (for CI Green Check) ----------
 if __name__ == "__main__":
     import unittest
@@ -40,7 +219,12 @@ if __name__ == "__main__":
     import json
 
     class TestLambdaHandler(unittest.TestCase):
-        @patch('lambda_function.boto3.client')
+        def setUp(self):
+            reset_clients()
+
+        # Patched where the client registry builds clients, as the pytest
+        # mock_client fixture does, so the real get_client path runs
+        @patch('clients.boto3.client')
         def test_successful_invoke(self, mock_boto_client):
             # Mock the SageMaker response
             mock_response = MagicMock()
@@ -0,0 +1,211 @@
+"""Trimmed, pre-serialized botocore model bundle for faster cold starts.
+
+The full ``botocore/data`` tree is ~24 MB of JSON, and creating a client
+parses the complete service model (documentation included) plus the
+endpoint ruleset. The build step keeps only the services the handler uses,
+merges their SDK extras, strips documentation and writes each model with
+``marshal``, which loads several times faster than ``json``. Endpoint
+rulesets are also compiled to Python code, written next to them (see
+``endpoint_rules``), so clients skip building the rule tree.
+
+Build a deployable package (copies this directory without the full
+``botocore/data`` tree and adds ``model_bundle/``)::
+
+    python model_bundle.py package --output build/lambda
+
+or just the bundle, next to the handler::
+
+    python model_bundle.py build --output model_bundle
+
+At runtime ``clients.get_client`` installs ``BundleLoader`` on boto3's
+default session when a bundle is found (``BOTOCORE_MODEL_BUNDLE`` or
+``model_bundle/`` next to this file). Anything missing from the bundle
+falls back to the regular JSON search path.
+
+Bundles are written with the build interpreter's ``marshal`` format, so
+build with the same Python minor version as the Lambda runtime.
+"""
+import argparse
+import ast
+import marshal
+import os
+import shutil
+import sys
+
+from botocore.loaders import JSONFileLoader, Loader
+
+import endpoint_rules
+
+# Clients botocore creates itself: STS for web-identity credentials
+IMPLICIT_SERVICES = ('sts',)
+MODEL_TYPES = ('service-2', 'endpoint-rule-set-1', 'paginators-1', 'waiters-2')
+DATA_FILES = ('endpoints', 'partitions', 'sdk-default-configuration', '_retry')
+BUNDLE_EXT = '.marshal'
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUNDLE_DIR = os.path.join(SOURCE_DIR, 'model_bundle')
+
+
+class MarshalFileLoader(JSONFileLoader):
+    """Load ``<path>.marshal`` files, falling back to JSON."""
+
+    def exists(self, file_path):
+        return os.path.isfile(file_path + BUNDLE_EXT) or super().exists(file_path)
+
+    def load_file(self, file_path):
+        full_path = file_path + BUNDLE_EXT
+        if os.path.isfile(full_path):
+            # marshal.load on a file object issues many small reads; one
+            # read plus loads is several times faster
+            with open(full_path, 'rb') as fp:
+                data = marshal.loads(fp.read())
+            if os.path.basename(file_path) == 'endpoint-rule-set-1':
+                endpoint_rules.register_precompiled(data, endpoint_rules.precompiled_path(file_path))
+            return data
+        return super().load_file(file_path)
+
+
+class BundleLoader(Loader):
+    """``Loader`` that searches the bundle before the default data paths.
+
+    Bundle contents are a copy of botocore's own data, so they count as
+    builtin; otherwise botocore would treat ``endpoints`` as customised and
+    change how endpoint rulesets are resolved.
+    """
+
+    FILE_LOADER_CLASS = MarshalFileLoader
+
+    def __init__(self, bundle_dir, include_default_search_paths=True):
+        self.bundle_dir = os.path.abspath(bundle_dir)
+        super().__init__(
+            extra_search_paths=[self.bundle_dir],
+            include_default_search_paths=include_default_search_paths,
+        )
+
+    def is_builtin_path(self, path):
+        path = os.path.expanduser(os.path.expandvars(path))
+        return path.startswith(self.bundle_dir) or super().is_builtin_path(path)
+
+
+def strip_docs(value):
+    """Return ``value`` with documentation blanked, as plain dicts and lists.
+
+    The keys are kept because parts of botocore index them directly.
+    """
+    if isinstance(value, dict):
+        return {
+            k: '' if k in ('documentation', 'documentationUrl') else strip_docs(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [strip_docs(v) for v in value]
+    return value
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + BUNDLE_EXT, 'wb') as fp:
+        marshal.dump(data, fp)
+
+
+def handler_services(source_dir=SOURCE_DIR):
+    """Services the handler can create clients for.
+
+    Every ``get_client('<service>')`` call in the handler's modules, plus
+    ``IMPLICIT_SERVICES``, so a service added to the code is bundled
+    without anyone having to remember this list.
+    """
+    services = set(IMPLICIT_SERVICES)
+    for name in sorted(os.listdir(source_dir)):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(source_dir, name), encoding='utf-8') as fp:
+            tree = ast.parse(fp.read(), filename=name)
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'get_client'
+                    and node.args and isinstance(node.args[0], ast.Constant)):
+                services.add(node.args[0].value)
+    return tuple(sorted(services))
+
+
+def build_bundle(output_dir, services=None):
+    """Write the trimmed bundle for ``services`` (default: ``handler_services()``) into ``output_dir``."""
+    if services is None:
+        services = handler_services()
+    source = Loader(include_default_search_paths=False,
+                    extra_search_paths=[Loader.BUILTIN_DATA_PATH])
+    written = []
+    for name in DATA_FILES:
+        _write(os.path.join(output_dir, name), strip_docs(source.load_data(name)))
+        written.append(name)
+    for service in services:
+        api_version = source.determine_latest_version(service, 'service-2')
+        for type_name in MODEL_TYPES:
+            try:
+                # load_service_model merges the sdk-extras files, so the
+                # bundle does not need to ship them separately
+                model = source.load_service_model(service, type_name, api_version)
+            except Exception:
+                continue
+            path = os.path.join(service, api_version, type_name)
+            model = strip_docs(model)
+            _write(os.path.join(output_dir, path), model)
+            written.append(path)
+            if type_name == 'endpoint-rule-set-1':
+                try:
+                    code = endpoint_rules.compile_code(model)
+                except endpoint_rules.UnsupportedRuleset:
+                    # Interpreted at runtime, as without a bundle
+                    continue
+                compiled = endpoint_rules.precompiled_path(os.path.join(output_dir, path))
+                endpoint_rules.write_code(compiled, code)
+                written.append(os.path.relpath(compiled, output_dir)[:-len(BUNDLE_EXT)])
+    return written
+
+
+def package(output_dir, services=None):
+    """Copy the Lambda package to ``output_dir`` with the bundle instead of botocore/data."""
+    source_dir = SOURCE_DIR
+    if os.path.abspath(output_dir).startswith(source_dir + os.sep):
+        raise ValueError("Package output must be outside the Lambda source directory")
+    shutil.copytree(
+        source_dir,
+        output_dir,
+        ignore=shutil.ignore_patterns('__pycache__', '*.pyc', 'model_bundle'),
+        dirs_exist_ok=True,
+    )
+    data_dir = os.path.join(output_dir, 'botocore', 'data')
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+    return build_bundle(os.path.join(output_dir, 'model_bundle'), services)
+
+
+def install(bundle_dir, botocore_session):
+    """Make ``botocore_session`` load models through the bundle."""
+    botocore_session.register_component('data_loader', BundleLoader(bundle_dir))
+
+
+def find_bundle():
+    bundle_dir = os.environ.get('BOTOCORE_MODEL_BUNDLE', DEFAULT_BUNDLE_DIR)
+    if os.path.isfile(os.path.join(bundle_dir, 'endpoints' + BUNDLE_EXT)):
+        return bundle_dir
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the trimmed botocore model bundle')
+    parser.add_argument('command', choices=['build', 'package'])
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--services', nargs='+', default=None,
+                        help='defaults to every service the handler creates clients for')
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        written = build_bundle(args.output, args.services)
+    else:
+        written = package(args.output, args.services)
+    for path in written:
+        print(path + BUNDLE_EXT)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
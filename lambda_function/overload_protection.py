@@ -0,0 +1,268 @@
+"""Adaptive concurrency limiting and circuit breaking for endpoint throttling.
+
+When the endpoint throttles, botocore's standard retry mode retries every
+call, which adds load exactly when the endpoint has none to spare. Each
+endpoint (or routed variant) gets an ``OverloadProtector``, fed by hooks on
+the client's ``needs-retry`` and ``after-call`` events:
+
+- Every attempt is classified with botocore's ``ThrottlingErrorDetector``.
+- An AIMD limiter caps in-flight calls, halving the limit on throttles and
+  growing it by roughly one per window of successes.
+- A circuit breaker charges each throttle against a ``RetryQuotaChecker``
+  with its own ``RetryQuota``; successes pay it back. Sustained throttling
+  drains the quota and opens the breaker, which then fails calls
+  immediately (``LoadShed``, reported as 503) - including in-progress
+  retry loops - until a cool-down passes and a half-open probe succeeds.
+
+State lives at module level, so a warm container keeps shedding while the
+endpoint recovers. Limit and breaker changes are counted in the EMF
+metrics.
+
+Enabled with ``SAGEMAKER_OVERLOAD_PROTECTION=true``. Settings:
+``SAGEMAKER_CONCURRENCY_LIMIT`` (initial, 16), ``SAGEMAKER_CONCURRENCY_MAX``
+(256), ``SAGEMAKER_BREAKER_QUOTA`` (50) and ``SAGEMAKER_BREAKER_OPEN_SECONDS``
+(10).
+"""
+import logging
+import os
+import threading
+import time
+
+from botocore.retries.quota import RetryQuota
+from botocore.retries.standard import RetryEventAdapter, RetryQuotaChecker, ThrottlingErrorDetector
+
+from instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_LIMIT = 16
+DEFAULT_MAX_LIMIT = 256
+DEFAULT_BREAKER_QUOTA = 50
+DEFAULT_OPEN_SECONDS = 10.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class LoadShed(Exception):
+    """Raised instead of calling an endpoint that is known to be overloaded."""
+
+
+class AIMDLimiter:
+    """Additive-increase/multiplicative-decrease cap on in-flight calls."""
+
+    def __init__(self, initial=DEFAULT_INITIAL_LIMIT, min_limit=1, max_limit=DEFAULT_MAX_LIMIT,
+                 backoff=0.5, clock=time.monotonic):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.in_flight = 0
+        self._clock = clock
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def on_success(self):
+        with self._lock:
+            previous = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            changed = int(self.limit) != previous
+        if changed:
+            count('ConcurrencyLimitIncreased')
+
+    def on_throttle(self, cooldown=1.0):
+        """Back off, at most once per cool-down so one burst is one decrease."""
+        with self._lock:
+            now = self._clock()
+            if now - self._last_decrease < cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+            limit = int(self.limit)
+        count('ConcurrencyLimitDecreased')
+        logger.warning(f"Endpoint throttled, concurrency limit now {limit}")
+
+
+class CircuitBreaker:
+    """Opens when throttles drain the retry quota; probes after a cool-down."""
+
+    def __init__(self, quota_capacity=DEFAULT_BREAKER_QUOTA, open_seconds=DEFAULT_OPEN_SECONDS,
+                 clock=time.monotonic):
+        self.quota_capacity = quota_capacity
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.quota_checker = RetryQuotaChecker(RetryQuota(quota_capacity))
+        self._clock = clock
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a new call may start; half-open admits a single probe."""
+        with self._lock:
+            if self.state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self):
+        return self.state == OPEN
+
+    def on_throttle(self, retry_context):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+            elif self.state == CLOSED and not self.quota_checker.acquire_retry_quota(retry_context):
+                self._open()
+
+    def on_success(self, request_context, http_response):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+                self.quota_checker = RetryQuotaChecker(RetryQuota(self.quota_capacity))
+                self._probe_in_flight = False
+                return
+        self.quota_checker.release_retry_quota(request_context, http_response)
+
+    def on_failure(self):
+        """A non-throttle failure ends a half-open probe without a verdict."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self):
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit breaker {self.state} -> {state}")
+        self.state = state
+        count(f"Breaker{''.join(part.title() for part in state.split('_'))}")
+
+
+class OverloadProtector:
+    """Limiter and breaker for one endpoint or variant."""
+
+    def __init__(self, limiter=None, breaker=None):
+        self.limiter = limiter or AIMDLimiter()
+        self.breaker = breaker or CircuitBreaker()
+
+    def on_throttle(self, retry_context):
+        self.limiter.on_throttle()
+        self.breaker.on_throttle(retry_context)
+        if self.breaker.is_open():
+            # Raising from needs-retry aborts botocore's retry loop at once
+            raise LoadShed("Circuit open after sustained throttling")
+
+    def on_success(self, request_context, http_response):
+        self.limiter.on_success()
+        self.breaker.on_success(request_context, http_response)
+
+    def call(self, invoke, payload):
+        """Run ``invoke(payload)`` unless the breaker or limiter sheds it."""
+        if not self.breaker.allow():
+            count('LoadShed')
+            raise LoadShed("Circuit open, endpoint is throttling")
+        if not self.limiter.try_acquire():
+            self.breaker.on_failure()
+            count('LoadShed')
+            raise LoadShed(f"Concurrency limit of {int(self.limiter.limit)} reached")
+        previous = getattr(_current, 'protector', None)
+        _current.protector = self
+        try:
+            return invoke(payload)
+        except Exception:
+            self.breaker.on_failure()
+            raise
+        finally:
+            _current.protector = previous
+            self.limiter.release()
+
+    def wrap(self, invoke):
+        def protected(payload):
+            return self.call(invoke, payload)
+        return protected
+
+
+# Client hooks run on the calling thread, so the protector whose ``call``
+# is in progress on this thread is the one that owns the request
+_current = threading.local()
+_adapter = RetryEventAdapter()
+_detector = ThrottlingErrorDetector(_adapter)
+
+
+def _on_needs_retry(**kwargs):
+    protector = getattr(_current, 'protector', None)
+    if protector is None or not _detector.is_throttling_error(**kwargs):
+        return None
+    retry_context = _adapter.create_retry_context(**kwargs)
+    # Keep the breaker's quota bookkeeping apart from botocore's own
+    retry_context.request_context = kwargs['request_dict']['context'].setdefault('overload_protection', {})
+    protector.on_throttle(retry_context)
+    return None
+
+
+def _on_after_call(http_response=None, context=None, **kwargs):
+    protector = getattr(_current, 'protector', None)
+    if protector is not None and http_response is not None and 200 <= http_response.status_code < 300:
+        protector.on_success((context or {}).get('overload_protection', {}), http_response)
+
+
+def protect_client(client):
+    """Register the throttle/success hooks on ``client``; repeat calls are no-ops."""
+    service = client.meta.service_model.service_id.hyphenize()
+    client.meta.events.register(f'needs-retry.{service}', _on_needs_retry, unique_id='overload-needs-retry')
+    client.meta.events.register(f'after-call.{service}', _on_after_call, unique_id='overload-after-call')
+    return client
+
+
+def protection_enabled():
+    return os.environ.get('SAGEMAKER_OVERLOAD_PROTECTION', 'false').lower() == 'true'
+
+
+_protectors = {}
+_protectors_lock = threading.Lock()
+
+
+def get_protector(endpoint_name):
+    """Return the process-wide protector for an endpoint or ``endpoint/variant``."""
+    protector = _protectors.get(endpoint_name)
+    if protector is None:
+        with _protectors_lock:
+            protector = _protectors.get(endpoint_name)
+            if protector is None:
+                protector = OverloadProtector(
+                    AIMDLimiter(
+                        initial=int(os.environ.get('SAGEMAKER_CONCURRENCY_LIMIT', DEFAULT_INITIAL_LIMIT)),
+                        max_limit=int(os.environ.get('SAGEMAKER_CONCURRENCY_MAX', DEFAULT_MAX_LIMIT)),
+                    ),
+                    CircuitBreaker(
+                        quota_capacity=int(os.environ.get('SAGEMAKER_BREAKER_QUOTA', DEFAULT_BREAKER_QUOTA)),
+                        open_seconds=float(os.environ.get('SAGEMAKER_BREAKER_OPEN_SECONDS', DEFAULT_OPEN_SECONDS)),
+                    ),
+                )
+                _protectors[endpoint_name] = protector
+    return protector
+
+
+def reset_protectors():
+    with _protectors_lock:
+        _protectors.clear()
@@ -0,0 +1,78 @@
+"""Request and response body formats for the handler.
+
+JSON stays the default, but converting large float arrays to text and back
+costs CPU on both sides of the call. Binary formats understood by SageMaker
+containers - ``application/x-npy`` and ``application/x-recordio-protobuf`` -
+are forwarded byte for byte instead: the handler never decodes them into
+Python objects.
+
+The content type comes from the event's ``contentType`` or its
+``Content-Type`` header, and the wanted response type from ``accept`` or the
+``Accept`` header. API Gateway delivers binary bodies base64 encoded with
+``isBase64Encoded``; they are decoded back to the original bytes before the
+call, and binary results are returned the same way.
+"""
+import base64
+
+JSON_CONTENT_TYPE = 'application/json'
+BINARY_CONTENT_TYPES = frozenset({'application/x-npy', 'application/x-recordio-protobuf'})
+
+
+def header(event, name):
+    """Case-insensitive lookup in the event's headers."""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def media_type(content_type):
+    """``content_type`` without parameters, lower-cased."""
+    return (content_type or '').split(';', 1)[0].strip().lower()
+
+
+def is_binary(content_type):
+    return media_type(content_type) in BINARY_CONTENT_TYPES
+
+
+def request_content_type(event):
+    return event.get('contentType') or header(event, 'content-type') or JSON_CONTENT_TYPE
+
+
+def response_accept(event):
+    """The ``Accept`` type to request from the endpoint, or None for its default."""
+    accept = event.get('accept') or header(event, 'accept')
+    if not accept or accept.strip() == '*/*':
+        return None
+    return accept
+
+
+def request_body(event):
+    """The request payload, as bytes when API Gateway base64-encoded it."""
+    body = event.get('body', '{}')
+    if event.get('isBase64Encoded') and isinstance(body, str):
+        return base64.b64decode(body)
+    return body
+
+
+def http_response(status_code, body, accept=None):
+    """Build a proxy-integration response around the endpoint's raw bytes.
+
+    Text comes back as a string, as before; binary results (requested via
+    ``accept`` or simply not UTF-8) are base64 encoded for API Gateway.
+    """
+    if isinstance(body, bytes) and not is_binary(accept):
+        try:
+            return {'statusCode': status_code, 'body': body.decode('utf-8')}
+        except UnicodeDecodeError:
+            pass
+    if isinstance(body, bytes):
+        response = {
+            'statusCode': status_code,
+            'body': base64.b64encode(body).decode('ascii'),
+            'isBase64Encoded': True,
+        }
+        if accept:
+            response['headers'] = {'Content-Type': accept}
+        return response
+    return {'statusCode': status_code, 'body': body}
@@ -0,0 +1,72 @@
+"""Size-bounded, sampled structured logging of inference payloads.
+
+Logging every request and response body at INFO costs CPU for formatting
+and CloudWatch ingestion for large feature vectors. By default each payload
+is logged as one JSON object with its size, a SHA-256 digest prefix and a
+truncated preview. Full bodies are included for a sampled fraction of calls.
+
+``PayloadLog`` objects are passed as ``%s`` logging arguments, so nothing is
+hashed, truncated or serialized unless a handler actually emits the record.
+
+Settings: ``PAYLOAD_LOG_SAMPLE_RATE`` (fraction of calls logged in full,
+default 0) and ``PAYLOAD_LOG_PREVIEW_BYTES`` (default 256).
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+
+DEFAULT_PREVIEW_BYTES = 256
+
+
+def sample_rate():
+    return float(os.environ.get('PAYLOAD_LOG_SAMPLE_RATE', 0.0))
+
+
+def preview_bytes():
+    return int(os.environ.get('PAYLOAD_LOG_PREVIEW_BYTES', DEFAULT_PREVIEW_BYTES))
+
+
+def should_log_full(logger, rate=None, rand=random.random):
+    """Decide once per call whether bodies are logged in full."""
+    if not logger.isEnabledFor(logging.INFO):
+        return False
+    rate = sample_rate() if rate is None else rate
+    return rate > 0 and (rate >= 1 or rand() < rate)
+
+
+class PayloadLog:
+    """Lazily formatted log record for a request or response body."""
+
+    __slots__ = ('kind', 'endpoint_name', 'payload', 'full', 'limit')
+
+    def __init__(self, kind, endpoint_name, payload, full=False, limit=None):
+        self.kind = kind
+        self.endpoint_name = endpoint_name
+        self.payload = payload
+        self.full = full
+        self.limit = limit
+
+    def as_dict(self):
+        data = self.payload
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        elif data is None:
+            data = b''
+        limit = preview_bytes() if self.limit is None else self.limit
+        record = {
+            'event': f"sagemaker_{self.kind}",
+            'endpoint': self.endpoint_name,
+            'size_bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest()[:16],
+        }
+        if self.full:
+            record['body'] = data.decode('utf-8', errors='replace')
+        else:
+            record['preview'] = data[:limit].decode('utf-8', errors='replace')
+            record['truncated'] = len(data) > limit
+        return record
+
+    def __str__(self):
+        return json.dumps(self.as_dict())
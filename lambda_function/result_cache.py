@@ -0,0 +1,257 @@
+"""Content-addressed cache of inference results.
+
+Scheduled invocations frequently send the same payload to the same endpoint,
+so results are cached under a SHA-256 of (endpoint name, content type,
+payload bytes). The in-process layer is a bounded LRU with a TTL; an optional
+shared store (DynamoDB, or ``InMemoryStore`` locally) lets warm containers
+share results.
+
+Enabled with ``INFERENCE_CACHE_ENABLED=true``. Other settings:
+``INFERENCE_CACHE_TTL_SECONDS`` (300), ``INFERENCE_CACHE_MAX_ENTRIES`` (1024)
+and ``INFERENCE_CACHE_TABLE`` (DynamoDB table with a ``cache_key`` string
+hash key and TTL on ``expires_at``).
+
+Hits, misses, evictions and the other counters are added to the
+invocation's EMF metrics (see ``instrumentation``) as the change since the
+previous invocation, since the cache outlives each one.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+
+from clients import get_client
+from instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def cache_key(endpoint_name, content_type, payload, accept=None):
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    parts = [endpoint_name.encode('utf-8'), content_type.encode('utf-8'), payload]
+    if accept:
+        parts.append(accept.encode('utf-8'))
+    digest = hashlib.sha256()
+    for part in parts:
+        # Length-prefix each part so field boundaries cannot collide
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count, with per-entry expiry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InMemoryStore:
+    """Local stand-in for the shared store, with the same interface."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._items = {}
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None or item[1] <= self._clock():
+            return None
+        return item[0]
+
+    def put(self, key, value, ttl_seconds):
+        self._items[key] = (value, self._clock() + ttl_seconds)
+
+
+class DynamoDBStore:
+    """Shared cache store backed by a DynamoDB table.
+
+    Expired items are filtered on read, since DynamoDB TTL deletion is lazy.
+    """
+
+    def __init__(self, table_name, client=None, clock=time.time):
+        self.table_name = table_name
+        self._client = client or get_client('dynamodb')
+        self._clock = clock
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def get(self, key):
+        response = self._client.get_item(
+            TableName=self.table_name,
+            Key={'cache_key': {'S': key}},
+            ConsistentRead=False,
+        )
+        item = response.get('Item')
+        if not item:
+            return None
+        item = {k: self._deserializer.deserialize(v) for k, v in item.items()}
+        if item['expires_at'] <= int(self._clock()):
+            return None
+        result = item['result']
+        # Byte results are stored as a DynamoDB binary attribute
+        return result.value if isinstance(result, Binary) else result
+
+    def put(self, key, value, ttl_seconds):
+        item = {
+            'cache_key': key,
+            'result': value,
+            'expires_at': int(self._clock() + ttl_seconds),
+        }
+        self._client.put_item(
+            TableName=self.table_name,
+            Item={k: self._serializer.serialize(v) for k, v in item.items()},
+        )
+
+
+class ResultCache:
+    """LRU in front of an optional shared store, with hit/miss counters."""
+
+    def __init__(self, local=None, store=None):
+        self.local = local if local is not None else LRUCache()
+        self.store = store
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.store_errors = 0
+        self._emitted = {}
+        # Batches look up records from a thread pool; unguarded += loses counts
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        if self.store is not None:
+            try:
+                value = self.store.get(key)
+            except Exception as e:
+                with self._lock:
+                    self.store_errors += 1
+                logger.warning(f"Result cache store read failed: {str(e)}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                self.local.put(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.local.put(key, value)
+        if self.store is not None:
+            try:
+                self.store.put(key, value, self.local.ttl_seconds)
+            except Exception as e:
+                with self._lock:
+                    self.store_errors += 1
+                logger.warning(f"Result cache store write failed: {str(e)}")
+
+    def metrics(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            'CacheHits': self.hits,
+            'CacheSharedHits': self.shared_hits,
+            'CacheMisses': self.misses,
+            'CacheEvictions': self.local.evictions,
+            'CacheExpirations': self.local.expirations,
+            'CacheStoreErrors': self.store_errors,
+            'CacheSize': len(self.local),
+        }
+
+    def emit_metrics(self):
+        """Count each counter's change since the last call in the active invocation."""
+        with self._lock:
+            current = self._snapshot()
+            del current['CacheSize']
+            previous, self._emitted = self._emitted, current
+        for name, value in current.items():
+            count(name, value - previous.get(name, 0))
+
+    def wrap(self, invoke, endpoint_name, content_type='application/json', accept=None):
+        """Return ``invoke`` with lookups before and stores after each call."""
+        def cached_invoke(payload):
+            key = cache_key(endpoint_name, content_type, payload, accept)
+            result = self.get(key)
+            if result is not None:
+                return result
+            result = invoke(payload)
+            self.put(key, result)
+            return result
+        return cached_invoke
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled():
+    return os.environ.get('INFERENCE_CACHE_ENABLED', 'false').lower() == 'true'
+
+
+def get_cache():
+    """Return the process-wide cache, built from the environment on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                local = LRUCache(
+                    max_entries=int(os.environ.get('INFERENCE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+                    ttl_seconds=float(os.environ.get('INFERENCE_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS)),
+                )
+                table_name = os.environ.get('INFERENCE_CACHE_TABLE')
+                store = DynamoDBStore(table_name) if table_name else None
+                _cache = ResultCache(local, store)
+    return _cache
+
+
+def reset_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,222 @@
+"""Latency-aware routing across endpoints and production variants.
+
+A routing table lists targets, each an endpoint with an optional
+``TargetVariant`` and weight::
+
+    SAGEMAKER_ROUTES='[{"endpoint": "model-a", "variant": "blue", "weight": 2},
+                       {"endpoint": "model-a", "variant": "green"},
+                       {"endpoint": "model-b"}]'
+
+Each target keeps an EWMA of latency and error rate. Requests go to the
+healthy target with the lowest weighted latency score; targets that have
+not been measured yet are tried first, and a small exploration rate keeps
+estimates for the others fresh. Targets are ejected for a cool-down period
+after consecutive failures or when their latency is an outlier against the
+rest, but never more than half of the table at once. Only failures that
+say something about the target count against it: server faults, throttles
+(including load shed by its overload protector), timeouts and connection
+errors. Anything else, such as a validation error or a ``ModelError`` for a
+bad payload, would fail on every target and is re-raised untouched.
+
+Routers live at module level, keyed by the routing table, so warm
+containers keep their estimates across invocations.
+"""
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from botocore.retries.standard import RetryContext, ThrottledRetryableChecker, TransientRetryableChecker
+
+from deadlines import TIMEOUT_ERRORS
+from overload_protection import LoadShed
+
+DEFAULT_ALPHA = 0.2
+DEFAULT_EXPLORE_RATE = 0.05
+DEFAULT_EJECT_AFTER_FAILURES = 3
+DEFAULT_EJECTION_SECONDS = 30.0
+DEFAULT_OUTLIER_FACTOR = 3.0
+MIN_SAMPLES_FOR_OUTLIER = 5
+MAX_EJECTION_FRACTION = 0.5
+
+_throttled = ThrottledRetryableChecker()
+_transient = TransientRetryableChecker()
+
+
+def is_target_failure(exc):
+    """Whether ``exc`` reflects on the target's health rather than the request."""
+    if isinstance(exc, TIMEOUT_ERRORS + (LoadShed,)):
+        return True
+    if isinstance(exc, ClientError):
+        status = exc.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        if status >= 500 or status == 429:
+            return True
+        context = RetryContext(attempt_number=1, parsed_response=exc.response)
+        return _throttled.is_retryable(context) or _transient.is_retryable(context)
+    # Connection and other HTTP client errors
+    return _transient.is_retryable(RetryContext(attempt_number=1, caught_exception=exc))
+
+
+class Target:
+    """One endpoint/variant in the routing table and its rolling estimates."""
+
+    def __init__(self, endpoint_name, variant=None, weight=1.0):
+        self.endpoint_name = endpoint_name
+        self.variant = variant
+        self.weight = float(weight)
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def name(self):
+        return f"{self.endpoint_name}/{self.variant}" if self.variant else self.endpoint_name
+
+    def score(self):
+        """Lower is better: latency scaled by weight and penalised by errors."""
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma * (1.0 + 4.0 * self.error_ewma) / self.weight
+
+    def __repr__(self):
+        return f"Target({self.name!r})"
+
+
+class Router:
+    """Pick the fastest healthy target and learn from observed calls."""
+
+    def __init__(self, targets, alpha=DEFAULT_ALPHA, explore_rate=DEFAULT_EXPLORE_RATE,
+                 eject_after_failures=DEFAULT_EJECT_AFTER_FAILURES,
+                 ejection_seconds=DEFAULT_EJECTION_SECONDS, outlier_factor=DEFAULT_OUTLIER_FACTOR,
+                 clock=time.monotonic, rand=random.random):
+        if not targets:
+            raise ValueError("Routing table must contain at least one target")
+        self.targets = list(targets)
+        self.alpha = alpha
+        self.explore_rate = explore_rate
+        self.eject_after_failures = eject_after_failures
+        self.ejection_seconds = ejection_seconds
+        self.outlier_factor = outlier_factor
+        self._clock = clock
+        self._rand = rand
+        self._lock = threading.Lock()
+
+    def healthy(self, exclude=()):
+        now = self._clock()
+        return [t for t in self.targets if t.ejected_until <= now and t not in exclude]
+
+    def choose(self, exclude=()):
+        """Return the target for the next request, or None if all are excluded."""
+        with self._lock:
+            candidates = self.healthy(exclude)
+            if not candidates:
+                # Fail open: everything is ejected, use whichever recovers first
+                candidates = sorted(
+                    (t for t in self.targets if t not in exclude), key=lambda t: t.ejected_until
+                )[:1]
+                if not candidates:
+                    return None
+            if len(candidates) > 1 and self._rand() < self.explore_rate:
+                return self._weighted_pick(candidates)
+            return min(candidates, key=lambda t: t.score())
+
+    def _weighted_pick(self, candidates):
+        point = self._rand() * sum(t.weight for t in candidates)
+        for target in candidates:
+            point -= target.weight
+            if point <= 0:
+                return target
+        return candidates[-1]
+
+    def observe(self, target, seconds, ok):
+        """Fold one call's latency and outcome into ``target``'s estimates."""
+        with self._lock:
+            target.samples += 1
+            if ok:
+                target.consecutive_failures = 0
+                if target.latency_ewma is None:
+                    target.latency_ewma = seconds
+                else:
+                    target.latency_ewma += self.alpha * (seconds - target.latency_ewma)
+            else:
+                target.consecutive_failures += 1
+            target.error_ewma += self.alpha * ((0.0 if ok else 1.0) - target.error_ewma)
+
+            if target.consecutive_failures >= self.eject_after_failures or self._is_outlier(target):
+                self._eject(target)
+
+    def _is_outlier(self, target):
+        if target.samples < MIN_SAMPLES_FOR_OUTLIER or target.latency_ewma is None:
+            return False
+        others = [
+            t.latency_ewma for t in self.healthy((target,))
+            if t.latency_ewma is not None and t.samples >= MIN_SAMPLES_FOR_OUTLIER
+        ]
+        if not others:
+            return False
+        return target.latency_ewma > self.outlier_factor * statistics.median(others)
+
+    def _eject(self, target):
+        now = self._clock()
+        ejected = sum(1 for t in self.targets if t.ejected_until > now)
+        if ejected + 1 > MAX_EJECTION_FRACTION * len(self.targets):
+            return
+        target.ejected_until = now + self.ejection_seconds
+        target.consecutive_failures = 0
+        # Start afresh when the target comes back
+        target.latency_ewma = None
+        target.samples = 0
+
+    def call(self, invoke, payload):
+        """Route one request through ``invoke(target, payload)``."""
+        target = self.choose()
+        started = time.perf_counter()
+        try:
+            result = invoke(target, payload)
+        except Exception as e:
+            if is_target_failure(e):
+                self.observe(target, time.perf_counter() - started, ok=False)
+            raise
+        self.observe(target, time.perf_counter() - started, ok=True)
+        return result
+
+
+def parse_routes(routes):
+    """Build targets from a JSON string or a list of dicts."""
+    if isinstance(routes, str):
+        routes = json.loads(routes)
+    return [
+        Target(route['endpoint'], route.get('variant'), route.get('weight', 1.0))
+        for route in routes
+    ]
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(routes):
+    """Return the process-wide router for a routing table."""
+    key = routes if isinstance(routes, str) else json.dumps(routes, sort_keys=True)
+    router = _routers.get(key)
+    if router is None:
+        with _routers_lock:
+            router = _routers.get(key)
+            if router is None:
+                router = Router(parse_routes(routes))
+                _routers[key] = router
+    return router
+
+
+def configured_routes():
+    return os.environ.get('SAGEMAKER_ROUTES')
+
+
+def reset_routers():
+    with _routers_lock:
+        _routers.clear()
@@ -0,0 +1,318 @@
+"""Batch inference over objects uploaded to S3.
+
+An S3 event notification (or the EventBridge "Object Created" event) names
+a JSON Lines or CSV object. Like SageMaker Batch Transform with
+``SplitType=Line``/``AssembleWith=Line``, the object is:
+
+- streamed with ``iter_lines`` in fixed-size chunks, so memory stays bounded
+  by the chunk size and the batches in flight, never by the object size;
+- cut into batches of rows (at most ``S3_BATCH_ROWS`` rows or
+  ``S3_BATCH_MAX_BYTES``), each sent as one endpoint call with
+  ``application/jsonlines`` or ``text/csv``; at most
+  ``SAGEMAKER_BATCH_MAX_WORKERS`` batches are in flight;
+- answered in input order into an output part object, uploaded through the
+  vendored ``s3transfer`` from a bounded in-memory pipe, which switches to
+  multipart upload once the part outgrows the threshold.
+
+Before the Lambda deadline (minus ``S3_FLUSH_RESERVE_SECONDS``) no new
+batches start; in-flight ones are written, the part is completed and a
+checkpoint recording the input byte offset and next part number is saved
+next to the output. The handler then fails the invocation so Lambda's
+asynchronous retry resumes from the checkpoint, reading the input with a
+ranged GET. The checkpoint is tied to the input ETag, and a finished run
+marks it complete so duplicate notifications are no-ops.
+
+Output goes to ``S3_OUTPUT_BUCKET`` (default: the input bucket) under
+``S3_OUTPUT_PREFIX`` (``output/``) as ``<prefix><key>.out/part-NNNNN``.
+Objects already under the output prefix are ignored, so writing results to
+the input bucket cannot retrigger the function.
+"""
+import json
+import logging
+import os
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+
+from botocore.exceptions import ClientError
+from s3transfer.manager import TransferConfig, TransferManager
+
+from batching import max_workers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_PREFIX = 'output/'
+DEFAULT_BATCH_ROWS = 100
+# Stays under the 6 MB InvokeEndpoint payload limit
+DEFAULT_BATCH_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_READ_CHUNK_BYTES = 1024 * 1024
+DEFAULT_FLUSH_RESERVE_SECONDS = 5.0
+MB = 1024 * 1024
+
+CONTENT_TYPES = {
+    '.csv': 'text/csv',
+    '.jsonl': 'application/jsonlines',
+    '.ndjson': 'application/jsonlines',
+}
+
+
+class ProcessingIncomplete(Exception):
+    """Raised to make Lambda retry an S3 event from its checkpoint."""
+
+
+def s3_objects(event):
+    """``(bucket, key)`` pairs named by an S3 notification or EventBridge event."""
+    if (event.get('source') == 'aws.s3' and event.get('detail-type') == 'Object Created'
+            and isinstance(event.get('detail'), dict)):
+        detail = event['detail']
+        return [(detail['bucket']['name'], detail['object']['key'])]
+    objects = []
+    for record in event.get('Records') or []:
+        if record.get('eventSource') == 'aws:s3' and record.get('eventName', '').startswith('ObjectCreated'):
+            # Notification keys are URL-encoded with '+' for spaces
+            objects.append((record['s3']['bucket']['name'], unquote_plus(record['s3']['object']['key'])))
+    return objects
+
+
+def is_s3_event(event):
+    return bool(s3_objects(event))
+
+
+def content_type_for(key):
+    for suffix, content_type in CONTENT_TYPES.items():
+        if key.lower().endswith(suffix):
+            return content_type
+    return None
+
+
+def output_prefix():
+    return os.environ.get('S3_OUTPUT_PREFIX', DEFAULT_OUTPUT_PREFIX)
+
+
+def iter_batches(lines, offset, max_rows, max_bytes):
+    """Group ``lines`` into ``(payload, end_offset, rows)`` batches.
+
+    ``offset`` is the input position of the first line; ``end_offset`` is the
+    position just past each batch, which is what a checkpoint records.
+    """
+    rows, size = [], 0
+    for line in lines:
+        start, offset = offset, offset + len(line)
+        if not line.strip():
+            continue
+        if not line.endswith(b'\n'):
+            line += b'\n'
+        if rows and (len(rows) >= max_rows or size + len(line) > max_bytes):
+            yield b''.join(rows), start, len(rows)
+            rows, size = [], 0
+        rows.append(line)
+        size += len(line)
+    if rows:
+        yield b''.join(rows), offset, len(rows)
+
+
+class _Pipe:
+    """Bounded, blocking file-like buffer between the writer and s3transfer."""
+
+    def __init__(self, max_chunks=8):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._pending = b''
+        self._closed = False
+
+    def write(self, data):
+        self._chunks.put(data)
+
+    def close(self):
+        self._chunks.put(None)
+
+    def read(self, amt=None):
+        while not self._closed and (amt is None or len(self._pending) < amt):
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._closed = True
+                break
+            self._pending += chunk
+        if amt is None:
+            data, self._pending = self._pending, b''
+        else:
+            data, self._pending = self._pending[:amt], self._pending[amt:]
+        return data
+
+
+def _transfer_manager(s3):
+    # Parts are held in memory for non-seekable input; cap how many
+    return TransferManager(s3, TransferConfig(
+        multipart_threshold=8 * MB,
+        multipart_chunksize=8 * MB,
+        max_request_concurrency=4,
+        max_in_memory_upload_chunks=4,
+    ))
+
+
+class _PartWriter:
+    """Streams one output part to S3, starting the upload on first write."""
+
+    def __init__(self, s3, bucket, key):
+        self._s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self._transfer = None
+        self._pipe = None
+        self._future = None
+        self.bytes_written = 0
+
+    def write(self, data):
+        if self._future is None:
+            self._transfer = _transfer_manager(self._s3)
+            self._pipe = _Pipe()
+            self._future = self._transfer.upload(self._pipe, self.bucket, self.key)
+        self._pipe.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        """Finish the upload; returns whether a part was written."""
+        if self._future is None:
+            return False
+        self._pipe.close()
+        try:
+            self._future.result()
+        finally:
+            self._transfer.shutdown()
+        return True
+
+
+def _checkpoint_key(key):
+    return f"{output_prefix()}{key}.checkpoint.json"
+
+
+def load_checkpoint(s3, bucket, key):
+    try:
+        body = s3.get_object(Bucket=bucket, Key=_checkpoint_key(key))['Body']
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(body.read())
+
+
+def save_checkpoint(s3, bucket, key, checkpoint):
+    s3.put_object(
+        Bucket=bucket,
+        Key=_checkpoint_key(key),
+        Body=json.dumps(checkpoint).encode('utf-8'),
+        ContentType='application/json',
+    )
+
+
+def process_object(s3, build_invoke, bucket, key, deadline=None, workers=None):
+    """Run every row of one object through the endpoint, resuming if possible.
+
+    Returns a summary dict with ``complete`` False when the deadline stopped
+    the run early. Endpoint errors are raised after checkpointing the rows
+    that did succeed.
+    """
+    content_type = content_type_for(key)
+    if content_type is None:
+        raise ValueError(f"Unsupported input object {key!r}; expected .jsonl, .ndjson or .csv")
+    out_bucket = os.environ.get('S3_OUTPUT_BUCKET') or bucket
+    head = s3.head_object(Bucket=bucket, Key=key)
+    etag = head['ETag']
+
+    checkpoint = load_checkpoint(s3, out_bucket, key)
+    if checkpoint is None or checkpoint.get('etag') != etag:
+        checkpoint = {'etag': etag, 'offset': 0, 'part': 0, 'rows': 0, 'complete': False}
+    if checkpoint['complete']:
+        logger.info(f"s3://{bucket}/{key} already processed, skipping")
+        return dict(checkpoint, bucket=bucket, key=key)
+
+    invoke = build_invoke(content_type)
+    workers = workers or max_workers()
+    reserve = float(os.environ.get('S3_FLUSH_RESERVE_SECONDS', DEFAULT_FLUSH_RESERVE_SECONDS))
+    offset = checkpoint['offset']
+    if offset < head['ContentLength']:
+        body = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-", IfMatch=etag)['Body']
+        lines = body.iter_lines(int(os.environ.get('S3_READ_CHUNK_BYTES', DEFAULT_READ_CHUNK_BYTES)), keepends=True)
+    else:
+        lines = iter(())
+    if content_type == 'text/csv' and offset == 0 and os.environ.get('S3_CSV_HEADER', 'true').lower() == 'true':
+        # The header names columns for people, not the model
+        offset += len(next(lines, b''))
+    batches = iter_batches(
+        lines, offset,
+        int(os.environ.get('S3_BATCH_ROWS', DEFAULT_BATCH_ROWS)),
+        int(os.environ.get('S3_BATCH_MAX_BYTES', DEFAULT_BATCH_MAX_BYTES)),
+    )
+
+    part = _PartWriter(s3, out_bucket, f"{output_prefix()}{key}.out/part-{checkpoint['part']:05d}")
+    written = {'offset': offset, 'rows': 0}
+    stopped = False
+    error = None
+
+    def write(future, end_offset, rows):
+        result = future.result()
+        if not result.endswith(b'\n'):
+            result += b'\n'
+        part.write(result)
+        written['offset'] = end_offset
+        written['rows'] += rows
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for payload, end_offset, rows in batches:
+                if deadline is not None and deadline.remaining() < reserve:
+                    stopped = True
+                    break
+                pending.append((pool.submit(invoke, payload), end_offset, rows))
+                # Bounded window: wait for the oldest batch before reading on
+                while len(pending) >= workers:
+                    write(*pending.popleft())
+            while pending:
+                write(*pending.popleft())
+        except Exception as e:
+            error = e
+            for future, _, _ in pending:
+                future.cancel()
+
+    # Only rows whose results reached a completed part count as done
+    if part.close():
+        checkpoint['part'] += 1
+    checkpoint['offset'] = written['offset']
+    checkpoint['rows'] += written['rows']
+    checkpoint['complete'] = not stopped and error is None
+    save_checkpoint(s3, out_bucket, key, checkpoint)
+    logger.info(
+        f"s3://{bucket}/{key}: {written['rows']} rows this run, {checkpoint['rows']} total, "
+        f"offset {checkpoint['offset']}, complete={checkpoint['complete']}"
+    )
+    if error is not None:
+        raise error
+    return dict(checkpoint, bucket=bucket, key=key)
+
+
+def process_s3_event(event, s3, build_invoke, deadline=None):
+    """Process every object in ``event`` and build the handler response.
+
+    200 when all objects are done; 202 when the deadline cut a run short and
+    500 when an object failed, both of which the handler turns into a retry.
+    """
+    prefix = output_prefix()
+    summaries = []
+    status = 200
+    for bucket, key in s3_objects(event):
+        if key.startswith(prefix) or content_type_for(key) is None:
+            logger.info(f"Ignoring s3://{bucket}/{key}")
+            continue
+        try:
+            summary = process_object(s3, build_invoke, bucket, key, deadline)
+        except Exception as e:
+            logger.error(f"Batch inference over s3://{bucket}/{key} failed: {str(e)}", exc_info=True)
+            summaries.append({'bucket': bucket, 'key': key, 'complete': False, 'error': str(e)})
+            status = 500
+            continue
+        summaries.append(summary)
+        if not summary['complete']:
+            status = max(status, 202)
+            break
+    return {'statusCode': status, 'body': json.dumps({'objects': summaries})}
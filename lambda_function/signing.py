@@ -0,0 +1,180 @@
+"""Cached SigV4 signing keys and a canonical-request fast path.
+
+``botocore.auth.SigV4Auth`` is instantiated for every request and, for
+each one, derives the signing key with four chained HMACs
+(``AWS4`` + secret -> date -> region -> service -> ``aws4_request``),
+builds the header map twice (once for the canonical request, once for the
+``Authorization`` header), sorts the header names and re-normalizes the
+URL path. For a given set of credentials only the date in that chain
+changes, and ``InvokeEndpoint`` requests from one client always carry the
+same header names and the same path.
+
+``CachedSigV4Auth`` keeps, process-wide:
+
+- the derived signing key per (secret key, date, region, service), at most
+  ``MAX_SIGNING_KEYS`` of them, so credential rotation evicts old keys;
+- the sorted lower-case header names and ``SignedHeaders`` value per
+  tuple of request header names;
+- the normalized, quoted canonical path per request path.
+
+Signatures are byte-for-byte those of ``SigV4Auth``; requests with a
+repeated header name take the regular path. ``enable_signing_cache``
+selects the signer for ``sagemaker-runtime`` operations through the
+``choose-signer`` event, only where botocore would use plain ``v4``.
+Disabled with ``SIGNING_CACHE_ENABLED=false``.
+"""
+import functools
+import hmac
+import os
+import threading
+from hashlib import sha256
+from urllib.parse import quote, urlsplit
+
+import botocore.auth
+from botocore.auth import SIGNED_HEADERS_BLACKLIST, SigV4Auth, _host_from_url
+from botocore.compat import ensure_unicode
+from botocore.utils import normalize_url_path
+
+SERVICE_ID = 'sagemaker-runtime'
+SIGNATURE_VERSION = 'v4-cached'
+MAX_SIGNING_KEYS = 16
+MAX_HEADER_LAYOUTS = 64
+
+_signing_keys = {}
+_header_layouts = {}
+_lock = threading.Lock()
+
+
+def signing_cache_enabled():
+    return os.environ.get('SIGNING_CACHE_ENABLED', 'true').lower() == 'true'
+
+
+def derive_signing_key(secret_key, datestamp, region_name, service_name):
+    """The SigV4 key chain, as ``SigV4Auth.signature`` computes it."""
+    k_date = hmac.new(f'AWS4{secret_key}'.encode(), datestamp.encode('utf-8'), sha256).digest()
+    k_region = hmac.new(k_date, region_name.encode('utf-8'), sha256).digest()
+    k_service = hmac.new(k_region, service_name.encode('utf-8'), sha256).digest()
+    return hmac.new(k_service, b'aws4_request', sha256).digest()
+
+
+def signing_key(secret_key, datestamp, region_name, service_name):
+    """Return the cached signing key, deriving it on first use for the day."""
+    cache_key = (secret_key, datestamp, region_name, service_name)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        key = derive_signing_key(secret_key, datestamp, region_name, service_name)
+        with _lock:
+            if len(_signing_keys) >= MAX_SIGNING_KEYS:
+                # Oldest first: yesterday's key or rotated-out credentials
+                del _signing_keys[next(iter(_signing_keys))]
+            _signing_keys[cache_key] = key
+    return key
+
+
+def header_layout(names):
+    """``(lower-case name, original name)`` pairs in signing order, plus ``SignedHeaders``.
+
+    Returns ``None`` when a header name repeats (in any case), which
+    ``SigV4Auth`` joins into one comma-separated canonical header.
+    """
+    layout = _header_layouts.get(names)
+    if layout is None:
+        signed = {}
+        for name in names:
+            lname = name.lower()
+            if lname in SIGNED_HEADERS_BLACKLIST:
+                continue
+            if lname in signed:
+                return None
+            signed[lname] = name
+        ordered = tuple(sorted(signed.items()))
+        layout = (ordered, ';'.join(lname for lname, _ in ordered))
+        with _lock:
+            if len(_header_layouts) >= MAX_HEADER_LAYOUTS:
+                _header_layouts.clear()
+            _header_layouts[names] = layout
+    return layout
+
+
+@functools.lru_cache(maxsize=256)
+def canonical_path(path):
+    """``SigV4Auth._normalize_url_path``, memoized."""
+    return quote(normalize_url_path(path), safe='/~')
+
+
+class CachedSigV4Auth(SigV4Auth):
+    """``SigV4Auth`` with cached signing keys, header layouts and paths."""
+
+    def _layout(self, request):
+        names = tuple(request.headers.keys())
+        if 'host' not in (name.lower() for name in names):
+            # SigV4Auth signs the host from the URL when the header is absent
+            names += ('host',)
+        return header_layout(names)
+
+    def canonical_request(self, request):
+        layout = self._layout(request)
+        if layout is None:
+            return super().canonical_request(request)
+        ordered, signed_headers = layout
+        headers = request.headers
+        lines = []
+        for lname, name in ordered:
+            value = headers[name] if name in headers else _host_from_url(request.url)
+            lines.append(f"{lname}:{ensure_unicode(' '.join(value.split()))}")
+        if 'X-Amz-Content-SHA256' in headers:
+            body_checksum = headers['X-Amz-Content-SHA256']
+        else:
+            body_checksum = self.payload(request)
+        request.context['sigv4_signed_headers'] = signed_headers
+        return '\n'.join((
+            request.method.upper(),
+            canonical_path(urlsplit(request.url).path),
+            self.canonical_query_string(request),
+            '\n'.join(lines) + '\n',
+            signed_headers,
+            body_checksum,
+        ))
+
+    def signature(self, string_to_sign, request):
+        key = signing_key(
+            self.credentials.secret_key, request.context['timestamp'][0:8], self._region_name, self._service_name
+        )
+        return hmac.new(key, string_to_sign.encode('utf-8'), sha256).hexdigest()
+
+    def _inject_signature_to_request(self, request, signature):
+        signed_headers = request.context.pop('sigv4_signed_headers', None)
+        if signed_headers is None:
+            return super()._inject_signature_to_request(request, signature)
+        request.headers['Authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.scope(request)}, '
+            f'SignedHeaders={signed_headers}, Signature={signature}'
+        )
+        return request
+
+
+def _choose_cached_signer(signature_version, context, **kwargs):
+    # Only plain v4 with a signed payload; presigning, sigv4a, bearer and
+    # unsigned-body operations keep botocore's choice
+    if signature_version != 'v4' or context.get('unsigned_payload'):
+        return None
+    return SIGNATURE_VERSION
+
+
+def enable_signing_cache(client):
+    """Sign ``client``'s requests with ``CachedSigV4Auth``; repeat calls are no-ops."""
+    client.meta.events.register(
+        f'choose-signer.{SERVICE_ID}', _choose_cached_signer, unique_id='cached-sigv4-signer'
+    )
+    return client
+
+
+def reset_signing_cache():
+    """Drop every cached signing key and header layout."""
+    with _lock:
+        _signing_keys.clear()
+        _header_layouts.clear()
+    canonical_path.cache_clear()
+
+
+botocore.auth.AUTH_TYPE_MAPS[SIGNATURE_VERSION] = CachedSigV4Auth
@@ -0,0 +1,157 @@
+"""Streaming inference through ``invoke_endpoint_with_response_stream``.
+
+botocore hands back the response body as an ``EventStream``, which decodes
+the ``application/vnd.amazon.eventstream`` frames incrementally with an
+``EventStreamBuffer`` as bytes arrive on the socket. ``iter_payload_parts``
+yields each ``PayloadPart`` as soon as it is decoded, so callers can forward
+it before the model has finished generating.
+
+The Python Lambda runtime cannot stream its own response, so
+``lambda_handler`` collects the parts in streaming mode. To forward chunks as
+they arrive, run this module as a chunked HTTP server instead::
+
+    python streaming.py --port 8080
+"""
+import argparse
+import logging
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from clients import get_client
+
+logger = logging.getLogger(__name__)
+
+
+def iter_payload_parts(sagemaker_client, endpoint_name, payload, content_type='application/json',
+                       target_variant=None, accept=None):
+    """Yield the bytes of each ``PayloadPart`` event as it is decoded.
+
+    ``ModelStreamError`` and ``InternalStreamFailure`` events are raised by
+    botocore as ``EventStreamError`` mid-iteration.
+    """
+    params = {}
+    if target_variant:
+        params['TargetVariant'] = target_variant
+    if accept:
+        params['Accept'] = accept
+    response = sagemaker_client.invoke_endpoint_with_response_stream(
+        EndpointName=endpoint_name,
+        ContentType=content_type,
+        Body=payload,
+        **params
+    )
+    event_stream = response['Body']
+    try:
+        for event in event_stream:
+            part = event.get('PayloadPart')
+            if part and part.get('Bytes'):
+                yield part['Bytes']
+    finally:
+        close = getattr(event_stream, 'close', None)
+        if close is not None:
+            close()
+
+
+def collect(parts):
+    """Join streamed parts, logging time to first chunk."""
+    start = time.perf_counter()
+    chunks = []
+    for chunk in parts:
+        if not chunks:
+            logger.info(f"First stream chunk after {(time.perf_counter() - start) * 1000:.1f} ms")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def streaming_enabled(event):
+    if 'stream' in event:
+        return bool(event['stream'])
+    return os.environ.get('SAGEMAKER_STREAMING', 'false').lower() == 'true'
+
+
+def default_stream(payload, content_type):
+    sagemaker_client = get_client(
+        'sagemaker-runtime',
+        endpoint_url=os.environ.get('SAGEMAKER_RUNTIME_ENDPOINT_URL'),
+    )
+    endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'default-endpoint')
+    return iter_payload_parts(sagemaker_client, endpoint_name, payload, content_type)
+
+
+class StreamingRequestHandler(BaseHTTPRequestHandler):
+    """POST a payload, receive the model output as HTTP/1.1 chunks."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', 'application/json')
+        try:
+            parts = self.server.stream(payload, content_type)
+            first = next(parts, None)
+        except Exception as e:
+            logger.error(f"Error invoking SageMaker endpoint: {str(e)}", exc_info=True)
+            body = f"Error invoking SageMaker: {str(e)}".encode('utf-8')
+            self.send_response(500)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            if first is not None:
+                self._write_chunk(first)
+                for chunk in parts:
+                    self._write_chunk(chunk)
+        except Exception as e:
+            # Headers are already out; terminate the connection so the
+            # client sees a truncated stream rather than a clean end.
+            logger.error(f"Stream failed mid-response: {str(e)}", exc_info=True)
+            self.close_connection = True
+            return
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def _write_chunk(self, chunk):
+        self.wfile.write(f"{len(chunk):X}\r\n".encode('ascii') + chunk + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+
+def make_server(host='0.0.0.0', port=8080, stream=None):
+    """Build a threaded chunked-streaming server.
+
+    ``stream(payload, content_type)`` returns an iterator of byte chunks and
+    defaults to streaming from ``SAGEMAKER_ENDPOINT_NAME``.
+    """
+    server = ThreadingHTTPServer((host, port), StreamingRequestHandler)
+    server.daemon_threads = True
+    server.stream = stream or default_stream
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunked HTTP proxy for streaming SageMaker inference')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(args.host, args.port)
+    logger.info(f"Streaming server listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
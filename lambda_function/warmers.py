@@ -0,0 +1,115 @@
+"""Scheduled warmer pings that keep containers hot without running inference.
+
+The EventBridge ``rate(5 minutes)`` rule invokes the function with a bare
+``Scheduled Event`` and no ``body``, which used to run a real inference on
+``"{}"``. Such events (and explicit ``{"warmer": true}`` pings) now only
+prepare the container for the next real request:
+
+- the ``sagemaker-runtime`` client is built, as ``lambda_handler`` builds it;
+- credentials are resolved (and refreshed if they are about to expire);
+- ``WARMER_CONNECTIONS`` (2) connections to the endpoint host are opened,
+  TLS handshake included, and parked in the client's urllib3 pool, where
+  the next call picks them up.
+
+Set ``WARMER_ENABLED=false`` to treat scheduled events as inference again.
+"""
+import json
+import logging
+import os
+import time
+
+import boto3
+
+from instrumentation import count, record
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTIONS = 2
+
+
+def warmer_enabled():
+    return os.environ.get('WARMER_ENABLED', 'true').lower() == 'true'
+
+
+def is_warmer(event):
+    """A scheduled EventBridge event without a request body, or an explicit ping."""
+    if not warmer_enabled() or not isinstance(event, dict) or 'body' in event:
+        return False
+    if event.get('warmer') is True:
+        return True
+    return event.get('source') == 'aws.events' and event.get('detail-type') == 'Scheduled Event'
+
+
+def resolve_credentials():
+    """Load credentials through the default session, as the client will sign."""
+    session = boto3.DEFAULT_SESSION
+    credentials = session.get_credentials() if session is not None else None
+    if credentials is None:
+        return None
+    # Refreshable credentials refresh here if they are close to expiry
+    return credentials.get_frozen_credentials()
+
+
+def prefill_pool(client, connections):
+    """Open ``connections`` to the client's endpoint and park them in its pool.
+
+    Returns how many were opened. Mirrors the lookup ``URLLib3Session.send``
+    does, so the next request finds the same pool; skipped behind a proxy,
+    where connecting means tunnelling per request.
+    """
+    http_session = getattr(getattr(client, '_endpoint', None), 'http_session', None)
+    manager_for = getattr(http_session, '_get_connection_manager', None)
+    if manager_for is None:
+        return 0
+    url = client.meta.endpoint_url
+    if http_session._proxy_config.proxy_url_for(url):
+        logger.info("Proxy configured, not pre-connecting")
+        return 0
+    pool = manager_for(url).connection_from_url(url)
+    http_session._setup_ssl_cert(pool, url, http_session._verify)
+
+    opened = []
+    try:
+        for _ in range(min(connections, pool.pool.maxsize)):
+            conn = pool._get_conn()
+            if conn.sock is None:
+                # TCP connect plus TLS handshake for HTTPS pools
+                conn.connect()
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            pool._put_conn(conn)
+    return len(opened)
+
+
+def warm(sagemaker_client):
+    """Resolve credentials and pre-connect, returning the handler response."""
+    started = time.perf_counter()
+    credentials = resolve_credentials()
+    credentials_done = time.perf_counter()
+    try:
+        connections = prefill_pool(
+            sagemaker_client, int(os.environ.get('WARMER_CONNECTIONS', DEFAULT_CONNECTIONS))
+        )
+    except Exception as e:
+        # A failed pre-connect only costs the next request its own handshake
+        logger.warning(f"Warmer could not pre-connect to {sagemaker_client.meta.endpoint_url}: {str(e)}")
+        connections = 0
+    finished = time.perf_counter()
+
+    record('WarmerCredentialsLatency', credentials_done - started)
+    record('WarmerConnectLatency', finished - credentials_done)
+    count('WarmerInvocations')
+    logger.info(
+        f"Warmer: credentials {'resolved' if credentials else 'unavailable'} in "
+        f"{(credentials_done - started) * 1000:.1f} ms, {connections} connection(s) opened in "
+        f"{(finished - credentials_done) * 1000:.1f} ms"
+    )
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'warmed': True,
+            'credentials': credentials is not None,
+            'connections': connections,
+        }),
+    }
@@ -28,6 +28,59 @@ data "aws_iam_policy_document" "lambda_basic" {
     # Scoped to specific endpoint pattern
     resources = ["arn:aws:sagemaker:*:*:endpoint/my-sagemaker-*"]
   }
+
+  # Optional features (variables.tf): granted only once configured
+  dynamic "statement" {
+    for_each = var.async_endpoint_name == null ? [] : [var.async_endpoint_name]
+    content {
+      actions   = ["sagemaker:InvokeEndpointAsync"]
+      resources = ["arn:aws:sagemaker:*:*:endpoint/${statement.value}"]
+    }
+  }
+  dynamic "statement" {
+    for_each = var.async_bucket == null ? [] : [var.async_bucket]
+    content {
+      actions   = ["s3:PutObject"]
+      resources = ["arn:aws:s3:::${statement.value}/${var.async_input_prefix}*"]
+    }
+  }
+  dynamic "statement" {
+    for_each = var.async_bucket == null ? [] : [var.async_bucket]
+    content {
+      actions   = ["s3:GetObject"]
+      resources = ["arn:aws:s3:::${statement.value}/${var.async_output_prefix}*"]
+    }
+  }
+  dynamic "statement" {
+    for_each = var.batch_bucket == null ? [] : [var.batch_bucket]
+    content {
+      # Inputs can be any key; HeadObject is authorized by GetObject
+      actions   = ["s3:GetObject"]
+      resources = ["arn:aws:s3:::${statement.value}/*"]
+    }
+  }
+  dynamic "statement" {
+    for_each = var.batch_bucket == null ? [] : [var.batch_bucket]
+    content {
+      actions   = ["s3:PutObject", "s3:AbortMultipartUpload"]
+      resources = ["arn:aws:s3:::${statement.value}/${var.batch_output_prefix}*"]
+    }
+  }
+  dynamic "statement" {
+    for_each = var.inference_cache_table == null ? [] : [var.inference_cache_table]
+    content {
+      actions   = ["dynamodb:GetItem", "dynamodb:PutItem"]
+      resources = ["arn:aws:dynamodb:*:*:table/${statement.value}"]
+    }
+  }
+  dynamic "statement" {
+    for_each = var.idempotency_table == null ? [] : [var.idempotency_table]
+    content {
+      # GetItem covers ReturnValuesOnConditionCheckFailure on a held key
+      actions   = ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:DeleteItem"]
+      resources = ["arn:aws:dynamodb:*:*:table/${statement.value}"]
+    }
+  }
 }
 
 module "iam_lambda" {
@@ -42,6 +95,17 @@ module "lambda" {
   function_name = "my_lambda_function"
   role_arn      = module.iam_lambda.role_arn
   filename      = "lambda_function_payload.zip"
+
+  environment_variables = { for name, value in {
+    SAGEMAKER_ASYNC_ENDPOINT_NAME = var.async_endpoint_name
+    SAGEMAKER_ASYNC_INPUT_BUCKET  = var.async_bucket
+    SAGEMAKER_ASYNC_INPUT_PREFIX  = var.async_bucket == null ? null : var.async_input_prefix
+    S3_OUTPUT_PREFIX              = var.batch_bucket == null ? null : var.batch_output_prefix
+    INFERENCE_CACHE_ENABLED       = var.inference_cache_table == null ? null : "true"
+    INFERENCE_CACHE_TABLE         = var.inference_cache_table
+    IDEMPOTENCY_ENABLED           = var.idempotency_table == null ? null : "true"
+    IDEMPOTENCY_TABLE             = var.idempotency_table
+  } : name => value if value != null }
 }
 
 # EventBridge module
@@ -7,6 +7,8 @@ resource "aws_cloudwatch_event_rule" "this" {
 # Add target source
 
 resource "aws_cloudwatch_event_target" "lambda_target" {
+  count = var.target_type == "lambda" ? 1 : 0
+
   rule = aws_cloudwatch_event_rule.this.name
   arn  = var.lambda_function_arn
 }
@@ -14,6 +16,8 @@ resource "aws_cloudwatch_event_target" "lambda_target" {
 # Add permissions for Eventbridge to invoke lambda
 
 resource "aws_lambda_permission" "allow_eventbridge" {
+  count = var.target_type == "lambda" ? 1 : 0
+
   statement_id  = "AllowExecutionFromEventBridge"
   action        = "lambda:InvokeFunction"
   function_name = var.lambda_function_name
@@ -21,4 +25,106 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   source_arn    = aws_cloudwatch_event_rule.this.arn
 }
 
+# SQS target variant: EventBridge -> queue -> Lambda in batches, so one
+# invocation serves many messages and only failed ones are redelivered
+
+resource "aws_sqs_queue" "dead_letter" {
+  count = var.target_type == "sqs" ? 1 : 0
+
+  name                      = "${var.name}-dlq"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+}
+
+resource "aws_sqs_queue" "this" {
+  count = var.target_type == "sqs" ? 1 : 0
+
+  name                       = var.name
+  visibility_timeout_seconds = var.sqs_visibility_timeout_seconds
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dead_letter[0].arn
+    maxReceiveCount     = var.sqs_max_receive_count
+  })
+}
+
+data "aws_iam_policy_document" "allow_eventbridge_send" {
+  count = var.target_type == "sqs" ? 1 : 0
+
+  statement {
+    actions   = ["sqs:SendMessage"]
+    resources = [aws_sqs_queue.this[0].arn]
+
+    principals {
+      type        = "Service"
+      identifiers = ["events.amazonaws.com"]
+    }
+
+    condition {
+      test     = "ArnEquals"
+      variable = "aws:SourceArn"
+      values   = [aws_cloudwatch_event_rule.this.arn]
+    }
+  }
+}
+
+resource "aws_sqs_queue_policy" "this" {
+  count = var.target_type == "sqs" ? 1 : 0
 
+  queue_url = aws_sqs_queue.this[0].id
+  policy    = data.aws_iam_policy_document.allow_eventbridge_send[0].json
+}
+
+resource "aws_cloudwatch_event_target" "sqs_target" {
+  count = var.target_type == "sqs" ? 1 : 0
+
+  rule  = aws_cloudwatch_event_rule.this.name
+  arn   = aws_sqs_queue.this[0].arn
+  input = var.input
+}
+
+resource "aws_lambda_event_source_mapping" "sqs" {
+  count = var.target_type == "sqs" ? 1 : 0
+
+  event_source_arn                   = aws_sqs_queue.this[0].arn
+  function_name                      = var.lambda_function_name
+  batch_size                         = var.sqs_batch_size
+  maximum_batching_window_in_seconds = var.sqs_maximum_batching_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# The Lambda role must be able to poll and delete from the queue
+
+resource "aws_iam_role_policy" "sqs_consume" {
+  count = var.target_type == "sqs" && var.lambda_role_name != null ? 1 : 0
+
+  name = "${var.name}-sqs-consume"
+  role = var.lambda_role_name
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = aws_sqs_queue.this[0].arn
+      }
+    ]
+  })
+}
+
+# The Lambda target resources gained a count; keep existing state in place
+
+moved {
+  from = aws_cloudwatch_event_target.lambda_target
+  to   = aws_cloudwatch_event_target.lambda_target[0]
+}
+
+moved {
+  from = aws_lambda_permission.allow_eventbridge
+  to   = aws_lambda_permission.allow_eventbridge[0]
+}
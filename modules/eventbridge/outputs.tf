@@ -3,3 +3,18 @@ output "rule_arn" {
   value       = aws_cloudwatch_event_rule.this.arn
 }
 
+
+output "queue_arn" {
+  description = "ARN of the SQS queue (SQS target only)"
+  value       = var.target_type == "sqs" ? aws_sqs_queue.this[0].arn : null
+}
+
+output "queue_url" {
+  description = "URL of the SQS queue (SQS target only)"
+  value       = var.target_type == "sqs" ? aws_sqs_queue.this[0].id : null
+}
+
+output "dead_letter_queue_arn" {
+  description = "ARN of the SQS dead-letter queue (SQS target only)"
+  value       = var.target_type == "sqs" ? aws_sqs_queue.dead_letter[0].arn : null
+}
@@ -27,3 +27,49 @@ variable "lambda_function_name" {
 }
 
 
+variable "target_type" {
+  description = "Rule target: \"lambda\" invokes the function directly, \"sqs\" queues events for batched delivery"
+  type        = string
+  default     = "lambda"
+
+  validation {
+    condition     = contains(["lambda", "sqs"], var.target_type)
+    error_message = "target_type must be \"lambda\" or \"sqs\"."
+  }
+}
+
+variable "input" {
+  description = "Static JSON sent as the message body for the SQS target (defaults to the event itself)"
+  type        = string
+  default     = null
+}
+
+variable "lambda_role_name" {
+  description = "Name of the Lambda execution role to grant SQS consume permissions (SQS target only)"
+  type        = string
+  default     = null
+}
+
+variable "sqs_batch_size" {
+  description = "Maximum number of messages per Lambda invocation"
+  type        = number
+  default     = 10
+}
+
+variable "sqs_maximum_batching_window_seconds" {
+  description = "How long to gather messages before invoking Lambda"
+  type        = number
+  default     = 5
+}
+
+variable "sqs_visibility_timeout_seconds" {
+  description = "Queue visibility timeout; should be at least six times the Lambda timeout"
+  type        = number
+  default     = 180
+}
+
+variable "sqs_max_receive_count" {
+  description = "Deliveries before a message moves to the dead-letter queue"
+  type        = number
+  default     = 5
+}
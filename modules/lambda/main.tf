@@ -7,9 +7,9 @@ resource "aws_lambda_function" "this" {
   source_code_hash = filebase64sha256(var.filename)
 
   environment {
-    variables = {
+    variables = merge({
       SAGEMAKER_ENDPOINT_NAME = "my-sagemaker-endpoint"
-    }
+    }, var.environment_variables)
   }
 }
 
@@ -27,4 +27,8 @@ variable "security_group_ids" {
   default     = []
 }
 
-
+variable "environment_variables" {
+  description = "Extra environment variables for the handler's optional features"
+  type        = map(string)
+  default     = {}
+}
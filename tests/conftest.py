@@ -0,0 +1,101 @@
+"""Shared pytest configuration for the test suite."""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# The Lambda package is deployed as a flat directory with its dependencies
+# vendored alongside the handler, so tests import it the same way.
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "lambda_function")
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+# The SageMaker runtime stub and its eventstream encoder live with the benchmarks
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.append(BENCHMARKS_DIR)
+
+# Raw HTTP body for botocore responses answered from a ``before-send`` hook;
+# test modules import it from here
+from _common import FakeRawResponse  # noqa: E402,F401
+
+
+class FakeClock:
+    """Manually advanced clock; move it with ``clock.now += seconds``."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    """A ``FakeClock`` for components that take a ``clock`` callable."""
+    return FakeClock()
+
+
+@pytest.fixture
+def lambda_env(monkeypatch):
+    """Provide a fixed endpoint/region and empty per-process caches."""
+    monkeypatch.setenv("SAGEMAKER_ENDPOINT_NAME", "mock-endpoint")
+    monkeypatch.setenv("AWS_REGION", "us-east-2")
+    monkeypatch.delenv("SAGEMAKER_RUNTIME_ENDPOINT_URL", raising=False)
+    import clients
+    import credential_providers
+    import endpoint_rules
+    import hedging
+    import idempotency
+    import overload_protection
+    import result_cache
+    import routing
+
+    def reset():
+        clients.reset_clients()
+        credential_providers.reset_credentials()
+        endpoint_rules.reset_endpoint_rules()
+        result_cache.reset_cache()
+        routing.reset_routers()
+        hedging.reset_hedgers()
+        idempotency.reset_idempotency()
+        overload_protection.reset_protectors()
+
+    reset()
+    yield
+    reset()
+
+
+@pytest.fixture
+def mock_client(lambda_env):
+    """Patch boto3.client with a SageMaker runtime mock returning a JSON body."""
+    client = MagicMock()
+    client.invoke_endpoint.return_value = {"Body": MagicMock(read=lambda: b'{"result": "success"}')}
+    with patch("clients.boto3.client", return_value=client) as factory:
+        client.factory = factory
+        yield client
+
+
+@pytest.fixture
+def make_client():
+    """Build real botocore clients with fake credentials and no network.
+
+    ``respond(request)`` handlers passed in answer every ``before-send``.
+    """
+    import botocore.session
+
+    def factory(service_name, respond=None, **kwargs):
+        client = botocore.session.get_session().create_client(
+            service_name,
+            region_name=kwargs.pop("region_name", "us-east-2"),
+            aws_access_key_id="AKIDTEST",
+            aws_secret_access_key="secret",
+            **kwargs,
+        )
+        if respond is not None:
+            client.meta.events.register("before-send", lambda request, **_: respond(request))
+        return client
+
+    return factory
@@ -0,0 +1,258 @@
+"""Unit tests for asynchronous inference of large or slow requests."""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+import async_inference
+import lambda_function
+from tests.conftest import FakeRawResponse
+
+
+@pytest.fixture
+def async_env(mock_client, monkeypatch):
+    """Configure an async endpoint and answer InvokeEndpointAsync."""
+    monkeypatch.setenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", "mock-async-endpoint")
+    monkeypatch.setenv("SAGEMAKER_ASYNC_INPUT_BUCKET", "inputs")
+    mock_client.invoke_endpoint_async.return_value = {
+        "InferenceId": "inf-1",
+        "OutputLocation": "s3://outputs/inf-1.out",
+        "FailureLocation": "s3://outputs/inf-1.err",
+    }
+    return mock_client
+
+
+def _sns_event(message):
+    return {"Records": [{"EventSource": "aws:sns", "Sns": {"Message": json.dumps(message)}}]}
+
+
+COMPLETED = {
+    "invocationStatus": "Completed",
+    "inferenceId": "inf-1",
+    "requestParameters": {"endpointName": "mock-async-endpoint"},
+    "responseParameters": {"sageMakerOutputLocation": "s3://outputs/results/inf-1.out"},
+}
+
+FAILED = {
+    "invocationStatus": "Failed",
+    "inferenceId": "inf-2",
+    "failureReason": "ClientError: model crashed",
+    "responseParameters": {"sageMakerFailureLocation": "s3://outputs/errors/inf-2.err"},
+}
+
+
+class TestModeSelection:
+    """Test suite for choosing between synchronous and asynchronous calls."""
+
+    def test_sync_without_async_endpoint(self, monkeypatch):
+        """Test that nothing goes async when no async endpoint is configured."""
+        monkeypatch.delenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", raising=False)
+        assert not async_inference.should_invoke_async({"async": True}, "x" * (7 * 1024 * 1024))
+
+    def test_large_payloads_go_async(self, monkeypatch):
+        """Test that payloads at the threshold are sent asynchronously."""
+        monkeypatch.setenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", "async")
+        monkeypatch.setenv("SAGEMAKER_ASYNC_THRESHOLD_BYTES", "10")
+        assert async_inference.should_invoke_async({}, b"0123456789")
+        assert not async_inference.should_invoke_async({}, "012345678")
+
+    def test_threshold_counts_encoded_bytes(self, monkeypatch):
+        """Test that text payloads are measured in UTF-8 bytes."""
+        monkeypatch.setenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", "async")
+        monkeypatch.setenv("SAGEMAKER_ASYNC_THRESHOLD_BYTES", "4")
+        assert async_inference.should_invoke_async({}, "éé")
+
+    def test_explicit_flag_wins(self, monkeypatch):
+        """Test that an event's async flag overrides the size rule."""
+        monkeypatch.setenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", "async")
+        monkeypatch.setenv("SAGEMAKER_ASYNC_THRESHOLD_BYTES", "1")
+        assert async_inference.should_invoke_async({"async": True}, "")
+        assert not async_inference.should_invoke_async({"async": False}, "large enough")
+
+    def test_input_location_goes_async(self, monkeypatch):
+        """Test that payloads already in S3 are sent asynchronously."""
+        monkeypatch.setenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", "async")
+        assert async_inference.should_invoke_async({"inputLocation": "s3://b/k"}, "{}")
+
+
+class TestSubmit:
+    """Test suite for staging payloads and starting async inference."""
+
+    def test_wire_request(self, make_client, monkeypatch):
+        """Test that InvokeEndpointAsync is sent with the staged input location."""
+        monkeypatch.setenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", "mock-async-endpoint")
+        monkeypatch.setenv("SAGEMAKER_ASYNC_INPUT_BUCKET", "inputs")
+        monkeypatch.setenv("SAGEMAKER_ASYNC_INPUT_PREFIX", "staged/")
+        sent = []
+
+        def respond(request):
+            sent.append(request)
+            headers = {
+                "X-Amzn-SageMaker-OutputLocation": "s3://outputs/abc.out",
+                "X-Amzn-SageMaker-FailureLocation": "s3://outputs/abc.err",
+            }
+            body = json.dumps({"InferenceId": "abc"}).encode()
+            return AWSResponse(request.url, 202, headers, FakeRawResponse(body))
+
+        client = make_client("sagemaker-runtime", respond=respond)
+        s3 = MagicMock()
+        event = {"contentType": "text/csv", "accept": "application/json", "inferenceId": "abc"}
+        response = async_inference.submit(client, event, b"1,2,3\n", s3=s3)
+
+        assert response["statusCode"] == 202
+        body = json.loads(response["body"])
+        assert body["inferenceId"] == "abc"
+        assert body["outputLocation"] == "s3://outputs/abc.out"
+        assert body["failureLocation"] == "s3://outputs/abc.err"
+
+        put = s3.put_object.call_args.kwargs
+        assert put["Bucket"] == "inputs"
+        assert put["Key"].startswith("staged/")
+        assert put["Body"] == b"1,2,3\n"
+        assert put["ContentType"] == "text/csv"
+        assert body["inputLocation"] == f"s3://inputs/{put['Key']}"
+
+        request = sent[0]
+        assert request.url.endswith("/endpoints/mock-async-endpoint/async-invocations")
+        assert request.headers["X-Amzn-SageMaker-InputLocation"] == body["inputLocation"].encode()
+        assert request.headers["X-Amzn-SageMaker-Content-Type"] == b"text/csv"
+        assert request.headers["X-Amzn-SageMaker-Accept"] == b"application/json"
+        assert request.headers["X-Amzn-SageMaker-Inference-Id"] == b"abc"
+
+    def test_existing_input_location_is_not_staged(self, async_env):
+        """Test that an inputLocation in the event is passed through as is."""
+        s3 = MagicMock()
+        event = {"inputLocation": "s3://mine/payload.json"}
+        response = async_inference.submit(async_env, event, "{}", s3=s3)
+
+        s3.put_object.assert_not_called()
+        kwargs = async_env.invoke_endpoint_async.call_args.kwargs
+        assert kwargs == {
+            "EndpointName": "mock-async-endpoint",
+            "ContentType": "application/json",
+            "InputLocation": "s3://mine/payload.json",
+        }
+        assert json.loads(response["body"])["inputLocation"] == "s3://mine/payload.json"
+
+
+class TestHandlerIntegration:
+    """Test suite for the handler's sync/async dispatch."""
+
+    def test_large_payload_returns_202(self, async_env, monkeypatch):
+        """Test that a payload over the threshold is staged and accepted."""
+        monkeypatch.setenv("SAGEMAKER_ASYNC_THRESHOLD_BYTES", "16")
+        response = lambda_function.lambda_handler({"body": json.dumps({"x": "y" * 32})}, None)
+
+        assert response["statusCode"] == 202
+        assert json.loads(response["body"])["inferenceId"] == "inf-1"
+        async_env.put_object.assert_called_once()
+        async_env.invoke_endpoint.assert_not_called()
+
+    def test_small_payload_stays_sync(self, async_env):
+        """Test that ordinary payloads still use InvokeEndpoint."""
+        response = lambda_function.lambda_handler({"body": '{"x": 1}'}, None)
+
+        assert response["statusCode"] == 200
+        async_env.invoke_endpoint.assert_called_once()
+        async_env.invoke_endpoint_async.assert_not_called()
+
+    def test_oversized_payload_without_async_endpoint(self, mock_client, monkeypatch):
+        """Test that payloads too large for InvokeEndpoint fail fast with 413."""
+        monkeypatch.delenv("SAGEMAKER_ASYNC_ENDPOINT_NAME", raising=False)
+        body = "x" * (async_inference.SYNC_PAYLOAD_LIMIT + 1)
+        response = lambda_function.lambda_handler({"body": body}, None)
+
+        assert response["statusCode"] == 413
+        mock_client.invoke_endpoint.assert_not_called()
+
+    def test_completion_notification(self, async_env):
+        """Test that an SNS success notification is collected, not invoked."""
+        async_env.get_object.return_value = {"Body": MagicMock(read=lambda: b'{"score": 0.9}')}
+        response = lambda_function.lambda_handler(_sns_event(COMPLETED), None)
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"])["completions"] == [
+            {"inferenceId": "inf-1", "status": "Completed", "outputLocation": "s3://outputs/results/inf-1.out"},
+        ]
+        async_env.get_object.assert_called_once_with(Bucket="outputs", Key="results/inf-1.out")
+        async_env.invoke_endpoint.assert_not_called()
+
+
+class TestCompletions:
+    """Test suite for SNS and EventBridge completion notifications."""
+
+    def test_non_completion_events(self):
+        """Test that ordinary, SQS and S3 events are not completions."""
+        assert not async_inference.is_completion_event({"body": "{}"})
+        assert not async_inference.is_completion_event({"Records": [{"eventSource": "aws:sqs"}]})
+        assert not async_inference.is_completion_event(
+            {"Records": [{"EventSource": "aws:sns", "Sns": {"Message": "not json"}}]}
+        )
+
+    def test_eventbridge_detail(self):
+        """Test that notifications forwarded through EventBridge are recognised."""
+        s3 = MagicMock()
+        s3.get_object.return_value = {"Body": MagicMock(read=lambda: b"ok")}
+        event = {"source": "custom.sagemaker", "detail": COMPLETED}
+
+        assert async_inference.is_completion_event(event)
+        response = async_inference.collect_completions(event, s3=s3)
+        assert json.loads(response["body"])["completions"][0]["inferenceId"] == "inf-1"
+
+    def test_failure_notification(self, caplog):
+        """Test that failures are reported with their reason and not read from S3."""
+        s3 = MagicMock()
+        response = async_inference.collect_completions(_sns_event(FAILED), s3=s3)
+
+        completion = json.loads(response["body"])["completions"][0]
+        assert completion == {
+            "inferenceId": "inf-2",
+            "status": "Failed",
+            "failureLocation": "s3://outputs/errors/inf-2.err",
+            "failureReason": "ClientError: model crashed",
+        }
+        s3.get_object.assert_not_called()
+        assert "model crashed" in caplog.text
+
+    def test_batch_of_notifications(self):
+        """Test that every record in an SNS batch is collected."""
+        s3 = MagicMock()
+        s3.get_object.return_value = {"Body": MagicMock(read=lambda: b"ok")}
+        event = _sns_event(COMPLETED)
+        event["Records"] += _sns_event(FAILED)["Records"]
+
+        completions = json.loads(async_inference.collect_completions(event, s3=s3)["body"])["completions"]
+        assert [c["status"] for c in completions] == ["Completed", "Failed"]
+
+    def test_missing_output_location_is_recorded(self):
+        """Test that a completion without an output location is reported, not fetched."""
+        s3 = MagicMock()
+        message = dict(COMPLETED, responseParameters={})
+        response = async_inference.collect_completions(_sns_event(message), s3=s3)
+
+        completion = json.loads(response["body"])["completions"][0]
+        assert completion["outputLocation"] is None
+        assert "no output location" in completion["error"]
+        s3.get_object.assert_not_called()
+
+    def test_unreadable_result_does_not_fail_batch(self, caplog):
+        """Test that an S3 error on one result still collects the others."""
+        s3 = MagicMock()
+        s3.get_object.side_effect = [
+            ClientError({"Error": {"Code": "NoSuchKey", "Message": "gone"}}, "GetObject"),
+            {"Body": MagicMock(read=lambda: b"ok")},
+        ]
+        event = _sns_event(COMPLETED)
+        event["Records"] += _sns_event(dict(COMPLETED, inferenceId="inf-3"))["Records"]
+
+        response = async_inference.collect_completions(event, s3=s3)
+        assert response["statusCode"] == 200
+        first, second = json.loads(response["body"])["completions"]
+        assert "NoSuchKey" in first["error"]
+        assert second == {
+            "inferenceId": "inf-3", "status": "Completed", "outputLocation": "s3://outputs/results/inf-1.out",
+        }
+        assert "Could not read result of async inference inf-1" in caplog.text
@@ -0,0 +1,206 @@
+"""Unit tests for batched multi-record inference."""
+
+import base64
+import json
+import threading
+import time
+
+import batching
+import lambda_function
+
+
+def _results(response):
+    return json.loads(response["body"])["results"]
+
+
+class TestFanOut:
+    """Test suite for concurrent per-record invocation."""
+
+    def test_results_preserve_input_order(self):
+        """Test that results come back in record order despite uneven latency."""
+        def invoke(body):
+            value = json.loads(body)["x"]
+            time.sleep(0.01 * (5 - value))
+            return json.dumps({"y": value * 2})
+
+        results = batching.fan_out(invoke, [{"x": i} for i in range(5)], workers=5)
+        assert [r["index"] for r in results] == list(range(5))
+        assert [json.loads(r["body"])["y"] for r in results] == [0, 2, 4, 6, 8]
+
+    def test_concurrency_is_bounded(self):
+        """Test that no more than the configured number of calls run at once."""
+        lock = threading.Lock()
+        active = {"now": 0, "peak": 0}
+
+        def invoke(body):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.01)
+            with lock:
+                active["now"] -= 1
+            return body
+
+        batching.fan_out(invoke, ["{}"] * 12, workers=3)
+        assert active["peak"] <= 3
+
+    def test_failed_record_does_not_fail_batch(self):
+        """Test that one failing record is reported without affecting others."""
+        def invoke(body):
+            if json.loads(body)["x"] == 1:
+                raise RuntimeError("bad record")
+            return body
+
+        results = batching.fan_out(invoke, [{"x": 0}, {"x": 1}, {"x": 2}], workers=2)
+        assert [r["statusCode"] for r in results] == [200, 500, 200]
+        assert "bad record" in results[1]["body"]
+        assert batching.batch_status(results) == 207
+
+
+    def test_binary_results_are_base64_encoded(self):
+        """Test that non-UTF-8 results are base64 encoded instead of failing the record."""
+        npy = b"\x93NUMPY\x01\x00\xff\xfe"
+        results = batching.fan_out(lambda body: npy, [{"x": 1}], workers=1)
+        assert results == [{
+            "index": 0, "statusCode": 200,
+            "body": base64.b64encode(npy).decode("ascii"), "isBase64Encoded": True,
+        }]
+
+    def test_binary_accept_is_base64_encoded(self):
+        """Test that a binary accept type is base64 encoded even when the bytes decode."""
+        results = batching.fan_out(lambda body: b"abc", [{"x": 1}], workers=1, accept="application/x-npy")
+        assert results[0]["isBase64Encoded"]
+        assert base64.b64decode(results[0]["body"]) == b"abc"
+
+
+class TestPack:
+    """Test suite for packing records into a single array request."""
+
+    def test_pack_sends_one_request_and_splits_response(self):
+        """Test that records are sent as one JSON array and split back out."""
+        calls = []
+
+        def invoke(body):
+            calls.append(json.loads(body))
+            return json.dumps([{"y": item["x"] + 1} for item in calls[-1]])
+
+        results = batching.pack(invoke, ['{"x": 1}', {"x": 2}])
+        assert calls == [[{"x": 1}, {"x": 2}]]
+        assert [json.loads(r["body"]) for r in results] == [{"y": 2}, {"y": 3}]
+
+    def test_pack_length_mismatch_fails_every_record(self):
+        """Test that a response of the wrong length marks all records failed."""
+        results = batching.pack(lambda body: "[1]", [{"x": 1}, {"x": 2}])
+        assert [r["statusCode"] for r in results] == [500, 500]
+        assert batching.batch_status(results) == 500
+
+
+class TestHandlerBatchMode:
+    """Test suite for the handler's records event shape."""
+
+    def test_records_event_invokes_each_record(self, mock_client):
+        """Test that a records event fans out one call per record."""
+        response = lambda_function.lambda_handler({"records": [{"a": 1}, {"a": 2}, "{}"]}, None)
+        assert response["statusCode"] == 200
+        assert len(_results(response)) == 3
+        assert mock_client.invoke_endpoint.call_count == 3
+
+    def test_pack_mode_from_environment(self, mock_client, monkeypatch):
+        """Test that SAGEMAKER_BATCH_MODE=pack sends a single request."""
+        monkeypatch.setenv("SAGEMAKER_BATCH_MODE", "pack")
+        mock_client.invoke_endpoint.return_value = {"Body": _Body(b"[1, 2]")}
+        response = lambda_function.lambda_handler({"records": [{"a": 1}, {"a": 2}]}, None)
+        assert mock_client.invoke_endpoint.call_count == 1
+        assert [r["body"] for r in _results(response)] == ["1", "2"]
+
+    def test_binary_batch_from_handler(self, mock_client):
+        """Test that a records event with a binary accept type returns base64 results."""
+        mock_client.invoke_endpoint.return_value = {"Body": _Body(b"\x93NUMPY\xff")}
+        response = lambda_function.lambda_handler({"records": ["{}"], "accept": "application/x-npy"}, None)
+        assert response["statusCode"] == 200
+        result = _results(response)[0]
+        assert result["isBase64Encoded"]
+        assert base64.b64decode(result["body"]) == b"\x93NUMPY\xff"
+
+
+def _sqs_event(bodies, queue="inference"):
+    return {"Records": [
+        {
+            "messageId": f"m{i}",
+            "receiptHandle": f"h{i}",
+            "body": body,
+            "eventSource": "aws:sqs",
+            "eventSourceARN": f"arn:aws:sqs:us-east-2:123456789012:{queue}",
+        }
+        for i, body in enumerate(bodies)
+    ]}
+
+
+class TestSQSBatch:
+    """Test suite for SQS event source mapping batches."""
+
+    def test_detects_sqs_events(self):
+        """Test that only SQS records are treated as an SQS batch."""
+        assert batching.is_sqs_event(_sqs_event(["{}"]))
+        assert not batching.is_sqs_event({"Records": [{"eventSource": "aws:s3"}]})
+        assert not batching.is_sqs_event({"records": [{}]})
+
+    def test_only_failed_messages_are_reported(self):
+        """Test that batchItemFailures lists exactly the failed message ids."""
+        def invoke(body):
+            if json.loads(body)["x"] % 2:
+                raise RuntimeError("bad message")
+            return body
+
+        response = batching.invoke_sqs_batch(invoke, _sqs_event([json.dumps({"x": i}) for i in range(5)]))
+        assert response == {"batchItemFailures": [{"itemIdentifier": "m1"}, {"itemIdentifier": "m3"}]}
+
+    def test_messages_run_concurrently(self, monkeypatch):
+        """Test that standard-queue messages are fanned out over the pool."""
+        monkeypatch.setenv("SAGEMAKER_BATCH_MAX_WORKERS", "4")
+        barrier = threading.Barrier(4, timeout=2)
+
+        def invoke(body):
+            barrier.wait()
+            return body
+
+        response = batching.invoke_sqs_batch(invoke, _sqs_event(["{}"] * 4))
+        assert response == {"batchItemFailures": []}
+
+    def test_fifo_stops_at_first_failure(self):
+        """Test that FIFO batches redeliver the failed message and everything after it."""
+        calls = []
+
+        def invoke(body):
+            calls.append(body)
+            if body == "2":
+                raise RuntimeError("bad message")
+            return body
+
+        response = batching.invoke_sqs_batch(invoke, _sqs_event(["1", "2", "3", "4"], queue="inference.fifo"))
+        assert calls == ["1", "2"]
+        assert [f["itemIdentifier"] for f in response["batchItemFailures"]] == ["m1", "m2", "m3"]
+
+    def test_handler_returns_partial_batch_response(self, mock_client):
+        """Test that the handler answers SQS events with batchItemFailures only."""
+        mock_client.invoke_endpoint.side_effect = [
+            {"Body": _Body(b"{}")}, RuntimeError("endpoint down"), {"Body": _Body(b"{}")},
+        ]
+        response = lambda_function.lambda_handler(_sqs_event(["{}", "{}", "{}"]), None)
+        assert mock_client.invoke_endpoint.call_count == 3
+        assert len(response["batchItemFailures"]) == 1
+        assert "statusCode" not in response
+
+    def test_binary_responses_are_not_failures(self, mock_client):
+        """Test that non-UTF-8 endpoint responses do not send messages back to the queue."""
+        mock_client.invoke_endpoint.return_value = {"Body": _Body(b"\x93NUMPY\xff")}
+        response = lambda_function.lambda_handler(_sqs_event(["{}", "{}"]), None)
+        assert response == {"batchItemFailures": []}
+
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
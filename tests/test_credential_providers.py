@@ -0,0 +1,331 @@
+"""Unit tests for the pinned credential provider."""
+
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import boto3
+import botocore.credentials
+import botocore.session
+import pytest
+
+import clients
+import credential_providers
+from credential_providers import BackgroundRefreshCredentials
+
+CREDENTIAL_VARS = (
+    "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN", "AWS_WEB_IDENTITY_TOKEN_FILE",
+    "AWS_ROLE_ARN", "AWS_CONTAINER_CREDENTIALS_RELATIVE_URI", "AWS_CONTAINER_CREDENTIALS_FULL_URI",
+    "CREDENTIAL_PROVIDER", "CREDENTIAL_ASYNC_REFRESH", "CREDENTIAL_REFRESHER_ENABLED",
+)
+
+
+@pytest.fixture
+def clean_env(lambda_env, monkeypatch):
+    for name in CREDENTIAL_VARS:
+        monkeypatch.delenv(name, raising=False)
+    # Any IMDS probe is a failure: pinning exists to skip it
+    def no_imds(self):
+        raise AssertionError("instance metadata was probed")
+
+    monkeypatch.setattr(botocore.credentials.InstanceMetadataProvider, "load", no_imds)
+    monkeypatch.setattr(boto3, "DEFAULT_SESSION", None)
+
+
+@pytest.fixture
+def container_endpoint():
+    requests = []
+    expiry = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=6)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            body = json.dumps({
+                "AccessKeyId": "AKIDCONTAINER", "SecretAccessKey": "secret",
+                "Token": "token", "Expiration": expiry,
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/creds", requests
+    server.shutdown()
+    server.server_close()
+
+
+def _expiring_in(seconds):
+    return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=seconds)
+
+
+def _metadata(access_key, seconds):
+    return {"access_key": access_key, "secret_key": "secret", "token": "token",
+            "expiry_time": _expiring_in(seconds).isoformat()}
+
+
+class TestConfiguration:
+    """Test suite for choosing the provider from the environment."""
+
+    def test_default_is_the_full_chain(self, clean_env):
+        """Test that nothing is pinned unless asked for."""
+        assert credential_providers.configured_provider() is None
+
+    def test_explicit_provider(self, clean_env, monkeypatch):
+        """Test that CREDENTIAL_PROVIDER names the provider."""
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "Web-Identity")
+        assert credential_providers.configured_provider() == "web-identity"
+
+    def test_unknown_provider(self, clean_env, monkeypatch):
+        """Test that an unknown name keeps the default chain."""
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "imds")
+        assert credential_providers.configured_provider() is None
+
+    @pytest.mark.parametrize("environ, expected", [
+        ({"AWS_ACCESS_KEY_ID": "AKID", "AWS_SECRET_ACCESS_KEY": "s", "AWS_ROLE_ARN": "arn"}, "env"),
+        ({"AWS_WEB_IDENTITY_TOKEN_FILE": "/var/run/token", "AWS_ROLE_ARN": "arn"}, "web-identity"),
+        ({"AWS_CONTAINER_CREDENTIALS_RELATIVE_URI": "/v2/credentials"}, "container"),
+        ({"AWS_CONTAINER_CREDENTIALS_FULL_URI": "http://169.254.170.23/v1/credentials"}, "container"),
+        ({"AWS_ROLE_ARN": "arn"}, None),
+    ])
+    def test_auto_detection(self, environ, expected):
+        """Test that auto picks the provider the environment configures."""
+        assert credential_providers.detect_provider(environ) == expected
+
+
+class TestPinnedResolution:
+    """Test suite for sessions with a pinned provider."""
+
+    def test_env_provider(self, clean_env, monkeypatch):
+        """Test that env credentials resolve without walking the chain."""
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "env")
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDENV")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+        session = botocore.session.get_session()
+        assert credential_providers.install(session) is True
+        credentials = session.get_credentials()
+        assert credentials.method == "env"
+        assert credentials.access_key == "AKIDENV"
+
+    def test_container_provider(self, clean_env, monkeypatch, container_endpoint):
+        """Test that container credentials are fetched and wrapped for background refresh."""
+        url, requests = container_endpoint
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "auto")
+        monkeypatch.setenv("AWS_CONTAINER_CREDENTIALS_FULL_URI", url)
+        session = botocore.session.get_session()
+        credential_providers.install(session)
+        credentials = session.get_credentials()
+        assert isinstance(credentials, BackgroundRefreshCredentials)
+        assert credentials.method == "container-role"
+        assert credentials.get_frozen_credentials().access_key == "AKIDCONTAINER"
+        assert requests == ["/creds"]
+
+    def test_shared_across_sessions(self, clean_env, monkeypatch, container_endpoint):
+        """Test that every session gets the same credentials from one fetch."""
+        url, requests = container_endpoint
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "container")
+        monkeypatch.setenv("AWS_CONTAINER_CREDENTIALS_FULL_URI", url)
+        sessions = [botocore.session.get_session() for _ in range(3)]
+        for session in sessions:
+            credential_providers.install(session)
+        assert len({id(session.get_credentials()) for session in sessions}) == 1
+        assert len(requests) == 1
+
+    def test_falls_back_to_the_chain(self, clean_env, monkeypatch):
+        """Test that a pinned provider with nothing to offer falls back to the full chain."""
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "env")
+        fallback = botocore.credentials.Credentials("AKIDCHAIN", "secret")
+
+        class Chain:
+            def load_credentials(self):
+                return fallback
+
+        monkeypatch.setattr(credential_providers, "create_credential_resolver", lambda session: Chain())
+        session = botocore.session.get_session()
+        credential_providers.install(session)
+        assert session.get_credentials() is fallback
+
+    def test_default_session_clients_share_credentials(self, clean_env, monkeypatch):
+        """Test that get_client pins boto3's default session."""
+        monkeypatch.setenv("CREDENTIAL_PROVIDER", "env")
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDENV")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+        runtime = clients.get_client("sagemaker-runtime")
+        s3 = clients.get_client("s3")
+        assert runtime._request_signer._credentials is s3._request_signer._credentials
+        assert isinstance(boto3.DEFAULT_SESSION._session.get_component("credential_provider"),
+                          credential_providers.SharedCredentialResolver)
+
+
+class TestBackgroundRefresh:
+    """Test suite for BackgroundRefreshCredentials."""
+
+    def test_advisory_refresh_does_not_block(self):
+        """Test that readers keep the old credentials while the refresh runs."""
+        started, release = threading.Event(), threading.Event()
+
+        def refresh():
+            started.set()
+            release.wait(5)
+            return _metadata("AKIDNEW", 3600)
+
+        # 12 minutes left: inside the advisory window, outside the mandatory one
+        credentials = BackgroundRefreshCredentials("AKIDOLD", "secret", "token", _expiring_in(720), refresh, "test")
+        assert credentials.get_frozen_credentials().access_key == "AKIDOLD"
+        assert started.wait(5)
+        assert credentials.get_frozen_credentials().access_key == "AKIDOLD"
+
+        release.set()
+        with credentials._refresh_lock:
+            pass
+        assert credentials.get_frozen_credentials().access_key == "AKIDNEW"
+
+    def test_one_refresh_at_a_time(self):
+        """Test that concurrent readers start a single background refresh."""
+        calls, release = [], threading.Event()
+
+        def refresh():
+            calls.append(1)
+            release.wait(5)
+            return _metadata("AKIDNEW", 3600)
+
+        credentials = BackgroundRefreshCredentials("AKIDOLD", "secret", "token", _expiring_in(720), refresh, "test")
+        for _ in range(5):
+            credentials.get_frozen_credentials()
+        release.set()
+        with credentials._refresh_lock:
+            pass
+        assert calls == [1]
+
+    def test_mandatory_refresh_blocks(self):
+        """Test that credentials about to expire are refreshed inline."""
+        credentials = BackgroundRefreshCredentials(
+            "AKIDOLD", "secret", "token", _expiring_in(60), lambda: _metadata("AKIDNEW", 3600), "test"
+        )
+        assert credentials.get_frozen_credentials().access_key == "AKIDNEW"
+
+    def test_failed_refresh_keeps_credentials(self):
+        """Test that a failing background refresh leaves the current set in place."""
+        def refresh():
+            raise RuntimeError("metadata endpoint down")
+
+        credentials = BackgroundRefreshCredentials("AKIDOLD", "secret", "token", _expiring_in(720), refresh, "test")
+        credentials.get_frozen_credentials()
+        with credentials._refresh_lock:
+            pass
+        assert credentials.get_frozen_credentials().access_key == "AKIDOLD"
+
+    def test_default_chain_is_untouched(self, clean_env):
+        """Test that sessions keep their own resolver unless something is configured."""
+        session = botocore.session.get_session()
+        assert credential_providers.install(session) is False
+        assert not isinstance(session.get_component("credential_provider"),
+                              credential_providers.SharedCredentialResolver)
+
+    def test_static_credentials_are_not_wrapped(self):
+        """Test that only refreshable credentials are wrapped."""
+        static = botocore.credentials.Credentials("AKID", "secret")
+        assert BackgroundRefreshCredentials.wrap(static) is static
+
+
+class TestRefresher:
+    """Test suite for the CredentialRefresher thread."""
+
+    @pytest.fixture
+    def refresher(self):
+        refresher = credential_providers.CredentialRefresher(lead_seconds=900, retry_seconds=0.05)
+        yield refresher
+        refresher.stop()
+
+    def test_refreshes_ahead_of_expiry(self, refresher):
+        """Test that credentials are refreshed and swapped before they expire."""
+        refreshed = threading.Event()
+
+        def refresh():
+            refreshed.set()
+            return _metadata("AKIDNEW", 3600)
+
+        credentials = BackgroundRefreshCredentials("AKIDOLD", "secret", "token", _expiring_in(0.5), refresh, "test")
+        refresher.register(credentials)
+        assert credentials.get_frozen_credentials().access_key == "AKIDOLD"
+        assert refreshed.wait(5)
+        with credentials._refresh_lock:
+            pass
+        assert credentials.get_frozen_credentials().access_key == "AKIDNEW"
+
+    def test_schedule_uses_the_lead_time(self, refresher):
+        """Test that refreshes are planned lead_seconds before expiry, or at half-life."""
+        long_lived = BackgroundRefreshCredentials("A", "s", "t", _expiring_in(3600), None, "test")
+        short_lived = BackgroundRefreshCredentials("A", "s", "t", _expiring_in(600), None, "test")
+        assert refresher._delay(long_lived) == pytest.approx(2700, abs=1)
+        assert refresher._delay(short_lived) == pytest.approx(300, abs=1)
+
+    def test_readers_do_not_block_during_refresh(self, refresher):
+        """Test that readers in the mandatory window get the current set while a refresh runs."""
+        started, release = threading.Event(), threading.Event()
+
+        def refresh():
+            started.set()
+            release.wait(5)
+            return _metadata("AKIDNEW", 3600)
+
+        # Five minutes left, well inside botocore's blocking window
+        credentials = BackgroundRefreshCredentials("AKIDOLD", "secret", "token", _expiring_in(300), refresh, "test")
+        refresher.register(credentials)
+        worker = threading.Thread(target=credentials.refresh_now)
+        worker.start()
+        assert started.wait(5)
+        assert credentials.get_frozen_credentials().access_key == "AKIDOLD"
+        release.set()
+        worker.join()
+        assert credentials.get_frozen_credentials().access_key == "AKIDNEW"
+
+    def test_expired_credentials_block(self, refresher):
+        """Test that readers refresh inline once the credentials have expired."""
+        credentials = BackgroundRefreshCredentials(
+            "AKIDOLD", "secret", "token", _expiring_in(-1), lambda: _metadata("AKIDNEW", 3600), "test"
+        )
+        credentials._refresher = refresher
+        assert credentials.get_frozen_credentials().access_key == "AKIDNEW"
+
+    def test_failures_are_retried(self, refresher):
+        """Test that a failed refresh is retried after retry_seconds."""
+        calls, refreshed = [], threading.Event()
+
+        def refresh():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("throttled")
+            refreshed.set()
+            return _metadata("AKIDNEW", 3600)
+
+        credentials = BackgroundRefreshCredentials("AKIDOLD", "secret", "token", _expiring_in(0.5), refresh, "test")
+        refresher.register(credentials)
+        assert refreshed.wait(5)
+        assert len(calls) == 2
+
+    def test_stop_restores_inline_refresh(self, refresher):
+        """Test that stopped refreshers hand refreshing back to readers."""
+        credentials = BackgroundRefreshCredentials(
+            "AKIDOLD", "secret", "token", _expiring_in(60), lambda: _metadata("AKIDNEW", 3600), "test"
+        )
+        refresher.register(credentials)
+        refresher.stop()
+        assert credentials._refresher is None
+        assert credentials.get_frozen_credentials().access_key == "AKIDNEW"
+
+    def test_default_chain_credentials_are_registered(self, clean_env, monkeypatch, container_endpoint):
+        """Test that the refresher also manages credentials found by the full chain."""
+        url, _ = container_endpoint
+        monkeypatch.setenv("CREDENTIAL_REFRESHER_ENABLED", "true")
+        monkeypatch.setenv("AWS_CONTAINER_CREDENTIALS_FULL_URI", url)
+        session = botocore.session.get_session()
+        assert credential_providers.install(session) is True
+        credentials = session.get_credentials()
+        assert credentials.method == "container-role"
+        assert credentials._refresher is credential_providers.get_refresher()
@@ -0,0 +1,123 @@
+"""Unit tests for deadline-aware timeouts derived from the Lambda context."""
+
+import pytest
+from botocore.exceptions import ReadTimeoutError
+
+import batching
+import deadlines
+import lambda_function
+
+
+class FakeContext:
+    """Lambda context stub reporting a fixed remaining time."""
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def _deadline(remaining_ms, **kwargs):
+    kwargs.setdefault("margin_ms", 500)
+    kwargs.setdefault("min_attempt_ms", 1000)
+    kwargs.setdefault("max_attempts", 3)
+    kwargs.setdefault("expected_latency_ms", 2000)
+    return deadlines.Deadline(remaining_ms, **kwargs)
+
+
+class TestDeadline:
+    """Test suite for deadline budgeting."""
+
+    def test_no_context_means_no_deadline(self):
+        """Test that local runs without a Lambda context keep botocore defaults."""
+        assert deadlines.Deadline.from_context(None) is None
+
+    def test_margin_is_reserved(self):
+        """Test that the safety margin is subtracted from the remaining time."""
+        deadline = _deadline(3000)
+        assert deadline.remaining() == pytest.approx(2.5, abs=0.05)
+
+    def test_long_budget_keeps_full_retries(self):
+        """Test that plenty of time allows max attempts and a long read timeout."""
+        deadline = _deadline(120_000)
+        config = deadline.client_config()
+        assert config.retries == {"mode": "standard", "total_max_attempts": 3}
+        assert config.read_timeout == 30
+        assert config.connect_timeout == 2.0
+
+    def test_short_budget_cuts_attempts_and_timeout(self):
+        """Test that a short budget gets one attempt with the whole budget as its timeout."""
+        deadline = _deadline(2400)
+        config = deadline.client_config()
+        assert config.retries["total_max_attempts"] == 1
+        assert config.read_timeout == 1.75
+        assert config.connect_timeout == 1.75
+
+    @pytest.mark.parametrize("remaining_ms", [2990, 2900])
+    def test_default_lambda_timeout_gets_one_long_attempt(self, remaining_ms):
+        """Test that the default 3 s Lambda timeout allows calls slower than 1 s."""
+        deadline = deadlines.Deadline(remaining_ms)
+        config = deadline.client_config()
+        assert config.retries["total_max_attempts"] == 1
+        assert config.read_timeout == 2.25
+
+    def test_default_lambda_timeout_handler_config(self, mock_client):
+        """Test that the handler's client fits one attempt of over 2 s in a 3 s Lambda."""
+        lambda_function.lambda_handler({"body": "{}"}, FakeContext(2990))
+        config = mock_client.factory.call_args.kwargs["config"]
+        assert config.retries["total_max_attempts"] == 1
+        assert config.read_timeout > 2
+
+    def test_retries_need_room_for_expected_latency(self):
+        """Test that retries are only added when each attempt still covers the expected latency."""
+        assert _deadline(6000).attempts() == 2
+        assert _deadline(6000).read_timeout() == 2
+        assert _deadline(6000, expected_latency_ms=3000).attempts() == 1
+        assert _deadline(6000, expected_latency_ms=3000).read_timeout() == 5.25
+
+    def test_timeouts_are_bucketed(self):
+        """Test that nearby budgets map to the same client config."""
+        assert _deadline(20_000).read_timeout() == _deadline(21_000).read_timeout()
+
+    def test_guard_fails_fast_once_budget_is_spent(self, fake_clock):
+        """Test that guarded calls raise DeadlineExceeded without invoking."""
+        deadline = _deadline(5000, clock=fake_clock)
+        calls = []
+        guarded = deadline.guard(lambda payload: calls.append(payload) or "ok")
+        assert guarded("a") == "ok"
+        fake_clock.now += 4.0
+        with pytest.raises(deadlines.DeadlineExceeded):
+            guarded("b")
+        assert calls == ["a"]
+
+
+class TestHandlerDeadline:
+    """Test suite for deadline handling in lambda_handler."""
+
+    def test_insufficient_time_returns_504_without_calling(self, mock_client):
+        """Test that the handler refuses to start when no attempt fits."""
+        response = lambda_function.lambda_handler({"body": "{}"}, FakeContext(900))
+        assert response["statusCode"] == 504
+        mock_client.invoke_endpoint.assert_not_called()
+
+    def test_client_config_comes_from_context(self, mock_client):
+        """Test that the client is created with deadline-derived timeouts."""
+        lambda_function.lambda_handler({"body": "{}"}, FakeContext(10_000))
+        config = mock_client.factory.call_args.kwargs["config"]
+        assert config.read_timeout == 2
+        assert config.retries["total_max_attempts"] == 3
+
+    def test_read_timeout_is_reported_as_504(self, mock_client):
+        """Test that a botocore read timeout maps to a 504 response."""
+        mock_client.invoke_endpoint.side_effect = ReadTimeoutError(endpoint_url="https://x")
+        response = lambda_function.lambda_handler({"body": "{}"}, FakeContext(10_000))
+        assert response["statusCode"] == 504
+
+    def test_batch_records_past_deadline_get_504(self):
+        """Test that batch records report deadline failures as 504."""
+        def invoke(payload):
+            raise deadlines.DeadlineExceeded("out of time")
+
+        results = batching.fan_out(invoke, ["{}"], workers=1)
+        assert results[0]["statusCode"] == 504
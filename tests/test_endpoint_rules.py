@@ -0,0 +1,268 @@
+"""Unit tests for compiled endpoint rulesets."""
+
+import itertools
+import os
+
+import botocore.regions
+import botocore.session
+import pytest
+from botocore.endpoint_provider import EndpointProvider, RuleSet
+from botocore.exceptions import EndpointResolutionError
+from botocore.loaders import Loader
+
+import clients
+import endpoint_rules
+import model_bundle
+from endpoint_rules import CompiledEndpointProvider, CompiledRuleSet
+
+REGIONS = ["us-east-2", "eu-west-1", "cn-north-1", "us-gov-west-1", "us-iso-east-1", "aws-global", "bad region"]
+ENDPOINTS = [None, "https://example.com", "http://localhost:8080/base/", "https://[::1]:8443", "ftp://example.com"]
+BUCKETS = [
+    "bucket",
+    "my.dotted.bucket",
+    "Not_Valid",
+    "bucket--use1-az4--x-s3",
+    "arn:aws:s3:us-west-2:123456789012:accesspoint:reports",
+    "arn:aws:s3-object-lambda:us-east-1:123456789012:accesspoint/banner",
+    "arn:aws:s3-outposts:us-west-2:123456789012:outpost/op-01234567890123456/accesspoint/reports",
+    "arn:aws:s3::123456789012:accesspoint:mfzwi23gnjvgw.mrap",
+    "arn:aws:sqs:us-west-2:123456789012:queue",
+]
+
+
+@pytest.fixture(autouse=True)
+def clean_rules():
+    endpoint_rules.reset_endpoint_rules()
+    yield
+    endpoint_rules.reset_endpoint_rules()
+
+
+@pytest.fixture(scope="module")
+def loader():
+    return Loader()
+
+
+@pytest.fixture(scope="module")
+def partitions(loader):
+    return loader.load_data("partitions")
+
+
+def _evaluate(ruleset, params):
+    try:
+        return ruleset.evaluate(dict(params))
+    except Exception as e:
+        return type(e), str(e)
+
+
+def _assert_equivalent(loader, partitions, service, cases):
+    data = loader.load_service_model(service, "endpoint-rule-set-1")
+    interpreted = RuleSet(**data, partitions=partitions)
+    compiled = CompiledRuleSet(endpoint_rules.compiled_code(data), **data, partitions=partitions)
+    for params in cases:
+        assert _evaluate(compiled, params) == _evaluate(interpreted, params), params
+
+
+def _ruleset(rules, parameters=None):
+    return {
+        "version": "1.0",
+        "parameters": parameters or {"Region": {"type": "String", "builtIn": "AWS::Region"}},
+        "rules": rules,
+    }
+
+
+class TestEquivalence:
+    """Test suite for compiled rulesets resolving exactly like botocore's."""
+
+    @pytest.mark.parametrize("service", ["sagemaker-runtime", "sts"])
+    def test_regions_and_variants(self, loader, partitions, service):
+        """Test that every region/FIPS/dual-stack/endpoint combination matches."""
+        cases = [
+            {"Region": region, "UseFIPS": fips, "UseDualStack": dual_stack, "Endpoint": endpoint}
+            for region, fips, dual_stack, endpoint in itertools.product(
+                REGIONS, [True, False], [True, False], ENDPOINTS
+            )
+        ]
+        _assert_equivalent(loader, partitions, service, cases)
+
+    def test_s3_buckets(self, loader, partitions):
+        """Test that S3 buckets, access point ARNs and addressing flags match."""
+        cases = [
+            {
+                "Bucket": bucket, "Region": region, "ForcePathStyle": path_style,
+                "Accelerate": accelerate, "UseArnRegion": use_arn_region, "Endpoint": endpoint,
+            }
+            for bucket, region, path_style, accelerate, use_arn_region, endpoint in itertools.product(
+                BUCKETS, ["us-west-2", "us-east-1", "cn-north-1"], [True, False], [True, False],
+                [True, None], [None, "https://example.com"],
+            )
+        ]
+        _assert_equivalent(loader, partitions, "s3", cases)
+
+    def test_invalid_input(self, loader, partitions):
+        """Test that parameter validation errors are botocore's."""
+        _assert_equivalent(loader, partitions, "sagemaker-runtime", [{"Region": "us-east-2", "UseFIPS": "yes"}])
+
+    def test_all_services_compile(self, loader):
+        """Test that every ruleset shipped with botocore compiles."""
+        for service in loader.list_available_services("endpoint-rule-set-1"):
+            assert endpoint_rules.compiled_code(loader.load_service_model(service, "endpoint-rule-set-1")) is not None
+
+    def test_assignments_are_scoped_to_their_rule(self, partitions):
+        """Test that a sibling rule does not see another rule's assignment."""
+        data = _ruleset([
+            {
+                "type": "tree",
+                "conditions": [{"fn": "isSet", "argv": [{"ref": "Region"}]}],
+                "rules": [
+                    {
+                        "type": "tree",
+                        "conditions": [
+                            {"fn": "aws.partition", "argv": [{"ref": "Region"}], "assign": "Part"},
+                            {"fn": "booleanEquals", "argv": [False, True]},
+                        ],
+                        "rules": [{"type": "error", "conditions": [], "error": "unreachable"}],
+                    },
+                    {
+                        "type": "endpoint",
+                        "conditions": [{"fn": "not", "argv": [{"fn": "isSet", "argv": [{"ref": "Part"}]}]}],
+                        "endpoint": {"url": "https://{Region}.example.com", "properties": {}, "headers": {}},
+                    },
+                ],
+            },
+            {"type": "error", "conditions": [], "error": "Region is required"},
+        ])
+        provider = CompiledEndpointProvider(data, partitions)
+        assert provider.resolve_endpoint(Region="us-east-2").url == "https://us-east-2.example.com"
+        with pytest.raises(EndpointResolutionError, match="Region is required"):
+            provider.resolve_endpoint()
+
+
+class TestFallback:
+    """Test suite for rulesets the compiler does not handle."""
+
+    def test_shadowing_assignment_is_interpreted(self, partitions, monkeypatch):
+        """Test that an assignment over a parameter falls back to the interpreted RuleSet."""
+        monkeypatch.setenv("ENDPOINT_RULES_COMPILE_AFTER", "0")
+        data = _ruleset([
+            {
+                "type": "endpoint",
+                "conditions": [{"fn": "isSet", "argv": [{"ref": "Region"}]}],
+                "endpoint": {"url": "https://{Region}.example.com", "properties": {}, "headers": {}},
+            },
+            {
+                "type": "error",
+                "conditions": [{"fn": "aws.partition", "argv": ["us-east-1"], "assign": "Region"}],
+                "error": "Region is required",
+            },
+        ])
+        provider = CompiledEndpointProvider(data, partitions)
+        assert not isinstance(provider.ruleset, CompiledRuleSet)
+        assert provider.resolve_endpoint(Region="eu-west-1").url == "https://eu-west-1.example.com"
+
+
+class TestCaching:
+    """Test suite for when rulesets are compiled and where the code is kept."""
+
+    @pytest.fixture
+    def s3_rules(self, loader):
+        return loader.load_service_model("s3", "endpoint-rule-set-1")
+
+    def test_compiled_after_enough_misses(self, s3_rules, partitions, monkeypatch):
+        """Test that a new ruleset is interpreted until it has missed the cache often enough."""
+        monkeypatch.setenv("ENDPOINT_RULES_COMPILE_AFTER", "3")
+        provider = CompiledEndpointProvider(s3_rules, partitions)
+        for bucket in ("a-bucket", "b-bucket", "a-bucket"):
+            provider.resolve_endpoint(Region="us-west-2", Bucket=bucket)
+        assert not isinstance(provider.ruleset, CompiledRuleSet)
+        endpoint = provider.resolve_endpoint(Region="us-west-2", Bucket="c-bucket")
+        assert isinstance(provider.ruleset, CompiledRuleSet)
+        assert endpoint.url == "https://c-bucket.s3.us-west-2.amazonaws.com"
+
+    def test_compiled_code_is_shared(self, s3_rules, partitions, monkeypatch):
+        """Test that later providers for the same ruleset start compiled."""
+        monkeypatch.setenv("ENDPOINT_RULES_COMPILE_AFTER", "0")
+        CompiledEndpointProvider(s3_rules, partitions)
+        monkeypatch.setattr(endpoint_rules, "compile_ruleset", None)
+        assert isinstance(CompiledEndpointProvider(s3_rules, partitions).ruleset, CompiledRuleSet)
+
+    def test_in_memory_cache_is_bounded(self, monkeypatch):
+        """Test that only the most recent rulesets keep their compiled code."""
+        monkeypatch.setattr(endpoint_rules, "MAX_CACHED_RULESETS", 2)
+        rulesets = [
+            _ruleset([{"type": "error", "conditions": [], "error": f"ruleset {i}"}]) for i in range(3)
+        ]
+        codes = [endpoint_rules.compiled_code(data) for data in rulesets]
+        assert len(endpoint_rules._compiled) == 2
+        assert endpoint_rules.compiled_code(rulesets[2]) is codes[2]
+        assert endpoint_rules.compiled_code(rulesets[0]) is not codes[0]
+
+    def test_entries_match_by_identity(self):
+        """Test that an entry is never used for a different object under the same id."""
+        data = _ruleset([{"type": "error", "conditions": [], "error": "mine"}])
+        other = _ruleset([{"type": "error", "conditions": [], "error": "other"}])
+        stale = endpoint_rules.compile_code(other)
+        endpoint_rules._compiled[id(data)] = (other, stale)
+        assert endpoint_rules.compiled_code(data) is not stale
+        assert endpoint_rules._compiled[id(data)][0] is data
+
+    def test_disk_cache_round_trip(self, s3_rules, partitions, monkeypatch, tmp_path):
+        """Test that code written to the cache directory is loaded by a new process."""
+        monkeypatch.setenv("ENDPOINT_RULES_CACHE_DIR", str(tmp_path))
+        monkeypatch.setenv("ENDPOINT_RULES_COMPILE_AFTER", "0")
+        CompiledEndpointProvider(s3_rules, partitions)
+        assert len(os.listdir(tmp_path)) == 1
+
+        endpoint_rules.reset_endpoint_rules()
+        monkeypatch.setattr(endpoint_rules, "compile_ruleset", None)
+        provider = CompiledEndpointProvider(s3_rules, partitions)
+        assert isinstance(provider.ruleset, CompiledRuleSet)
+        assert provider.resolve_endpoint(Region="us-west-2", Bucket="bucket").url == (
+            "https://bucket.s3.us-west-2.amazonaws.com"
+        )
+
+    def test_unreadable_cache_file_is_ignored(self, s3_rules, partitions, monkeypatch, tmp_path):
+        """Test that a corrupt cache file leads to a fresh compile, not an error."""
+        monkeypatch.setenv("ENDPOINT_RULES_CACHE_DIR", str(tmp_path))
+        monkeypatch.setenv("ENDPOINT_RULES_COMPILE_AFTER", "0")
+        digest = endpoint_rules.ruleset_digest(s3_rules)
+        with open(endpoint_rules.cache_path(str(tmp_path), digest), "wb") as fp:
+            fp.write(b"\x00not marshal")
+        assert isinstance(CompiledEndpointProvider(s3_rules, partitions).ruleset, CompiledRuleSet)
+
+    def test_bundle_ships_compiled_rules(self, tmp_path, monkeypatch):
+        """Test that clients built from a model bundle load its compiled rulesets."""
+        bundle_dir = str(tmp_path / "model_bundle")
+        model_bundle.build_bundle(bundle_dir, services=["sagemaker-runtime"])
+        monkeypatch.setattr(endpoint_rules, "compile_ruleset", None)
+        session = botocore.session.get_session()
+        model_bundle.install(bundle_dir, session)
+        endpoint_rules.install()
+        client = session.create_client(
+            "sagemaker-runtime", region_name="us-east-2",
+            aws_access_key_id="AKIDTEST", aws_secret_access_key="secret",
+        )
+        assert isinstance(client._ruleset_resolver._provider.ruleset, CompiledRuleSet)
+        assert client.meta.endpoint_url == "https://runtime.sagemaker.us-east-2.amazonaws.com"
+
+
+class TestInstall:
+    """Test suite for switching botocore to the compiled provider."""
+
+    def test_clients_use_compiled_provider(self, lambda_env):
+        """Test that clients from the registry resolve through CompiledEndpointProvider."""
+        client = clients.get_client("sagemaker-runtime")
+        assert isinstance(client._ruleset_resolver._provider, CompiledEndpointProvider)
+        assert client.meta.endpoint_url == "https://runtime.sagemaker.us-east-2.amazonaws.com"
+
+    def test_disabled(self, lambda_env, monkeypatch):
+        """Test that ENDPOINT_RULES_COMPILED=false keeps botocore's provider."""
+        monkeypatch.setenv("ENDPOINT_RULES_COMPILED", "false")
+        client = clients.get_client("sagemaker-runtime")
+        assert type(client._ruleset_resolver._provider) is EndpointProvider
+
+    def test_reset_restores_botocore_provider(self):
+        """Test that reset_endpoint_rules undoes install."""
+        assert endpoint_rules.install()
+        assert botocore.regions.EndpointProvider is CompiledEndpointProvider
+        endpoint_rules.reset_endpoint_rules()
+        assert botocore.regions.EndpointProvider is EndpointProvider
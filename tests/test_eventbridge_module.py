@@ -0,0 +1,73 @@
+"""Unit tests for the EventBridge Terraform module's target variants."""
+
+import os
+import re
+
+import pytest
+
+MODULE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "modules", "eventbridge")
+
+
+@pytest.fixture
+def main_tf():
+    with open(os.path.join(MODULE_DIR, "main.tf")) as f:
+        return f.read()
+
+
+@pytest.fixture
+def variables_tf():
+    with open(os.path.join(MODULE_DIR, "variables.tf")) as f:
+        return f.read()
+
+
+def _resource(content, resource_type, name):
+    """Return the body of one resource block."""
+    match = re.search(
+        rf'resource\s+"{resource_type}"\s+"{name}"\s*\{{(.*?)\n\}}', content, re.DOTALL
+    )
+    assert match is not None, f"{resource_type}.{name} not found"
+    return match.group(1)
+
+
+class TestEventBridgeTargets:
+    """Test suite for the Lambda and SQS target variants."""
+
+    def test_target_type_defaults_to_lambda(self, variables_tf):
+        """Test that existing callers keep the direct Lambda target."""
+        block = re.search(r'variable\s+"target_type"\s*\{(.*?)\n\}', variables_tf, re.DOTALL).group(1)
+        assert re.search(r'default\s*=\s*"lambda"', block)
+        assert 'contains(["lambda", "sqs"], var.target_type)' in block
+
+    def test_lambda_resources_are_conditional(self, main_tf):
+        """Test that the Lambda target and permission exist only for the lambda variant."""
+        for resource_type, name in (
+            ("aws_cloudwatch_event_target", "lambda_target"),
+            ("aws_lambda_permission", "allow_eventbridge"),
+        ):
+            assert 'count = var.target_type == "lambda" ? 1 : 0' in _resource(main_tf, resource_type, name)
+
+    def test_lambda_resources_keep_their_state(self, main_tf):
+        """Test that moved blocks map the old addresses to the counted ones."""
+        assert "from = aws_cloudwatch_event_target.lambda_target\n" in main_tf
+        assert "from = aws_lambda_permission.allow_eventbridge\n" in main_tf
+
+    def test_sqs_mapping_reports_batch_item_failures(self, main_tf):
+        """Test that the event source mapping enables partial batch responses."""
+        mapping = _resource(main_tf, "aws_lambda_event_source_mapping", "sqs")
+        assert 'function_response_types            = ["ReportBatchItemFailures"]' in mapping
+        assert "batch_size" in mapping
+
+    def test_sqs_queue_has_dead_letter_queue(self, main_tf):
+        """Test that repeatedly failing messages end up in a dead-letter queue."""
+        queue = _resource(main_tf, "aws_sqs_queue", "this")
+        assert "deadLetterTargetArn = aws_sqs_queue.dead_letter[0].arn" in queue
+
+    @pytest.mark.parametrize("name", ["this", "dead_letter"])
+    def test_sqs_queues_are_encrypted(self, main_tf, name):
+        """Test that both queues are encrypted at rest with SQS-managed keys."""
+        assert re.search(r"sqs_managed_sse_enabled\s*=\s*true", _resource(main_tf, "aws_sqs_queue", name))
+
+    def test_only_the_rule_may_send_to_the_queue(self, main_tf):
+        """Test that the queue policy is scoped to this rule's ARN."""
+        assert "aws:SourceArn" in main_tf
+        assert "values   = [aws_cloudwatch_event_rule.this.arn]" in main_tf
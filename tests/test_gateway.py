@@ -0,0 +1,310 @@
+"""Unit tests for the long-running asyncio HTTP gateway."""
+
+import asyncio
+import base64
+import http.client
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import gateway
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+
+class GatewayThread:
+    """Runs a gateway on its own event loop in a background thread."""
+
+    def __init__(self, handler, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.gateway = gateway.Gateway(handler, **kwargs)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.port, self.metrics_port = self.run(self.gateway.start("127.0.0.1", 0, 0))
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(10)
+
+    def connect(self, port=None):
+        return http.client.HTTPConnection("127.0.0.1", port or self.port, timeout=5)
+
+    def close(self):
+        if not self.gateway.draining:
+            self.run(self.gateway.drain())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def start():
+    started = []
+
+    def factory(handler, **kwargs):
+        thread = GatewayThread(handler, **kwargs)
+        started.append(thread)
+        return thread
+
+    yield factory
+    for thread in started:
+        thread.close()
+
+
+def echo(event, context):
+    return {"statusCode": 200, "body": event.get("body", "")}
+
+
+class TestInvocations:
+    """Test suite for /invocations and /events."""
+
+    def test_body_becomes_proxy_event(self, start):
+        """Test that the request becomes an API Gateway proxy event."""
+        events = []
+
+        def handler(event, context):
+            events.append(event)
+            return {"statusCode": 200, "body": '{"ok": true}'}
+
+        server = start(handler)
+        conn = server.connect()
+        conn.request("POST", "/invocations?variant=a", body=b'{"x": 1}',
+                     headers={"Content-Type": "application/json", "Accept": "application/json"})
+        response = conn.getresponse()
+        assert response.status == 200
+        assert response.read() == b'{"ok": true}'
+        assert response.getheader("Content-Type") == "application/json"
+        event = events[0]
+        assert event["body"] == '{"x": 1}'
+        assert event["headers"]["accept"] == "application/json"
+        assert event["queryStringParameters"] == {"variant": "a"}
+
+    def test_binary_round_trip(self, start):
+        """Test that binary bodies are base64 encoded for the handler and decoded back."""
+        def handler(event, context):
+            assert event["isBase64Encoded"] is True
+            return {"statusCode": 200, "body": event["body"], "isBase64Encoded": True,
+                    "headers": {"Content-Type": "application/x-npy"}}
+
+        server = start(handler)
+        conn = server.connect()
+        conn.request("POST", "/invocations", body=b"\x93NUMPY\x00\xff",
+                     headers={"Content-Type": "application/x-npy"})
+        response = conn.getresponse()
+        assert response.read() == b"\x93NUMPY\x00\xff"
+        assert response.getheader("Content-Type") == "application/x-npy"
+
+    def test_events_route_passes_the_event(self, start):
+        """Test that /events hands the JSON body to the handler as the event."""
+        server = start(lambda event, context: {"statusCode": 200, "body": json.dumps(event)})
+        conn = server.connect()
+        conn.request("POST", "/events", body=json.dumps({"records": [1, 2]}))
+        assert json.loads(conn.getresponse().read()) == {"records": [1, 2]}
+
+    def test_sqs_style_response(self, start):
+        """Test that responses without a statusCode are returned as JSON."""
+        server = start(lambda event, context: {"batchItemFailures": []})
+        conn = server.connect()
+        conn.request("POST", "/events", body=b"{}")
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read()) == {"batchItemFailures": []}
+
+    def test_handler_exception(self, start):
+        """Test that a raising handler becomes a 500."""
+        def handler(event, context):
+            raise RuntimeError("boom")
+
+        server = start(handler)
+        conn = server.connect()
+        conn.request("POST", "/invocations", body=b"{}")
+        response = conn.getresponse()
+        assert response.status == 500
+        assert b"boom" in response.read()
+
+    def test_unknown_route_and_method(self, start):
+        """Test that unknown paths get 404 and non-POST invocations 405."""
+        server = start(echo)
+        conn = server.connect()
+        conn.request("GET", "/nope")
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 404
+        conn.request("GET", "/invocations")
+        assert conn.getresponse().status == 405
+
+    def test_chunked_request_body(self, start):
+        """Test that chunked request bodies are reassembled."""
+        server = start(echo)
+        conn = server.connect()
+        conn.request("POST", "/invocations", body=iter([b'{"a"', b': 1}']), encode_chunked=True,
+                     headers={"Transfer-Encoding": "chunked"})
+        assert conn.getresponse().read() == b'{"a": 1}'
+
+
+    @pytest.mark.parametrize("head, message", [
+        (b"Content-Length: ten\r\n", b"Malformed Content-Length"),
+        (b"Content-Length: -5\r\n", b"Malformed Content-Length"),
+        (b"Transfer-Encoding: chunked\r\n\r\nzz\r\n", b"Malformed chunk size"),
+        (b"Transfer-Encoding: chunked\r\n\r\n-5\r\n", b"Malformed chunk size"),
+    ])
+    def test_malformed_body_length_is_rejected(self, start, head, message):
+        """Test that bad Content-Length and chunk sizes get a 400 instead of a dropped connection."""
+        server = start(echo)
+        conn = server.connect()
+        conn.connect()
+        request = b"POST /invocations HTTP/1.1\r\nHost: localhost\r\n" + head
+        if b"chunked" not in head:
+            request += b"\r\n"
+        conn.sock.sendall(request)
+        response = http.client.HTTPResponse(conn.sock)
+        response.begin()
+        assert response.status == 400
+        assert response.read() == message
+
+
+class TestConnections:
+    """Test suite for keep-alive, concurrency limits and draining."""
+
+    def test_keep_alive(self, start):
+        """Test that several requests share one connection."""
+        server = start(echo)
+        conn = server.connect()
+        conn.request("POST", "/invocations", body=b"1")
+        response = conn.getresponse()
+        assert response.getheader("Connection") == "keep-alive"
+        assert response.read() == b"1"
+        sock = conn.sock
+        conn.request("POST", "/invocations", body=b"2")
+        assert conn.getresponse().read() == b"2"
+        assert conn.sock is sock
+
+    def test_connection_close_is_honoured(self, start):
+        """Test that Connection: close ends the connection after the response."""
+        server = start(echo)
+        conn = server.connect()
+        conn.request("POST", "/invocations", body=b"1", headers={"Connection": "close"})
+        response = conn.getresponse()
+        assert response.getheader("Connection") == "close"
+        assert response.read() == b"1"
+
+    def test_over_capacity_is_rejected(self, start):
+        """Test that requests beyond the concurrency and queue limits get 503."""
+        entered, release = threading.Event(), threading.Event()
+
+        def slow(event, context):
+            entered.set()
+            release.wait(5)
+            return {"statusCode": 200, "body": "slow"}
+
+        server = start(slow, max_concurrency=1, max_pending=0)
+        first = server.connect()
+        first.request("POST", "/invocations", body=b"{}")
+        assert entered.wait(5)
+        second = server.connect()
+        second.request("POST", "/invocations", body=b"{}")
+        rejected = second.getresponse()
+        release.set()
+
+        assert rejected.status == 503
+        assert rejected.getheader("Retry-After") == "1"
+        assert first.getresponse().read() == b"slow"
+
+    def test_drain_finishes_in_flight_requests(self, start):
+        """Test that draining lets running requests finish and then closes."""
+        entered, release = threading.Event(), threading.Event()
+
+        def slow(event, context):
+            entered.set()
+            release.wait(5)
+            return {"statusCode": 200, "body": "done"}
+
+        server = start(slow)
+        busy = server.connect()
+        busy.request("POST", "/invocations", body=b"{}")
+        assert entered.wait(5)
+
+        drained = asyncio.run_coroutine_threadsafe(server.gateway.drain(), server.loop)
+        deadline = time.monotonic() + 5
+        while not server.gateway.draining and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # The listeners are closed, so readiness probes fail and no new work arrives
+        with pytest.raises(ConnectionRefusedError):
+            server.connect(server.metrics_port).request("GET", "/readyz")
+
+        release.set()
+        response = busy.getresponse()
+        assert response.read() == b"done"
+        assert response.getheader("Connection") == "close"
+        drained.result(10)
+
+
+class TestMetrics:
+    """Test suite for the Prometheus /metrics endpoint."""
+
+    def test_exposition(self, start):
+        """Test that requests, latency, in-flight and endpoint errors are exported."""
+        def handler(event, context):
+            return {"statusCode": 504 if event.get("body") == "slow" else 200, "body": "x"}
+
+        server = start(handler)
+        conn = server.connect()
+        for body in (b"fast", b"fast", b"slow"):
+            conn.request("POST", "/invocations", body=body)
+            conn.getresponse().read()
+
+        metrics = server.connect(server.metrics_port)
+        metrics.request("GET", "/metrics")
+        response = metrics.getresponse()
+        text = response.read().decode()
+        assert response.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+        assert 'gateway_requests_total{method="POST",route="/invocations",status="200"} 2' in text
+        assert 'gateway_requests_total{method="POST",route="/invocations",status="504"} 1' in text
+        assert 'gateway_request_duration_seconds_bucket{route="/invocations",le="+Inf"} 3' in text
+        assert 'gateway_request_duration_seconds_count{route="/invocations"} 3' in text
+        assert "gateway_requests_in_flight 0" in text
+        assert 'gateway_endpoint_errors_total{status="504"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that every bucket at or above a sample counts it."""
+        metrics = gateway.Metrics(buckets=(0.1, 1.0))
+        metrics.observe("POST", "/invocations", 200, 0.5)
+        metrics.observe("POST", "/invocations", 200, 0.05)
+        assert metrics.latency["/invocations"][0] == [1, 2]
+
+
+class TestHandlerIntegration:
+    """Test suite for the gateway in front of the real handler."""
+
+    def test_default_handler(self, start, mock_client):
+        """Test that the gateway serves lambda_handler by default."""
+        server = start(None)
+        conn = server.connect()
+        conn.request("POST", "/invocations", body=b'{"x": 1}', headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read()) == {"result": "success"}
+        assert mock_client.invoke_endpoint.call_args.kwargs["Body"] == '{"x": 1}'
+
+    def test_base64_helpers(self):
+        """Test that handler responses are turned into HTTP results."""
+        body = base64.b64encode(b"\x00\x01").decode()
+        assert gateway.http_result({"statusCode": 200, "body": body, "isBase64Encoded": True})[2] == b"\x00\x01"
+        status, headers, _ = gateway.http_result({"statusCode": 503, "body": "shed"})
+        assert status == 503 and headers["Content-Type"].startswith("text/plain")
+
+
+class TestDeployment:
+    """Test suite for the image the Kubernetes deployment runs."""
+
+    def test_deployment_runs_the_gateway_image(self):
+        """Test that the deployment uses the image built from Dockerfile.gateway."""
+        with open(os.path.join(ROOT, "lambda_function", "Dockerfile.gateway")) as f:
+            dockerfile = f.read()
+        with open(os.path.join(ROOT, ".github", "workflows", "gateway-image.yml")) as f:
+            workflow = f.read()
+        with open(os.path.join(ROOT, "k8s", "deployment.yaml")) as f:
+            deployment = f.read()
+        assert 'CMD ["python", "gateway.py"' in dockerfile
+        assert "file: lambda_function/Dockerfile.gateway" in workflow
+        assert "warp-gateway:latest" in workflow
+        assert "image: ghcr.io/christophergaughan/warp-gateway:latest" in deployment
@@ -0,0 +1,160 @@
+"""Unit tests for hedged SageMaker requests."""
+
+import threading
+import time
+
+import pytest
+
+import hedging
+import lambda_function
+import routing
+
+
+def _warm(hedger, seconds=0.01, n=hedging.MIN_SAMPLES):
+    for _ in range(n):
+        hedger.window.add(seconds)
+
+
+@pytest.fixture
+def targets():
+    return [routing.Target("slow"), routing.Target("fast")]
+
+
+@pytest.fixture
+def router(targets):
+    router = routing.Router(targets, explore_rate=0.0)
+    # Make "slow" the preferred primary
+    router.observe(targets[0], 0.001, ok=True)
+    router.observe(targets[1], 0.002, ok=True)
+    return router
+
+
+class TestLatencyWindow:
+    """Test suite for recent latency percentiles."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles over the window."""
+        window = hedging.LatencyWindow()
+        for i in range(1, 101):
+            window.add(i / 1000.0)
+        assert window.percentile(50) == pytest.approx(0.050)
+        assert window.percentile(95) == pytest.approx(0.095)
+
+    def test_window_is_bounded(self):
+        """Test that old samples fall out of the window."""
+        window = hedging.LatencyWindow(size=3)
+        for value in (10.0, 1.0, 1.0, 1.0):
+            window.add(value)
+        assert window.percentile(100) == 1.0
+
+
+class TestHedgeBudget:
+    """Test suite for the hedge credit budget."""
+
+    def test_budget_caps_hedge_fraction(self):
+        """Test that hedges are limited to the configured fraction of requests."""
+        budget = hedging.HedgeBudget(max_fraction=0.1)
+        hedges = 0
+        for _ in range(100):
+            budget.on_request()
+            hedges += budget.try_spend()
+        assert hedges == 10
+
+
+class TestHedger:
+    """Test suite for hedged calls."""
+
+    def test_no_hedge_while_warming_up(self, router):
+        """Test that hedging waits for enough latency samples."""
+        hedger = hedging.Hedger(router, budget=hedging.HedgeBudget(1.0))
+        calls = []
+        assert hedger.call(lambda t, p: calls.append(t.endpoint_name) or "ok", "{}") == "ok"
+        assert calls == ["slow"]
+
+    def test_slow_primary_is_hedged_and_backup_wins(self, router):
+        """Test that a slow primary triggers a backup whose response is returned."""
+        hedger = hedging.Hedger(router, percentile=50, budget=hedging.HedgeBudget(1.0))
+        _warm(hedger)
+        release = threading.Event()
+        calls = []
+
+        def invoke(target, payload):
+            calls.append(target.endpoint_name)
+            if target.endpoint_name == "slow":
+                release.wait(2)
+                return "slow-result"
+            return "fast-result"
+
+        try:
+            assert hedger.call(invoke, "{}") == "fast-result"
+        finally:
+            release.set()
+        assert calls == ["slow", "fast"]
+
+    def test_fast_primary_is_not_hedged(self, router):
+        """Test that no duplicate is sent when the primary beats the delay."""
+        hedger = hedging.Hedger(router, percentile=50, budget=hedging.HedgeBudget(1.0))
+        _warm(hedger, seconds=1.0)
+        calls = []
+        hedger.call(lambda t, p: calls.append(t) or "ok", "{}")
+        assert len(calls) == 1
+
+    def test_exhausted_budget_waits_for_primary(self, router):
+        """Test that without budget the slow primary's result is used."""
+        hedger = hedging.Hedger(router, percentile=50, budget=hedging.HedgeBudget(0.0))
+        _warm(hedger, seconds=0.001)
+
+        def invoke(target, payload):
+            time.sleep(0.02)
+            return target.endpoint_name
+
+        assert hedger.call(invoke, "{}") == "slow"
+
+    def test_failed_primary_falls_back_to_backup(self, router):
+        """Test that a failing request does not win over a successful one."""
+        hedger = hedging.Hedger(router, percentile=50, budget=hedging.HedgeBudget(1.0))
+        _warm(hedger, seconds=0.001)
+
+        def invoke(target, payload):
+            if target.endpoint_name == "slow":
+                time.sleep(0.02)
+                raise RuntimeError("instance crashed")
+            time.sleep(0.05)
+            return "backup"
+
+        assert hedger.call(invoke, "{}") == "backup"
+
+    def test_both_failing_raises(self, router):
+        """Test that the error is raised when every attempt fails."""
+        hedger = hedging.Hedger(router, percentile=50, budget=hedging.HedgeBudget(1.0))
+        _warm(hedger, seconds=0.001)
+
+        def invoke(target, payload):
+            time.sleep(0.01)
+            raise RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            hedger.call(invoke, "{}")
+
+    def test_request_errors_do_not_count_against_target(self, router, targets):
+        """Test that an error caused by the request leaves the target's health alone."""
+        hedger = hedging.Hedger(router)
+
+        def invoke(target, payload):
+            raise ValueError("bad payload")
+
+        with pytest.raises(ValueError):
+            hedger.call(invoke, "{}")
+        assert targets[0].consecutive_failures == 0
+        assert targets[0].error_ewma == 0.0
+
+
+class TestHandlerHedging:
+    """Test suite for the handler's hedging mode."""
+
+    def test_hedging_without_routes_uses_env_endpoint(self, mock_client, monkeypatch):
+        """Test that hedging works against the single configured endpoint."""
+        monkeypatch.setenv("SAGEMAKER_HEDGING_ENABLED", "true")
+        response = lambda_function.lambda_handler({"body": "{}"}, None)
+        assert response["statusCode"] == 200
+        assert mock_client.invoke_endpoint.call_args.kwargs["EndpointName"] == "mock-endpoint"
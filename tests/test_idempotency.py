@@ -0,0 +1,308 @@
+"""Unit tests for idempotent handling of duplicate deliveries."""
+
+import json
+import re
+import threading
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+import idempotency
+import lambda_function
+from tests.conftest import FakeRawResponse
+
+
+class FakeDynamoDB:
+    """In-memory DynamoDB table answering a real botocore client.
+
+    Evaluates the ``attribute_not_exists(...) OR ... <= ...`` conditions the
+    store writes, which is enough to exercise its conditional claims.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.calls = []
+        # {"conditional" or "unconditional": (error code, message)} for failing PutItem calls
+        self.put_errors = {}
+
+    def _reply(self, request, status=200, body=None):
+        return AWSResponse(request.url, status, {}, FakeRawResponse(json.dumps(body or {}).encode()))
+
+    def _passes(self, params, current):
+        names = params.get("ExpressionAttributeNames", {})
+        values = params.get("ExpressionAttributeValues", {})
+        for clause in params["ConditionExpression"].strip("()").split(" OR "):
+            missing = re.fullmatch(r"attribute_not_exists\((#\w+)\)", clause)
+            if missing and (current is None or names[missing.group(1)] not in current):
+                return True
+            compare = re.fullmatch(r"(#\w+) <= (:\w+)", clause)
+            if compare and current is not None:
+                if float(current[names[compare.group(1)]]["N"]) <= float(values[compare.group(2)]["N"]):
+                    return True
+        return False
+
+    def __call__(self, request):
+        operation = request.headers["X-Amz-Target"].decode().split(".")[1]
+        params = json.loads(request.body)
+        self.calls.append((operation, params))
+        if operation == "PutItem":
+            kind = "conditional" if "ConditionExpression" in params else "unconditional"
+            if kind in self.put_errors:
+                code, message = self.put_errors[kind]
+                return self._reply(request, 400, {"__type": f"com.amazonaws.dynamodb.v20120810#{code}", "message": message})
+            key = params["Item"]["idempotency_key"]["S"]
+            current = self.items.get(key)
+            if "ConditionExpression" in params and not self._passes(params, current):
+                body = {
+                    "__type": "com.amazonaws.dynamodb.v20120810#ConditionalCheckFailedException",
+                    "message": "The conditional request failed",
+                }
+                if params.get("ReturnValuesOnConditionCheckFailure") == "ALL_OLD":
+                    body["Item"] = current
+                return self._reply(request, 400, body)
+            self.items[key] = params["Item"]
+            return self._reply(request)
+        if operation == "DeleteItem":
+            self.items.pop(params["Key"]["idempotency_key"]["S"], None)
+            return self._reply(request)
+        raise AssertionError(f"Unexpected operation {operation}")
+
+
+@pytest.fixture
+def dynamodb(make_client):
+    table = FakeDynamoDB()
+    client = make_client("dynamodb", respond=table)
+    client.table = table
+    return client
+
+
+class TestKeys:
+    """Test suite for deriving idempotency keys."""
+
+    def test_event_field(self, monkeypatch):
+        """Test that the key field is used and scoped by endpoint."""
+        monkeypatch.delenv("IDEMPOTENCY_KEY_FIELD", raising=False)
+        assert idempotency.event_key({"idempotencyKey": "abc"}, "ep", "{}") == "ep#abc"
+
+    def test_header(self):
+        """Test that an Idempotency-Key header is used when the field is absent."""
+        event = {"headers": {"idempotency-key": "h-1"}}
+        assert idempotency.event_key(event, "ep", "{}") == "ep#h-1"
+
+    def test_custom_field(self, monkeypatch):
+        """Test that IDEMPOTENCY_KEY_FIELD picks another field, e.g. the EventBridge id."""
+        monkeypatch.setenv("IDEMPOTENCY_KEY_FIELD", "id")
+        assert idempotency.event_key({"id": "evt-1"}, "ep", "{}") == "ep#evt-1"
+
+    def test_no_key_without_hashing(self, monkeypatch):
+        """Test that keyless events are not deduplicated by default."""
+        monkeypatch.delenv("IDEMPOTENCY_HASH_PAYLOAD", raising=False)
+        assert idempotency.event_key({"body": "{}"}, "ep", "{}") is None
+
+    def test_payload_hash(self, monkeypatch):
+        """Test that payload hashing gives equal keys for equal payloads only."""
+        monkeypatch.setenv("IDEMPOTENCY_HASH_PAYLOAD", "true")
+        first = idempotency.event_key({}, "ep", '{"x": 1}')
+        assert first == idempotency.event_key({}, "ep", '{"x": 1}')
+        assert first != idempotency.event_key({}, "ep", '{"x": 2}')
+        assert first != idempotency.event_key({}, "other", '{"x": 1}')
+
+    def test_payload_key_from_message_body(self, monkeypatch):
+        """Test that SQS message bodies carry their key in the JSON body."""
+        monkeypatch.delenv("IDEMPOTENCY_HASH_PAYLOAD", raising=False)
+        assert idempotency.payload_key('{"idempotencyKey": "m-1", "x": 1}', "ep") == "ep#m-1"
+        assert idempotency.payload_key(b"not json", "ep") is None
+
+
+class TestIdempotency:
+    """Test suite for running each key once."""
+
+    def test_duplicate_returns_stored_result(self):
+        """Test that the second call returns the first result without running."""
+        guard = idempotency.Idempotency(idempotency.InMemoryStore())
+        calls = []
+
+        def work(payload):
+            calls.append(payload)
+            return b"result"
+
+        assert guard.call("k", work, "p") == b"result"
+        assert guard.call("k", work, "p") == b"result"
+        assert calls == ["p"]
+
+    def test_failures_release_the_key(self):
+        """Test that an exception lets the next delivery run again."""
+        guard = idempotency.Idempotency(idempotency.InMemoryStore())
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            guard.call("k", fail)
+        assert guard.call("k", lambda: "ok") == "ok"
+
+    def test_server_errors_are_not_stored(self):
+        """Test that 5xx handler responses are retried, 4xx ones are stored."""
+        guard = idempotency.Idempotency(idempotency.InMemoryStore())
+        assert guard.handle("a", lambda: {"statusCode": 504})["statusCode"] == 504
+        assert guard.handle("a", lambda: {"statusCode": 200})["statusCode"] == 200
+        assert guard.handle("b", lambda: {"statusCode": 413})["statusCode"] == 413
+        assert guard.handle("b", lambda: {"statusCode": 200})["statusCode"] == 413
+
+    def test_concurrent_duplicate_is_rejected(self):
+        """Test that a duplicate of a running request gets 409."""
+        guard = idempotency.Idempotency(idempotency.InMemoryStore())
+        started, release = threading.Event(), threading.Event()
+        results = []
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return {"statusCode": 200, "body": "first"}
+
+        worker = threading.Thread(target=lambda: results.append(guard.handle("k", slow)))
+        worker.start()
+        started.wait(5)
+        duplicate = guard.handle("k", lambda: {"statusCode": 200, "body": "second"})
+        release.set()
+        worker.join()
+
+        assert duplicate["statusCode"] == 409
+        assert results == [{"statusCode": 200, "body": "first"}]
+
+    def test_records_expire(self, fake_clock):
+        """Test that completed and stale in-progress records expire."""
+        store = idempotency.InMemoryStore(clock=fake_clock)
+        guard = idempotency.Idempotency(store, ttl_seconds=60, in_progress_seconds=10)
+        assert store.acquire("stale", 10) is None
+        fake_clock.now += 11
+        assert guard.call("stale", lambda: "ran") == "ran"
+        fake_clock.now += 61
+        assert guard.call("stale", lambda: "again") == "again"
+
+
+class TestStoreErrors:
+    """Test suite for requests surviving a failing record store."""
+
+    def test_result_is_returned_when_it_cannot_be_stored(self, dynamodb, fake_clock):
+        """Test that a failed complete returns the result and frees the key."""
+        dynamodb.table.put_errors["unconditional"] = (
+            "ValidationException", "Item size has exceeded the maximum allowed size",
+        )
+        guard = idempotency.Idempotency(idempotency.DynamoDBStore("idem", client=dynamodb, clock=fake_clock))
+        calls = []
+
+        def work():
+            calls.append(1)
+            return {"statusCode": 200, "body": "large"}
+
+        assert guard.handle("k", work) == {"statusCode": 200, "body": "large"}
+        assert dynamodb.table.items == {}
+        # A redelivery runs again instead of getting 409 until the claim expires
+        assert guard.handle("k", work)["statusCode"] == 200
+        assert len(calls) == 2
+
+    def test_request_runs_when_key_cannot_be_claimed(self, dynamodb, fake_clock):
+        """Test that a failed acquire runs the request without idempotency."""
+        dynamodb.table.put_errors["conditional"] = ("ResourceNotFoundException", "Requested resource not found")
+        guard = idempotency.Idempotency(idempotency.DynamoDBStore("idem", client=dynamodb, clock=fake_clock))
+        assert guard.handle("k", lambda: {"statusCode": 200, "body": "ok"}) == {"statusCode": 200, "body": "ok"}
+        assert [operation for operation, _ in dynamodb.table.calls] == ["PutItem"]
+
+    def test_handler_survives_store_errors(self, mock_client, monkeypatch):
+        """Test that lambda_handler returns the inference result when the store fails."""
+        class BrokenStore(idempotency.InMemoryStore):
+            def complete(self, key, result, ttl_seconds):
+                raise RuntimeError("throttled")
+
+        monkeypatch.setenv("IDEMPOTENCY_ENABLED", "true")
+        monkeypatch.setattr(idempotency, "_idempotency", idempotency.Idempotency(BrokenStore()))
+        event = {"idempotencyKey": "order-1", "body": '{"x": 1}'}
+        assert lambda_function.lambda_handler(event, None)["statusCode"] == 200
+        assert lambda_function.lambda_handler(event, None)["statusCode"] == 200
+        assert mock_client.invoke_endpoint.call_count == 2
+
+
+class TestDynamoDBStore:
+    """Test suite for the DynamoDB-backed store."""
+
+    def test_conditional_claim(self, dynamodb, fake_clock):
+        """Test that a live record blocks the claim and is returned."""
+        store = idempotency.DynamoDBStore("idem", client=dynamodb, clock=fake_clock)
+
+        assert store.acquire("k", 900) is None
+        operation, params = dynamodb.table.calls[0]
+        assert operation == "PutItem"
+        assert "attribute_not_exists" in params["ConditionExpression"]
+        assert store.acquire("k", 900) == {"status": "IN_PROGRESS", "expires_at": 1900}
+
+        fake_clock.now += 901
+        assert store.acquire("k", 900) is None
+
+    def test_completed_results_round_trip(self, dynamodb, fake_clock):
+        """Test that byte and response results come back unchanged."""
+        store = idempotency.DynamoDBStore("idem", client=dynamodb, clock=fake_clock)
+        store.complete("bytes", b"\x00\x01", 60)
+        store.complete("response", {"statusCode": 200, "body": "ok"}, 60)
+
+        assert store.acquire("bytes", 900)["result"] == b"\x00\x01"
+        record = store.acquire("response", 900)
+        assert record["status"] == "COMPLETED"
+        assert record["result"] == {"statusCode": 200, "body": "ok"}
+        assert isinstance(record["result"]["statusCode"], int)
+
+    def test_release_deletes(self, dynamodb, fake_clock):
+        """Test that releasing a key removes its record."""
+        store = idempotency.DynamoDBStore("idem", client=dynamodb, clock=fake_clock)
+        store.acquire("k", 900)
+        store.release("k")
+        assert dynamodb.table.items == {}
+
+
+class TestHandlerIntegration:
+    """Test suite for idempotency in the Lambda handler."""
+
+    @pytest.fixture
+    def enabled(self, mock_client, monkeypatch):
+        monkeypatch.setenv("IDEMPOTENCY_ENABLED", "true")
+        monkeypatch.delenv("IDEMPOTENCY_TABLE", raising=False)
+        monkeypatch.delenv("IDEMPOTENCY_HASH_PAYLOAD", raising=False)
+        return mock_client
+
+    def test_duplicate_event_skips_endpoint(self, enabled):
+        """Test that a redelivered event returns the stored response."""
+        event = {"idempotencyKey": "order-1", "body": '{"x": 1}'}
+        first = lambda_function.lambda_handler(event, None)
+        second = lambda_function.lambda_handler(event, None)
+
+        assert first == second
+        assert first["statusCode"] == 200
+        assert enabled.invoke_endpoint.call_count == 1
+
+    def test_keyless_events_always_run(self, enabled):
+        """Test that events without a key are invoked every time."""
+        lambda_function.lambda_handler({"body": '{"x": 1}'}, None)
+        lambda_function.lambda_handler({"body": '{"x": 1}'}, None)
+        assert enabled.invoke_endpoint.call_count == 2
+
+    def test_sqs_messages_deduplicated(self, enabled, monkeypatch):
+        """Test that duplicate SQS messages in a batch reach the endpoint once."""
+        body = json.dumps({"idempotencyKey": "m-1", "x": 1})
+        event = {"Records": [
+            {"eventSource": "aws:sqs", "messageId": "a", "body": body, "eventSourceARN": "arn:q"},
+            {"eventSource": "aws:sqs", "messageId": "b", "body": body, "eventSourceARN": "arn:q"},
+        ]}
+        # Sequential so the second message sees a completed record
+        monkeypatch.setenv("SAGEMAKER_BATCH_MAX_WORKERS", "1")
+        response = lambda_function.lambda_handler(event, None)
+
+        assert response == {"batchItemFailures": []}
+        assert enabled.invoke_endpoint.call_count == 1
+
+    def test_disabled_by_default(self, mock_client, monkeypatch):
+        """Test that duplicates run again unless idempotency is enabled."""
+        monkeypatch.delenv("IDEMPOTENCY_ENABLED", raising=False)
+        event = {"idempotencyKey": "order-1", "body": '{"x": 1}'}
+        lambda_function.lambda_handler(event, None)
+        lambda_function.lambda_handler(event, None)
+        assert mock_client.invoke_endpoint.call_count == 2
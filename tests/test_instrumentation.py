@@ -0,0 +1,117 @@
+"""Unit tests for per-phase latency instrumentation and EMF output."""
+
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+import instrumentation
+import lambda_function
+from tests.conftest import FakeRawResponse
+
+PHASES = {"SerializeLatency", "SignLatency", "NetworkLatency", "ParseLatency"}
+
+
+def _ok(request):
+    return AWSResponse(request.url, 200, {"Content-Type": "application/json"}, FakeRawResponse(b'{"y": 1}'))
+
+
+@pytest.fixture(autouse=True)
+def no_active_invocation():
+    """Make sure no invocation leaks between tests."""
+    yield
+    instrumentation._active = None
+
+
+class TestPhaseTiming:
+    """Test suite for botocore event-based phase timing."""
+
+    def test_all_phases_recorded_for_a_call(self, make_client):
+        """Test that one call records each phase and an endpoint call count."""
+        client = instrumentation.instrument_client(make_client("sagemaker-runtime", _ok))
+        metrics = instrumentation.start_invocation()
+        client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        assert PHASES <= set(metrics.latencies)
+        assert all(value >= 0 for value in metrics.latencies.values())
+        assert metrics.counts["EndpointCalls"] == 1
+        assert metrics.counts["EndpointRetries"] == 0
+
+    def test_retries_are_counted(self, make_client):
+        """Test that retried attempts are counted and network time summed."""
+        attempts = []
+
+        def flaky(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                return AWSResponse(request.url, 503, {}, FakeRawResponse(b""))
+            return _ok(request)
+
+        client = instrumentation.instrument_client(make_client("sagemaker-runtime", flaky))
+        metrics = instrumentation.start_invocation()
+        with patch("botocore.endpoint.time.sleep"):
+            client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        assert len(attempts) == 2
+        assert metrics.counts["EndpointRetries"] == 1
+
+    def test_instrument_client_is_idempotent(self, make_client):
+        """Test that instrumenting twice does not double count."""
+        client = make_client("sagemaker-runtime", _ok)
+        instrumentation.instrument_client(client)
+        instrumentation.instrument_client(client)
+        metrics = instrumentation.start_invocation()
+        client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        assert metrics.counts["EndpointCalls"] == 1
+
+    def test_record_is_noop_without_invocation(self):
+        """Test that recording outside an invocation does nothing."""
+        instrumentation.record("BodyReadLatency", 1.0)
+        assert instrumentation.finish_invocation() is None
+
+
+class TestEmf:
+    """Test suite for the Embedded Metric Format document."""
+
+    def test_document_declares_every_metric(self):
+        """Test that each value has a matching metric definition and dimension."""
+        metrics = instrumentation.InvocationMetrics(namespace="Test")
+        metrics.add_latency("NetworkLatency", 0.012)
+        metrics.add_count("EndpointCalls")
+        doc = metrics.to_emf({"EndpointName": "ep"}, timestamp=1700000000)
+        directive = doc["_aws"]["CloudWatchMetrics"][0]
+        assert doc["_aws"]["Timestamp"] == 1700000000000
+        assert directive["Namespace"] == "Test"
+        assert directive["Dimensions"] == [["EndpointName"]]
+        names = {m["Name"] for m in directive["Metrics"]}
+        assert names == {"NetworkLatency", "EndToEndLatency", "EndpointCalls"}
+        assert doc["NetworkLatency"] == 12.0
+        assert doc["EndpointName"] == "ep"
+
+    def test_finish_writes_one_json_line(self):
+        """Test that finishing an invocation writes a single EMF line."""
+        instrumentation.start_invocation()
+        out = io.StringIO()
+        instrumentation.finish_invocation({"EndpointName": "ep"}, stream=out)
+        lines = out.getvalue().splitlines()
+        assert len(lines) == 1
+        assert "_aws" in json.loads(lines[0])
+
+
+class TestHandlerMetrics:
+    """Test suite for handler-level metrics."""
+
+    def test_disabled_by_default(self, mock_client, capsys):
+        """Test that no EMF is printed unless enabled."""
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        assert "_aws" not in capsys.readouterr().out
+
+    def test_enabled_handler_emits_emf(self, mock_client, monkeypatch, capsys):
+        """Test that an enabled invocation prints handler phases and status."""
+        monkeypatch.setenv("INFERENCE_METRICS_ENABLED", "true")
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        doc = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+        for name in ("ClientInitLatency", "BodyReadLatency", "EndToEndLatency"):
+            assert name in doc
+        assert doc["InvocationErrors"] == 0
+        assert doc["EndpointName"] == "mock-endpoint"
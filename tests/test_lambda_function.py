@@ -0,0 +1,66 @@
+"""Unit tests for the SageMaker invocation Lambda handler."""
+
+import json
+
+import clients
+import lambda_function
+
+
+class TestClientRegistry:
+    """Test suite for the warm-container client registry."""
+
+    def test_same_key_returns_cached_client(self, mock_client):
+        """Test that repeated lookups reuse the first client."""
+        first = clients.get_client("sagemaker-runtime")
+        second = clients.get_client("sagemaker-runtime")
+        assert first is second
+        assert mock_client.factory.call_count == 1
+
+    def test_region_and_endpoint_are_part_of_key(self, mock_client):
+        """Test that a different region or endpoint URL builds a new client."""
+        clients.get_client("sagemaker-runtime")
+        clients.get_client("sagemaker-runtime", region_name="eu-west-1")
+        clients.get_client("sagemaker-runtime", endpoint_url="http://localhost:8080")
+        assert mock_client.factory.call_count == 3
+
+    def test_default_region_comes_from_lambda_env(self, mock_client):
+        """Test that the Lambda AWS_REGION variable is used when no region is given."""
+        clients.get_client("sagemaker-runtime")
+        assert mock_client.factory.call_args.kwargs["region_name"] == "us-east-2"
+
+    def test_reset_clients_forces_rebuild(self, mock_client):
+        """Test that reset_clients drops cached clients."""
+        clients.get_client("sagemaker-runtime")
+        clients.reset_clients()
+        clients.get_client("sagemaker-runtime")
+        assert mock_client.factory.call_count == 2
+
+
+class TestLambdaHandler:
+    """Test suite for lambda_handler."""
+
+    def test_successful_invoke(self, mock_client):
+        """Test that the endpoint response body is returned with a 200 status."""
+        event = {"body": json.dumps({"key": "value"})}
+        response = lambda_function.lambda_handler(event, None)
+        assert response["statusCode"] == 200
+        assert "success" in response["body"]
+        mock_client.invoke_endpoint.assert_called_once_with(
+            EndpointName="mock-endpoint",
+            ContentType="application/json",
+            Body=event["body"],
+        )
+
+    def test_warm_invocations_reuse_client(self, mock_client):
+        """Test that the client is constructed once across warm invocations."""
+        for _ in range(3):
+            lambda_function.lambda_handler({"body": "{}"}, None)
+        assert mock_client.factory.call_count == 1
+        assert mock_client.invoke_endpoint.call_count == 3
+
+    def test_endpoint_error_returns_500(self, mock_client):
+        """Test that endpoint failures are reported as a 500 response."""
+        mock_client.invoke_endpoint.side_effect = RuntimeError("boom")
+        response = lambda_function.lambda_handler({"body": "{}"}, None)
+        assert response["statusCode"] == 500
+        assert "boom" in response["body"]
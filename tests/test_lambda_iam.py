@@ -0,0 +1,110 @@
+"""Unit tests for the Lambda role's permissions in the root Terraform module."""
+
+import os
+import re
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+@pytest.fixture
+def main_tf():
+    with open(os.path.join(ROOT_DIR, "main.tf")) as f:
+        return f.read()
+
+
+@pytest.fixture
+def variables_tf():
+    with open(os.path.join(ROOT_DIR, "variables.tf")) as f:
+        return f.read()
+
+
+def _policy(content):
+    """Return the body of the Lambda policy document."""
+    match = re.search(
+        r'data\s+"aws_iam_policy_document"\s+"lambda_basic"\s*\{(.*?)\n\}', content, re.DOTALL
+    )
+    assert match is not None, "aws_iam_policy_document.lambda_basic not found"
+    return match.group(1)
+
+
+def _dynamic_statements(policy):
+    """Map each dynamic statement's variable to its actions and resources."""
+    statements = {}
+    for block in re.split(r'\n\s*dynamic\s+"statement"\s*\{', policy)[1:]:
+        variable = re.search(r'for_each\s*=\s*var\.(\w+)\s*==\s*null\s*\?\s*\[\]', block).group(1)
+        actions = re.findall(r'"((?:s3|sagemaker|dynamodb):\w+)"', block)
+        resource = re.search(r'resources\s*=\s*\["([^"]+)"\]', block).group(1)
+        statements.setdefault(variable, []).append((set(actions), resource))
+    return statements
+
+
+class TestLambdaPolicy:
+    """Test suite for the permissions granted to the Lambda role."""
+
+    def test_base_policy_unchanged(self, main_tf):
+        """Test that logging and synchronous invokes are always granted."""
+        policy = _policy(main_tf)
+        assert '"logs:PutLogEvents"' in policy
+        assert '"sagemaker:InvokeEndpoint"' in policy
+        assert 'endpoint/my-sagemaker-*' in policy
+
+    def test_async_permissions(self, main_tf):
+        """Test that async mode can invoke, stage inputs and read outputs under their prefixes only."""
+        statements = _dynamic_statements(_policy(main_tf))
+        assert statements["async_endpoint_name"] == [
+            ({"sagemaker:InvokeEndpointAsync"}, "arn:aws:sagemaker:*:*:endpoint/${statement.value}")
+        ]
+        assert statements["async_bucket"] == [
+            ({"s3:PutObject"}, "arn:aws:s3:::${statement.value}/${var.async_input_prefix}*"),
+            ({"s3:GetObject"}, "arn:aws:s3:::${statement.value}/${var.async_output_prefix}*"),
+        ]
+
+    def test_batch_permissions(self, main_tf):
+        """Test that S3 batch reads any input but writes only under the output prefix."""
+        statements = _dynamic_statements(_policy(main_tf))
+        assert statements["batch_bucket"] == [
+            ({"s3:GetObject"}, "arn:aws:s3:::${statement.value}/*"),
+            ({"s3:PutObject", "s3:AbortMultipartUpload"}, "arn:aws:s3:::${statement.value}/${var.batch_output_prefix}*"),
+        ]
+
+    def test_dynamodb_permissions(self, main_tf):
+        """Test that each table gets only the item calls its store makes."""
+        statements = _dynamic_statements(_policy(main_tf))
+        table = "arn:aws:dynamodb:*:*:table/${statement.value}"
+        assert statements["inference_cache_table"] == [({"dynamodb:GetItem", "dynamodb:PutItem"}, table)]
+        assert statements["idempotency_table"] == [
+            ({"dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:DeleteItem"}, table)
+        ]
+
+    def test_features_default_off(self, variables_tf):
+        """Test that every feature variable defaults to null, granting nothing extra."""
+        for name in ("async_endpoint_name", "async_bucket", "batch_bucket", "inference_cache_table", "idempotency_table"):
+            block = re.search(rf'variable\s+"{name}"\s*\{{(.*?)\n\}}', variables_tf, re.DOTALL)
+            assert block is not None, f"variable {name} not found"
+            assert re.search(r'default\s*=\s*null', block.group(1))
+
+
+class TestLambdaEnvironment:
+    """Test suite for the feature settings passed to the Lambda."""
+
+    def test_settings_follow_variables(self, main_tf):
+        """Test that each configured feature sets the environment variables the handler reads."""
+        module = re.search(r'module\s+"lambda"\s*\{(.*?)\n\}', main_tf, re.DOTALL).group(1)
+        for setting, variable in (
+            ("SAGEMAKER_ASYNC_ENDPOINT_NAME", "async_endpoint_name"),
+            ("SAGEMAKER_ASYNC_INPUT_BUCKET", "async_bucket"),
+            ("INFERENCE_CACHE_TABLE", "inference_cache_table"),
+            ("IDEMPOTENCY_TABLE", "idempotency_table"),
+        ):
+            assert re.search(rf'{setting}\s*=\s*var\.{variable}\n', module)
+        assert re.search(r'INFERENCE_CACHE_ENABLED\s*=\s*var\.inference_cache_table == null \? null : "true"', module)
+        assert re.search(r'IDEMPOTENCY_ENABLED\s*=\s*var\.idempotency_table == null \? null : "true"', module)
+        assert "if value != null" in module
+
+    def test_module_merges_environment(self):
+        """Test that the lambda module adds the extra variables to its defaults."""
+        with open(os.path.join(ROOT_DIR, "modules", "lambda", "main.tf")) as f:
+            content = f.read()
+        assert re.search(r'variables\s*=\s*merge\(\{.*?\},\s*var\.environment_variables\)', content, re.DOTALL)
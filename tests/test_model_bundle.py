@@ -0,0 +1,110 @@
+"""Unit tests for the trimmed botocore model bundle."""
+
+import os
+
+import botocore.session
+import pytest
+from botocore.loaders import Loader
+
+import endpoint_rules
+import model_bundle
+
+
+@pytest.fixture(scope="module")
+def bundle_dir(tmp_path_factory):
+    """Build a bundle for the handler's services once per module."""
+    path = str(tmp_path_factory.mktemp("bundle") / "model_bundle")
+    model_bundle.build_bundle(path)
+    return path
+
+
+class TestBuildBundle:
+    """Test suite for the bundle build step."""
+
+    def test_only_requested_services_are_bundled(self, bundle_dir):
+        """Test that the bundle contains just the configured services."""
+        services = sorted(d for d in os.listdir(bundle_dir) if os.path.isdir(os.path.join(bundle_dir, d)))
+        assert services == list(model_bundle.handler_services())
+
+    def test_endpoint_rulesets_are_compiled(self, bundle_dir):
+        """Test that every bundled endpoint ruleset has its compiled code next to it."""
+        source = Loader(include_default_search_paths=False, extra_search_paths=[Loader.BUILTIN_DATA_PATH])
+        for service in model_bundle.handler_services():
+            api_version = source.determine_latest_version(service, "service-2")
+            path = os.path.join(bundle_dir, service, api_version, "endpoint-rule-set-1")
+            assert os.path.isfile(endpoint_rules.precompiled_path(path))
+
+    def test_services_come_from_the_handler(self):
+        """Test that every service the handler creates a client for is bundled."""
+        assert model_bundle.handler_services() == ("dynamodb", "s3", "sagemaker-runtime", "sts")
+
+    def test_documentation_is_blanked(self, bundle_dir):
+        """Test that models keep their shapes but lose documentation text."""
+        loader = model_bundle.BundleLoader(bundle_dir, include_default_search_paths=False)
+        model = loader.load_service_model("sagemaker-runtime", "service-2")
+        operation = model["operations"]["InvokeEndpoint"]
+        assert operation["documentation"] == ""
+        assert operation["input"] == {"shape": "InvokeEndpointInput"}
+
+    def test_bundle_matches_source_models_apart_from_docs(self, bundle_dir):
+        """Test that the bundled model is the source model with docs stripped."""
+        bundled = model_bundle.BundleLoader(bundle_dir, include_default_search_paths=False)
+        source = Loader()
+        for type_name in ("service-2", "endpoint-rule-set-1"):
+            expected = model_bundle.strip_docs(source.load_service_model("s3", type_name))
+            assert bundled.load_service_model("s3", type_name) == expected
+
+    def test_package_refuses_output_inside_source(self):
+        """Test that packaging never writes into the Lambda source tree."""
+        source_dir = os.path.dirname(model_bundle.__file__)
+        with pytest.raises(ValueError):
+            model_bundle.package(os.path.join(source_dir, "build"))
+
+
+class TestBundleLoader:
+    """Test suite for creating clients through the bundle."""
+
+    @pytest.fixture
+    def session(self, bundle_dir):
+        session = botocore.session.get_session()
+        model_bundle.install(bundle_dir, session)
+        return session
+
+    def test_bundle_paths_count_as_builtin(self, session, bundle_dir):
+        """Test that endpoints loaded from the bundle are treated as builtin data."""
+        loader = session.get_component("data_loader")
+        _, path = loader.load_data_with_path("endpoints")
+        assert path.startswith(os.path.abspath(bundle_dir))
+        assert loader.is_builtin_path(path)
+
+    @pytest.mark.parametrize("service, expected", [
+        ("sagemaker-runtime", "https://runtime.sagemaker.us-east-2.amazonaws.com"),
+        ("s3", "https://s3.us-east-2.amazonaws.com"),
+    ])
+    def test_client_resolves_same_endpoint(self, session, service, expected):
+        """Test that clients built from the bundle resolve the standard endpoint."""
+        client = session.create_client(
+            service, region_name="us-east-2",
+            aws_access_key_id="AKIDTEST", aws_secret_access_key="secret",
+        )
+        assert client.meta.endpoint_url == expected
+
+    @pytest.mark.parametrize("service", model_bundle.handler_services())
+    def test_handler_services_load_without_botocore_data(self, bundle_dir, service):
+        """Test that each handler service builds a client from the bundle alone, as in a package."""
+        session = botocore.session.get_session()
+        session.register_component(
+            "data_loader", model_bundle.BundleLoader(bundle_dir, include_default_search_paths=False)
+        )
+        client = session.create_client(
+            service, region_name="us-east-2",
+            aws_access_key_id="AKIDTEST", aws_secret_access_key="secret",
+        )
+        assert client.meta.service_model.service_name == service
+
+    def test_find_bundle_requires_built_bundle(self, monkeypatch, tmp_path, bundle_dir):
+        """Test that find_bundle ignores directories without a bundle."""
+        monkeypatch.setenv("BOTOCORE_MODEL_BUNDLE", str(tmp_path))
+        assert model_bundle.find_bundle() is None
+        monkeypatch.setenv("BOTOCORE_MODEL_BUNDLE", bundle_dir)
+        assert model_bundle.find_bundle() == bundle_dir
@@ -0,0 +1,214 @@
+"""Unit tests for the adaptive concurrency limiter and circuit breaker."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+
+import batching
+import lambda_function
+import overload_protection
+from overload_protection import AIMDLimiter, CircuitBreaker, LoadShed, OverloadProtector
+from tests.conftest import FakeRawResponse
+
+
+def _response(request, status, body, headers=None):
+    return AWSResponse(request.url, status, headers or {}, FakeRawResponse(body))
+
+
+def _throttled(request):
+    return _response(
+        request, 400, json.dumps({"message": "Rate exceeded"}).encode(),
+        {"x-amzn-ErrorType": "ThrottlingException"},
+    )
+
+
+def _ok(request):
+    return _response(request, 200, b'{"result": "ok"}')
+
+
+def _retry_context():
+    return MagicMock(request_context={})
+
+
+@pytest.fixture
+def protected_client(make_client):
+    """A real sagemaker-runtime client whose responses come from ``replies``."""
+    replies = []
+    client = make_client(
+        "sagemaker-runtime",
+        respond=lambda request: replies.pop(0)(request),
+        config=Config(retries={"mode": "standard", "total_max_attempts": 3}),
+    )
+    overload_protection.protect_client(client)
+    client.replies = replies
+    with patch("botocore.endpoint.time.sleep"):
+        yield client
+
+
+def _invoke(client):
+    return client.invoke_endpoint(EndpointName="model", Body=b"{}")["Body"].read()
+
+
+class TestAIMDLimiter:
+    """Test suite for the AIMD concurrency limit."""
+
+    def test_throttle_halves_limit(self, fake_clock):
+        """Test that a throttle multiplicatively decreases the limit."""
+        limiter = AIMDLimiter(initial=16, clock=fake_clock)
+        limiter.on_throttle()
+        assert limiter.limit == 8
+
+    def test_burst_of_throttles_decreases_once(self, fake_clock):
+        """Test that throttles inside the cool-down count as one back-off."""
+        limiter = AIMDLimiter(initial=16, clock=fake_clock)
+        for _ in range(5):
+            limiter.on_throttle()
+        assert limiter.limit == 8
+        fake_clock.now += 2.0
+        limiter.on_throttle()
+        assert limiter.limit == 4
+
+    def test_successes_grow_limit_additively(self, fake_clock):
+        """Test that a window of successes raises the limit by about one."""
+        limiter = AIMDLimiter(initial=4, clock=fake_clock)
+        for _ in range(4):
+            limiter.on_success()
+        assert int(limiter.limit) == 4
+        for _ in range(2):
+            limiter.on_success()
+        assert int(limiter.limit) == 5
+
+    def test_limit_is_bounded(self, fake_clock):
+        """Test that the limit stays within its minimum and maximum."""
+        limiter = AIMDLimiter(initial=2, max_limit=2, clock=fake_clock)
+        for _ in range(10):
+            limiter.on_success()
+        assert limiter.limit == 2
+        for _ in range(5):
+            fake_clock.now += 2.0
+            limiter.on_throttle()
+        assert limiter.limit == 1
+
+    def test_acquire_respects_limit(self):
+        """Test that no more than ``limit`` calls are admitted at once."""
+        limiter = AIMDLimiter(initial=2)
+        assert limiter.try_acquire()
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        limiter.release()
+        assert limiter.try_acquire()
+
+
+class TestCircuitBreaker:
+    """Test suite for the quota-backed circuit breaker."""
+
+    def test_sustained_throttling_opens_circuit(self, fake_clock):
+        """Test that throttles drain the retry quota and then open the breaker."""
+        breaker = CircuitBreaker(quota_capacity=20, clock=fake_clock)
+        # Each throttle costs the standard retry cost of 5
+        for _ in range(4):
+            breaker.on_throttle(_retry_context())
+        assert breaker.state == overload_protection.CLOSED
+        breaker.on_throttle(_retry_context())
+        assert breaker.state == overload_protection.OPEN
+        assert not breaker.allow()
+
+    def test_successes_refill_quota(self, fake_clock):
+        """Test that successes between throttles keep the circuit closed."""
+        breaker = CircuitBreaker(quota_capacity=10, clock=fake_clock)
+        response = MagicMock(status_code=200)
+        for _ in range(10):
+            context = _retry_context()
+            breaker.on_throttle(context)
+            breaker.on_success(context.request_context, response)
+        assert breaker.state == overload_protection.CLOSED
+
+    def test_half_open_probe_closes_on_success(self, fake_clock):
+        """Test that one probe is admitted after the cool-down and closes the circuit."""
+        breaker = CircuitBreaker(quota_capacity=5, open_seconds=10, clock=fake_clock)
+        breaker.on_throttle(_retry_context())
+        breaker.on_throttle(_retry_context())
+        assert breaker.is_open()
+        fake_clock.now += 10
+        assert breaker.allow()
+        assert breaker.state == overload_protection.HALF_OPEN
+        assert not breaker.allow()
+        breaker.on_success({}, MagicMock(status_code=200))
+        assert breaker.state == overload_protection.CLOSED
+        assert breaker.allow()
+
+    def test_half_open_probe_reopens_on_throttle(self, fake_clock):
+        """Test that a throttled probe reopens the circuit for another cool-down."""
+        breaker = CircuitBreaker(quota_capacity=5, open_seconds=10, clock=fake_clock)
+        breaker.on_throttle(_retry_context())
+        breaker.on_throttle(_retry_context())
+        fake_clock.now += 10
+        assert breaker.allow()
+        breaker.on_throttle(_retry_context())
+        assert breaker.is_open()
+        fake_clock.now += 5
+        assert not breaker.allow()
+
+
+class TestOverloadProtector:
+    """Test suite for protectors driven by a real botocore client."""
+
+    def test_throttles_feed_limiter_and_retries_continue(self, protected_client):
+        """Test that a throttled attempt backs off the limit and botocore retries."""
+        protector = OverloadProtector(AIMDLimiter(initial=8), CircuitBreaker(quota_capacity=50))
+        protected_client.replies.extend([_throttled, _ok])
+        assert protector.call(lambda _: _invoke(protected_client), None) == b'{"result": "ok"}'
+        assert protector.limiter.limit < 8
+        assert protector.breaker.state == overload_protection.CLOSED
+        assert protector.limiter.in_flight == 0
+
+    def test_open_circuit_aborts_retry_loop(self, protected_client):
+        """Test that the breaker opening mid-call stops botocore from retrying."""
+        protector = OverloadProtector(AIMDLimiter(), CircuitBreaker(quota_capacity=5))
+        protected_client.replies.extend([_throttled, _throttled, _ok])
+        with pytest.raises(LoadShed):
+            protector.call(lambda _: _invoke(protected_client), None)
+        # The second throttle opened the circuit; the third attempt never went out
+        assert len(protected_client.replies) == 1
+
+    def test_open_circuit_sheds_without_calling(self, fake_clock):
+        """Test that calls fail fast while the circuit is open."""
+        breaker = CircuitBreaker(quota_capacity=5, clock=fake_clock)
+        breaker.on_throttle(_retry_context())
+        breaker.on_throttle(_retry_context())
+        invoke = MagicMock()
+        with pytest.raises(LoadShed):
+            OverloadProtector(breaker=breaker).call(invoke, "{}")
+        invoke.assert_not_called()
+
+    def test_calls_without_protector_are_untouched(self, protected_client):
+        """Test that hooks ignore calls made outside a protector."""
+        protected_client.replies.extend([_throttled, _ok])
+        assert _invoke(protected_client) == b'{"result": "ok"}'
+
+
+class TestHandlerIntegration:
+    """Test suite for load shedding in the Lambda handler."""
+
+    def test_shed_request_returns_503(self, mock_client, monkeypatch):
+        """Test that a shed request is reported as 503, not 500."""
+        monkeypatch.setenv("SAGEMAKER_OVERLOAD_PROTECTION", "true")
+        monkeypatch.setenv("SAGEMAKER_CONCURRENCY_LIMIT", "0")
+        response = lambda_function.lambda_handler({"body": "{}"}, None)
+        assert response["statusCode"] == 503
+        assert "request shed" in response["body"]
+        mock_client.invoke_endpoint.assert_not_called()
+
+    def test_protected_invoke_succeeds(self, mock_client, monkeypatch):
+        """Test that protection is transparent while the endpoint is healthy."""
+        monkeypatch.setenv("SAGEMAKER_OVERLOAD_PROTECTION", "true")
+        response = lambda_function.lambda_handler({"body": "{}"}, None)
+        assert response["statusCode"] == 200
+        assert overload_protection.get_protector("mock-endpoint").limiter.in_flight == 0
+
+    def test_batch_records_shed_as_503(self):
+        """Test that shed records in a batch carry their own 503 status."""
+        assert batching._error(0, LoadShed("busy"))["statusCode"] == 503
@@ -0,0 +1,118 @@
+"""Unit tests for binary request/response pass-through."""
+
+import base64
+import struct
+from unittest.mock import patch
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+import lambda_function
+import payload_formats
+from tests.conftest import FakeRawResponse
+
+# A tiny but valid .npy file: float32 vector of three values
+NPY = (
+    b"\x93NUMPY\x01\x00v\x00"
+    + b"{'descr': '<f4', 'fortran_order': False, 'shape': (3,), }".ljust(117, b" ") + b"\n"
+    + struct.pack("<3f", 1.0, 2.0, 3.0)
+)
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def binary_endpoint(lambda_env, make_client, sent):
+    """Patch the handler's client with one that echoes the request body."""
+
+    def respond(request):
+        sent.append(request)
+        headers = {"Content-Type": request.headers.get("Accept", b"application/json").decode()}
+        return AWSResponse(request.url, 200, headers, FakeRawResponse(request.body))
+
+    client = make_client("sagemaker-runtime", respond=respond)
+    with patch("clients.boto3.client", return_value=client):
+        yield client
+
+
+class TestRequestParsing:
+    """Test suite for reading content types and bodies from events."""
+
+    def test_defaults_to_json(self):
+        """Test that events without a content type keep sending JSON."""
+        assert payload_formats.request_content_type({"body": "{}"}) == "application/json"
+        assert payload_formats.response_accept({"body": "{}"}) is None
+
+    def test_headers_are_case_insensitive(self):
+        """Test that API Gateway headers are matched regardless of case."""
+        event = {"headers": {"content-type": "application/x-npy", "ACCEPT": "application/x-npy"}}
+        assert payload_formats.request_content_type(event) == "application/x-npy"
+        assert payload_formats.response_accept(event) == "application/x-npy"
+
+    def test_wildcard_accept_is_dropped(self):
+        """Test that */* leaves the response type to the endpoint."""
+        assert payload_formats.response_accept({"headers": {"Accept": "*/*"}}) is None
+
+    def test_base64_body_is_decoded_to_bytes(self):
+        """Test that API Gateway base64 bodies are restored to the original bytes."""
+        event = {"body": base64.b64encode(NPY).decode(), "isBase64Encoded": True}
+        assert payload_formats.request_body(event) == NPY
+
+
+class TestHttpResponse:
+    """Test suite for building proxy responses from raw bytes."""
+
+    def test_text_is_returned_as_string(self):
+        """Test that UTF-8 results keep the existing string body."""
+        assert payload_formats.http_response(200, b'{"y": 1}') == {"statusCode": 200, "body": '{"y": 1}'}
+
+    def test_binary_accept_is_base64_encoded(self):
+        """Test that binary results are base64 encoded with their content type."""
+        response = payload_formats.http_response(200, NPY, "application/x-npy")
+        assert response["isBase64Encoded"] is True
+        assert base64.b64decode(response["body"]) == NPY
+        assert response["headers"] == {"Content-Type": "application/x-npy"}
+
+    def test_undecodable_bytes_are_base64_encoded(self):
+        """Test that non-UTF-8 results are never mangled into a string."""
+        response = payload_formats.http_response(200, b"\xff\xfe")
+        assert base64.b64decode(response["body"]) == b"\xff\xfe"
+
+
+class TestHandlerPassThrough:
+    """Test suite for forwarding binary payloads through the handler."""
+
+    def test_npy_body_is_forwarded_unchanged(self, binary_endpoint, sent):
+        """Test that a base64 npy payload reaches the endpoint as the original bytes."""
+        event = {
+            "body": base64.b64encode(NPY).decode(),
+            "isBase64Encoded": True,
+            "headers": {"Content-Type": "application/x-npy", "Accept": "application/x-npy"},
+        }
+        response = lambda_function.lambda_handler(event, None)
+        assert sent[0].body == NPY
+        assert sent[0].headers["Content-Type"] == b"application/x-npy"
+        assert sent[0].headers["Accept"] == b"application/x-npy"
+        assert response["isBase64Encoded"] is True
+        assert base64.b64decode(response["body"]) == NPY
+
+    def test_recordio_content_type_is_forwarded(self, binary_endpoint, sent):
+        """Test that recordio-protobuf bodies pass through with their content type."""
+        record = b"\x0a\xd7\x23\xce" + struct.pack("<I", 2) + b"\x08\x01\x00\x00"
+        event = {
+            "body": base64.b64encode(record).decode(),
+            "isBase64Encoded": True,
+            "contentType": "application/x-recordio-protobuf",
+        }
+        lambda_function.lambda_handler(event, None)
+        assert sent[0].body == record
+        assert sent[0].headers["Content-Type"] == b"application/x-recordio-protobuf"
+
+    def test_json_requests_are_unchanged(self, binary_endpoint, sent):
+        """Test that plain JSON events still send and return JSON strings."""
+        response = lambda_function.lambda_handler({"body": '{"x": 1}'}, None)
+        assert sent[0].headers["Content-Type"] == b"application/json"
+        assert response == {"statusCode": 200, "body": '{"x": 1}'}
@@ -0,0 +1,78 @@
+"""Unit tests for size-bounded, sampled payload logging."""
+
+import json
+import logging
+from unittest.mock import patch
+
+import lambda_function
+import payload_logging
+
+
+class TestPayloadLog:
+    """Test suite for the lazily formatted payload record."""
+
+    def test_preview_is_truncated_with_size_and_digest(self):
+        """Test that large bodies are logged as size, digest and preview."""
+        payload = json.dumps({"features": list(range(5000))})
+        record = payload_logging.PayloadLog("request", "ep", payload, limit=32).as_dict()
+        assert record["size_bytes"] == len(payload)
+        assert len(record["sha256"]) == 16
+        assert record["preview"] == payload[:32]
+        assert record["truncated"] is True
+        assert "body" not in record
+
+    def test_full_body_when_sampled(self):
+        """Test that sampled records carry the whole body."""
+        record = payload_logging.PayloadLog("response", "ep", b'{"y": 1}', full=True).as_dict()
+        assert record["body"] == '{"y": 1}'
+        assert "preview" not in record
+
+    def test_formatting_is_deferred_until_emitted(self):
+        """Test that nothing is serialized for records below the log level."""
+        logger = logging.getLogger("payload-logging-test")
+        logger.setLevel(logging.WARNING)
+        with patch.object(payload_logging.PayloadLog, "as_dict") as as_dict:
+            logger.info("payload: %s", payload_logging.PayloadLog("request", "ep", "{}"))
+        as_dict.assert_not_called()
+
+
+class TestSampling:
+    """Test suite for the full-body sample decision."""
+
+    def test_default_rate_never_logs_full_bodies(self, monkeypatch):
+        """Test that full bodies are off unless a sample rate is set."""
+        monkeypatch.delenv("PAYLOAD_LOG_SAMPLE_RATE", raising=False)
+        logger = logging.getLogger("payload-logging-test")
+        logger.setLevel(logging.INFO)
+        assert not payload_logging.should_log_full(logger)
+
+    def test_rate_is_applied(self):
+        """Test that the random draw is compared against the rate."""
+        logger = logging.getLogger("payload-logging-test")
+        logger.setLevel(logging.INFO)
+        assert payload_logging.should_log_full(logger, rate=0.1, rand=lambda: 0.05)
+        assert not payload_logging.should_log_full(logger, rate=0.1, rand=lambda: 0.5)
+        assert payload_logging.should_log_full(logger, rate=1.0, rand=lambda: 0.99)
+
+    def test_no_sampling_when_info_disabled(self):
+        """Test that disabled INFO logging skips the sample draw entirely."""
+        logger = logging.getLogger("payload-logging-test")
+        logger.setLevel(logging.WARNING)
+        assert not payload_logging.should_log_full(logger, rate=1.0)
+
+
+class TestHandlerLogging:
+    """Test suite for the handler's payload log lines."""
+
+    def test_handler_logs_summaries_not_bodies(self, mock_client, caplog, monkeypatch):
+        """Test that the default handler logs a preview instead of the full payload."""
+        monkeypatch.setenv("PAYLOAD_LOG_PREVIEW_BYTES", "16")
+        body = json.dumps({"features": [0.5] * 1000})
+        with caplog.at_level(logging.INFO):
+            lambda_function.lambda_handler({"body": body}, None)
+        messages = [r.getMessage() for r in caplog.records]
+        request_line = next(m for m in messages if m.startswith("Invoking SageMaker endpoint"))
+        logged = json.loads(request_line.split(": ", 1)[1])
+        assert logged["size_bytes"] == len(body)
+        assert logged["preview"] == body[:16]
+        assert body not in "\n".join(messages)
@@ -0,0 +1,171 @@
+"""Unit tests for request body compression."""
+
+import gzip
+import importlib.util
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+import instrumentation
+import lambda_function
+import request_compression
+from tests.conftest import FakeRawResponse
+
+LARGE = json.dumps({"features": [i * 0.001 for i in range(20000)]})
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def client(make_client, sent):
+    """A real sagemaker-runtime client that records each outgoing request."""
+
+    def respond(request):
+        sent.append(request)
+        return AWSResponse(request.url, 200, {}, FakeRawResponse(b'{"result": "ok"}'))
+
+    return make_client("sagemaker-runtime", respond=respond)
+
+
+def _zstd_installed():
+    """Whether Python 3.14's compression.zstd or the zstandard package is importable."""
+    for name in ("compression.zstd", "zstandard"):
+        try:
+            if importlib.util.find_spec(name) is not None:
+                return True
+        except ModuleNotFoundError:
+            pass
+    return False
+
+
+class TestCompressBody:
+    """Test suite for the size threshold and codec selection."""
+
+    def test_zstd_available_when_installed(self):
+        """Test that zstd is offered whenever compression.zstd or zstandard can be imported."""
+        assert ("zstd" in request_compression.CODECS) == _zstd_installed()
+
+    @pytest.mark.skipif("zstd" not in request_compression.CODECS, reason="no zstd implementation installed")
+    def test_zstd_round_trip(self, monkeypatch):
+        """Test that zstd bodies shrink and decode back to the original."""
+        monkeypatch.setenv("SAGEMAKER_REQUEST_COMPRESSION", "zstd")
+        assert request_compression.configured_encoding() == "zstd"
+        body, compressed = request_compression.compress_body(LARGE, "zstd", threshold=1024)
+        assert compressed and len(body) < len(LARGE)
+        response = {"ResponseMetadata": {"HTTPHeaders": {"content-encoding": "zstd"}}}
+        assert request_compression.decode_body(response, body) == LARGE.encode()
+
+    def test_small_bodies_are_left_alone(self):
+        """Test that bodies under the threshold are not compressed."""
+        body, compressed = request_compression.compress_body('{"x": 1}', "gzip", threshold=1024)
+        assert body == b'{"x": 1}'
+        assert not compressed
+
+    def test_large_bodies_are_compressed(self):
+        """Test that bodies over the threshold round-trip through gzip."""
+        body, compressed = request_compression.compress_body(LARGE, "gzip", threshold=1024)
+        assert compressed
+        assert len(body) < len(LARGE) / 2
+        assert gzip.decompress(body) == LARGE.encode()
+
+    def test_incompressible_bodies_are_sent_raw(self):
+        """Test that compression is dropped when it would not shrink the body."""
+        noise = bytes(range(256)) * 8
+        body, compressed = request_compression.compress_body(gzip.compress(noise), "gzip", threshold=16)
+        assert not compressed
+
+    def test_gzip_output_is_deterministic(self):
+        """Test that equal bodies compress to equal bytes, keeping cache keys stable."""
+        assert request_compression.compress_body(LARGE, "gzip", 0) == request_compression.compress_body(LARGE, "gzip", 0)
+
+    def test_unavailable_codec_falls_back_to_gzip(self, monkeypatch):
+        """Test that an unknown or missing codec degrades to gzip."""
+        monkeypatch.setenv("SAGEMAKER_REQUEST_COMPRESSION", "brotli")
+        assert request_compression.configured_encoding() == "gzip"
+        monkeypatch.setenv("SAGEMAKER_REQUEST_COMPRESSION", "none")
+        assert request_compression.configured_encoding() is None
+
+    def test_savings_and_time_are_reported(self):
+        """Test that bytes saved and compression time reach the EMF metrics."""
+        metrics = instrumentation.start_invocation()
+        try:
+            body, _ = request_compression.compress_body(LARGE, "gzip", threshold=1024)
+        finally:
+            instrumentation.finish_invocation(stream=io.StringIO())
+        assert metrics.counts["CompressionBytesSaved"] == len(LARGE) - len(body)
+        assert metrics.latencies["CompressionLatency"] > 0
+
+
+class TestClientCompression:
+    """Test suite for the botocore before-call handler."""
+
+    def test_request_is_compressed_and_signed(self, client, sent):
+        """Test that the sent body is gzip with Content-Encoding and Accept-Encoding set."""
+        request_compression.enable_compression(client, "gzip", threshold=1024)
+        client.invoke_endpoint(EndpointName="model", ContentType="application/json", Body=LARGE)
+        request = sent[0]
+        assert request.headers["Content-Encoding"] == b"gzip"
+        assert b"gzip" in request.headers["Accept-Encoding"]
+        assert gzip.decompress(request.body) == LARGE.encode()
+        assert b"content-encoding" in request.headers["Authorization"]
+
+    def test_small_request_has_no_content_encoding(self, client, sent):
+        """Test that small requests go out uncompressed."""
+        request_compression.enable_compression(client, "gzip", threshold=1024)
+        client.invoke_endpoint(EndpointName="model", Body=b'{"x": 1}')
+        assert "Content-Encoding" not in sent[0].headers
+        assert sent[0].body == b'{"x": 1}'
+
+    def test_retries_reuse_compressed_body(self, make_client):
+        """Test that a retried request is not compressed twice."""
+        bodies = []
+
+        def respond(request):
+            bodies.append(request.body)
+            status = 500 if len(bodies) == 1 else 200
+            return AWSResponse(request.url, status, {}, FakeRawResponse(b"{}"))
+
+        client = make_client("sagemaker-runtime", respond=respond)
+        request_compression.enable_compression(client, "gzip", threshold=1024)
+        with patch("botocore.endpoint.time.sleep"):
+            client.invoke_endpoint(EndpointName="model", Body=LARGE)
+        assert len(bodies) == 2
+        assert bodies[0] == bodies[1]
+        assert gzip.decompress(bodies[1]) == LARGE.encode()
+
+
+class TestDecodeBody:
+    """Test suite for decompressing encoded responses."""
+
+    def test_gzip_response_is_decoded(self):
+        """Test that a gzip-encoded response body is decompressed."""
+        response = {"ResponseMetadata": {"HTTPHeaders": {"content-encoding": "gzip"}}}
+        assert request_compression.decode_body(response, gzip.compress(b"hello")) == b"hello"
+
+    def test_plain_response_is_untouched(self):
+        """Test that bodies without a known encoding pass through."""
+        assert request_compression.decode_body({}, b"hello") == b"hello"
+
+
+class TestHandlerIntegration:
+    """Test suite for compression in the Lambda handler."""
+
+    def test_handler_compresses_large_payloads(self, lambda_env, client, sent, monkeypatch):
+        """Test that the handler sends large bodies gzip-encoded when enabled."""
+        monkeypatch.setenv("SAGEMAKER_REQUEST_COMPRESSION", "gzip")
+        with patch("clients.boto3.client", return_value=client):
+            response = lambda_function.lambda_handler({"body": LARGE}, None)
+        assert response["statusCode"] == 200
+        assert gzip.decompress(sent[0].body) == LARGE.encode()
+
+    def test_handler_leaves_compression_off_by_default(self, lambda_env, client, sent):
+        """Test that bodies are sent uncompressed unless compression is enabled."""
+        with patch("clients.boto3.client", return_value=client):
+            lambda_function.lambda_handler({"body": LARGE}, None)
+        assert sent[0].body == LARGE.encode()
@@ -0,0 +1,203 @@
+"""Unit tests for the content-addressed inference result cache."""
+
+import io
+import json
+import threading
+
+import botocore.session
+import pytest
+from botocore.stub import Stubber
+
+import instrumentation
+import lambda_function
+import result_cache
+
+
+class TestCacheKey:
+    """Test suite for cache key derivation."""
+
+    def test_key_is_stable_for_str_and_bytes(self):
+        """Test that str and bytes payloads with the same content share a key."""
+        assert result_cache.cache_key("ep", "application/json", "{}") == \
+            result_cache.cache_key("ep", "application/json", b"{}")
+
+    def test_key_depends_on_every_component(self):
+        """Test that endpoint, content type, payload and accept type all change the key."""
+        base = result_cache.cache_key("ep", "application/json", b"{}")
+        assert result_cache.cache_key("ep2", "application/json", b"{}") != base
+        assert result_cache.cache_key("ep", "text/csv", b"{}") != base
+        assert result_cache.cache_key("ep", "application/json", b"[]") != base
+        assert result_cache.cache_key("ep", "application/json", b"{}", "application/x-npy") != base
+
+
+class TestLRUCache:
+    """Test suite for the in-process LRU."""
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the LRU entry is evicted and counted."""
+        cache = result_cache.LRUCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.evictions == 1
+
+    def test_entries_expire_after_ttl(self, fake_clock):
+        """Test that entries past their TTL are dropped on read."""
+        cache = result_cache.LRUCache(max_entries=2, ttl_seconds=10, clock=fake_clock)
+        cache.put("a", "1")
+        fake_clock.now += 11
+        assert cache.get("a") is None
+        assert cache.expirations == 1
+        assert len(cache) == 0
+
+
+class TestResultCache:
+    """Test suite for the layered cache and its metrics."""
+
+    def test_wrap_calls_endpoint_once_per_payload(self):
+        """Test that identical payloads are served from the cache."""
+        calls = []
+        cache = result_cache.ResultCache()
+        invoke = cache.wrap(lambda payload: calls.append(payload) or "result", "ep")
+        assert [invoke("{}"), invoke("{}"), invoke("[]")] == ["result"] * 3
+        assert calls == ["{}", "[]"]
+        metrics = cache.metrics()
+        assert metrics["CacheHits"] == 1
+        assert metrics["CacheMisses"] == 2
+
+    def test_shared_store_backfills_local_cache(self):
+        """Test that a shared-store hit is copied into the local LRU."""
+        store = result_cache.InMemoryStore()
+        store.put("k", "shared", 60)
+        cache = result_cache.ResultCache(store=store)
+        assert cache.get("k") == "shared"
+        assert cache.local.get("k") == "shared"
+        assert cache.metrics()["CacheSharedHits"] == 1
+
+    def test_store_failures_degrade_to_miss(self):
+        """Test that a failing shared store does not fail the request."""
+        class BrokenStore:
+            def get(self, key):
+                raise RuntimeError("unavailable")
+
+            def put(self, key, value, ttl_seconds):
+                raise RuntimeError("unavailable")
+
+        cache = result_cache.ResultCache(store=BrokenStore())
+        assert cache.get("k") is None
+        cache.put("k", "v")
+        assert cache.get("k") == "v"
+        assert cache.metrics()["CacheStoreErrors"] == 2
+
+    def test_counters_are_exact_under_concurrency(self):
+        """Test that lookups from many threads lose no hit or miss counts."""
+        cache = result_cache.ResultCache()
+        cache.put("hit", "v")
+
+        def lookups():
+            for _ in range(2000):
+                cache.get("hit")
+                cache.get("miss")
+
+        threads = [threading.Thread(target=lookups) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics = cache.metrics()
+        assert (metrics["CacheHits"], metrics["CacheMisses"]) == (16000, 16000)
+
+    def test_emit_metrics_counts_changes_since_last_call(self):
+        """Test that each invocation gets only its own hits, misses and evictions."""
+        cache = result_cache.ResultCache(local=result_cache.LRUCache(max_entries=1))
+        invoke = cache.wrap(lambda payload: "result", "ep")
+        invoke("{}")
+        invoke("{}")
+        invoke("[]")
+        first = instrumentation.start_invocation()
+        cache.emit_metrics()
+        invoke("[]")
+        second = instrumentation.start_invocation()
+        cache.emit_metrics()
+        instrumentation.finish_invocation(stream=io.StringIO())
+        assert (first.counts["CacheHits"], first.counts["CacheMisses"], first.counts["CacheEvictions"]) == (1, 2, 1)
+        assert (second.counts["CacheHits"], second.counts["CacheMisses"], second.counts["CacheEvictions"]) == (1, 0, 0)
+
+
+class TestDynamoDBStore:
+    """Test suite for the DynamoDB-backed shared store."""
+
+    @pytest.fixture
+    def stubbed(self):
+        client = botocore.session.get_session().create_client(
+            "dynamodb", region_name="us-east-2",
+            aws_access_key_id="AKIDTEST", aws_secret_access_key="secret",
+        )
+        with Stubber(client) as stubber:
+            yield client, stubber
+
+    def test_put_writes_typed_item_with_expiry(self, stubbed, fake_clock):
+        """Test that put writes the result with an epoch expires_at."""
+        client, stubber = stubbed
+        stubber.add_response("put_item", {}, {
+            "TableName": "cache",
+            "Item": {"cache_key": {"S": "k"}, "result": {"S": "v"}, "expires_at": {"N": "1060"}},
+        })
+        result_cache.DynamoDBStore("cache", client=client, clock=fake_clock).put("k", "v", 60)
+        stubber.assert_no_pending_responses()
+
+    def test_get_ignores_expired_items(self, stubbed, fake_clock):
+        """Test that items past expires_at are treated as misses."""
+        client, stubber = stubbed
+        item = {"cache_key": {"S": "k"}, "result": {"S": "v"}, "expires_at": {"N": "999"}}
+        stubber.add_response("get_item", {"Item": item})
+        stubber.add_response("get_item", {"Item": dict(item, expires_at={"N": "2000"})})
+        store = result_cache.DynamoDBStore("cache", client=client, clock=fake_clock)
+        assert store.get("k") is None
+        assert store.get("k") == "v"
+
+    def test_binary_results_round_trip(self, stubbed, fake_clock):
+        """Test that byte results come back as bytes, not DynamoDB Binary wrappers."""
+        client, stubber = stubbed
+        item = {"cache_key": {"S": "k"}, "result": {"B": b"\x93NUMPY"}, "expires_at": {"N": "2000"}}
+        stubber.add_response("get_item", {"Item": item})
+        store = result_cache.DynamoDBStore("cache", client=client, clock=fake_clock)
+        assert store.get("k") == b"\x93NUMPY"
+
+
+class TestHandlerCache:
+    """Test suite for the handler's opt-in cache."""
+
+    def test_cache_disabled_by_default(self, mock_client):
+        """Test that every invocation reaches the endpoint without opt-in."""
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        assert mock_client.invoke_endpoint.call_count == 2
+
+    def test_enabled_cache_skips_repeat_invocations(self, mock_client, monkeypatch):
+        """Test that a repeated payload is answered from the cache."""
+        monkeypatch.setenv("INFERENCE_CACHE_ENABLED", "true")
+        first = lambda_function.lambda_handler({"body": "{}"}, None)
+        second = lambda_function.lambda_handler({"body": "{}"}, None)
+        assert first == second
+        assert mock_client.invoke_endpoint.call_count == 1
+
+    def test_cache_counts_reach_emf(self, mock_client, monkeypatch, capsys):
+        """Test that the handler reports per-invocation cache counts as EMF metrics, not logs."""
+        monkeypatch.setenv("INFERENCE_CACHE_ENABLED", "true")
+        monkeypatch.setenv("INFERENCE_METRICS_ENABLED", "true")
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        docs = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+        assert [(d["CacheHits"], d["CacheMisses"]) for d in docs] == [(0, 1), (1, 0)]
+
+    def test_failed_invocations_are_not_cached(self, mock_client, monkeypatch):
+        """Test that endpoint errors are retried rather than cached."""
+        monkeypatch.setenv("INFERENCE_CACHE_ENABLED", "true")
+        mock_client.invoke_endpoint.side_effect = RuntimeError("boom")
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        assert mock_client.invoke_endpoint.call_count == 2
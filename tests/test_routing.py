@@ -0,0 +1,155 @@
+"""Unit tests for latency-aware endpoint and variant routing."""
+
+import json
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+import lambda_function
+import routing
+
+
+def _client_error(code, status):
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "InvokeEndpoint",
+    )
+
+
+def _router(clock, n=3, **kwargs):
+    targets = [routing.Target(f"ep-{i}") for i in range(n)]
+    kwargs.setdefault("explore_rate", 0.0)
+    kwargs.setdefault("clock", clock)
+    return routing.Router(targets, **kwargs), targets
+
+
+class TestRouter:
+    """Test suite for target selection and health tracking."""
+
+    def test_unmeasured_targets_are_tried_first(self, fake_clock):
+        """Test that each target is measured before exploiting the fastest."""
+        router, targets = _router(fake_clock)
+        router.observe(targets[0], 0.01, ok=True)
+        assert router.choose() in targets[1:]
+
+    def test_fastest_target_wins(self, fake_clock):
+        """Test that the lowest latency EWMA is chosen."""
+        router, targets = _router(fake_clock)
+        for target, latency in zip(targets, (0.05, 0.01, 0.03)):
+            router.observe(target, latency, ok=True)
+        assert router.choose() is targets[1]
+
+    def test_weight_scales_score(self):
+        """Test that a heavier target wins despite somewhat higher latency."""
+        targets = [routing.Target("a", weight=1), routing.Target("b", weight=4)]
+        router = routing.Router(targets, explore_rate=0.0)
+        router.observe(targets[0], 0.010, ok=True)
+        router.observe(targets[1], 0.020, ok=True)
+        assert router.choose() is targets[1]
+
+    def test_consecutive_failures_eject_until_cooldown(self, fake_clock):
+        """Test that a failing target is ejected, then readmitted after the cool-down."""
+        router, targets = _router(fake_clock, eject_after_failures=2, ejection_seconds=10)
+        for target in targets:
+            router.observe(target, 0.01, ok=True)
+        router.observe(targets[1], 0.01, ok=False)
+        router.observe(targets[1], 0.01, ok=False)
+        assert targets[1] not in router.healthy()
+        fake_clock.now += 11
+        assert targets[1] in router.healthy()
+
+    def test_latency_outlier_is_ejected(self, fake_clock):
+        """Test that a target far slower than its peers is ejected."""
+        router, targets = _router(fake_clock)
+        for _ in range(routing.MIN_SAMPLES_FOR_OUTLIER):
+            router.observe(targets[0], 0.010, ok=True)
+            router.observe(targets[1], 0.012, ok=True)
+            router.observe(targets[2], 0.200, ok=True)
+        assert targets[2] not in router.healthy()
+
+    def test_never_ejects_more_than_half(self, fake_clock):
+        """Test that ejection is capped so traffic always has somewhere to go."""
+        router, targets = _router(fake_clock, n=2, eject_after_failures=1)
+        router.observe(targets[0], 0.01, ok=False)
+        router.observe(targets[1], 0.01, ok=False)
+        assert len(router.healthy()) == 1
+
+    def test_exclude_skips_targets(self, fake_clock):
+        """Test that excluded targets are never chosen."""
+        router, targets = _router(fake_clock, n=2)
+        assert router.choose(exclude=(targets[0],)) is targets[1]
+        assert router.choose(exclude=tuple(targets)) is None
+
+    def test_call_observes_failures_and_reraises(self, fake_clock):
+        """Test that call records server faults against the chosen target."""
+        router, targets = _router(fake_clock, n=1)
+
+        def invoke(target, payload):
+            raise _client_error("ServiceUnavailable", 503)
+
+        with pytest.raises(ClientError):
+            router.call(invoke, "{}")
+        assert targets[0].consecutive_failures == 1
+
+    @pytest.mark.parametrize("error", [
+        _client_error("ValidationError", 400),
+        _client_error("ModelError", 424),
+        ValueError("bad payload"),
+    ])
+    def test_request_errors_leave_target_health_alone(self, error, fake_clock):
+        """Test that errors caused by the request are re-raised without counting as failures."""
+        router, targets = _router(fake_clock, n=1)
+
+        def invoke(target, payload):
+            raise error
+
+        with pytest.raises(type(error)):
+            router.call(invoke, "{}")
+        assert targets[0].consecutive_failures == 0
+        assert targets[0].samples == 0
+
+    @pytest.mark.parametrize("error, expected", [
+        (_client_error("InternalFailure", 500), True),
+        (_client_error("ThrottlingException", 400), True),
+        (_client_error("TooManyRequests", 429), True),
+        (ReadTimeoutError(endpoint_url="https://runtime"), True),
+        (EndpointConnectionError(endpoint_url="https://runtime"), True),
+        (_client_error("ValidationError", 400), False),
+        (RuntimeError("bug"), False),
+    ])
+    def test_is_target_failure(self, error, expected):
+        """Test that only server faults, throttles, timeouts and connection errors count."""
+        assert routing.is_target_failure(error) is expected
+
+
+class TestRoutingConfig:
+    """Test suite for routing table parsing and warm reuse."""
+
+    def test_parse_routes(self):
+        """Test that endpoints, variants and weights are read from JSON."""
+        targets = routing.parse_routes('[{"endpoint": "a", "variant": "blue", "weight": 2}, {"endpoint": "b"}]')
+        assert [(t.endpoint_name, t.variant, t.weight) for t in targets] == [("a", "blue", 2.0), ("b", None, 1.0)]
+        assert targets[0].name == "a/blue"
+
+    def test_router_state_survives_across_lookups(self, lambda_env):
+        """Test that the same routing table returns the same router."""
+        routes = '[{"endpoint": "a"}]'
+        assert routing.get_router(routes) is routing.get_router(routes)
+
+
+class TestHandlerRouting:
+    """Test suite for routed handler invocations."""
+
+    def test_routes_pass_endpoint_and_target_variant(self, mock_client, monkeypatch):
+        """Test that routed calls use the target's endpoint and variant."""
+        monkeypatch.setenv("SAGEMAKER_ROUTES", json.dumps([{"endpoint": "model-a", "variant": "blue"}]))
+        response = lambda_function.lambda_handler({"body": "{}"}, None)
+        assert response["statusCode"] == 200
+        kwargs = mock_client.invoke_endpoint.call_args.kwargs
+        assert kwargs["EndpointName"] == "model-a"
+        assert kwargs["TargetVariant"] == "blue"
+
+    def test_without_routes_no_target_variant(self, mock_client):
+        """Test that unrouted calls do not send TargetVariant."""
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        assert "TargetVariant" not in mock_client.invoke_endpoint.call_args.kwargs
@@ -0,0 +1,340 @@
+"""Unit tests for streaming batch inference over S3 objects."""
+
+import hashlib
+import io
+import json
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+import lambda_function
+import s3_batch
+from tests.conftest import FakeRawResponse
+
+
+def _decode_aws_chunked(body):
+    """Strip the aws-chunked framing botocore adds for trailing checksums."""
+    data, pos = b"", 0
+    while True:
+        line_end = body.index(b"\r\n", pos)
+        size = int(body[pos:line_end].split(b";")[0], 16)
+        if size == 0:
+            return data
+        data += body[line_end + 2:line_end + 2 + size]
+        pos = line_end + 2 + size + 2
+
+
+class FakeS3:
+    """In-memory S3 answering a real botocore client from ``before-send``.
+
+    Supports the calls the batch processor and s3transfer make: head/get
+    (with ``Range``)/put object and the multipart upload trio.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.multipart = []
+        self.calls = []
+
+    def put(self, bucket, key, data):
+        self.objects[(bucket, key)] = data
+
+    def get(self, bucket, key):
+        return self.objects.get((bucket, key))
+
+    def _reply(self, request, status=200, body=b"", headers=None):
+        return AWSResponse(request.url, status, headers or {}, FakeRawResponse(body))
+
+    def __call__(self, request):
+        url = urlsplit(request.url)
+        if url.hostname.startswith("s3."):
+            bucket, _, key = unquote(url.path.lstrip("/")).partition("/")
+        else:
+            bucket, key = url.hostname.split(".", 1)[0], unquote(url.path.lstrip("/"))
+        query = parse_qs(url.query, keep_blank_values=True)
+        body = request.body
+        if hasattr(body, "read"):
+            body = body.read()
+        body = body or b""
+        if b"aws-chunked" in request.headers.get("Content-Encoding", b""):
+            body = _decode_aws_chunked(body)
+        self.calls.append((request.method, key, dict(request.headers)))
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = f"upload-{len(self.uploads)}"
+            self.uploads[upload_id] = {}
+            xml = (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                   f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+            return self._reply(request, body=xml.encode())
+        if request.method == "PUT" and "uploadId" in query:
+            self.uploads[query["uploadId"][0]][int(query["partNumber"][0])] = body
+            return self._reply(request, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "POST" and "uploadId" in query:
+            parts = self.uploads.pop(query["uploadId"][0])
+            self.multipart.append((key, len(parts)))
+            self.put(bucket, key, b"".join(parts[n] for n in sorted(parts)))
+            xml = f"<CompleteMultipartUploadResult><Key>{key}</Key><ETag>\"x\"</ETag></CompleteMultipartUploadResult>"
+            return self._reply(request, body=xml.encode())
+        if request.method == "PUT":
+            self.put(bucket, key, body)
+            return self._reply(request, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+        data = self.get(bucket, key)
+        if data is None:
+            if request.method == "HEAD":
+                return self._reply(request, 404)
+            error = b"<Error><Code>NoSuchKey</Code><Message>missing</Message></Error>"
+            return self._reply(request, 404, error)
+        headers = {"ETag": f'"{hashlib.md5(data).hexdigest()}"', "Content-Length": str(len(data))}
+        if request.method == "HEAD":
+            return self._reply(request, headers=headers)
+        byte_range = request.headers.get("Range")
+        if byte_range:
+            start = int(byte_range.decode().split("=")[1].split("-")[0])
+            data = data[start:]
+            headers["Content-Length"] = str(len(data))
+            return self._reply(request, 206, data, headers)
+        return self._reply(request, body=data, headers=headers)
+
+
+class FakeDeadline:
+    """Deadline whose remaining time is set by the test."""
+
+    def __init__(self, remaining):
+        self.remaining_seconds = remaining
+
+    def remaining(self):
+        return self.remaining_seconds
+
+
+@pytest.fixture
+def fake_s3(make_client):
+    store = FakeS3()
+    client = make_client("s3", respond=store)
+    client.store = store
+    return client
+
+
+def _jsonl(n):
+    return b"".join(json.dumps({"x": i}).encode() + b"\n" for i in range(n))
+
+
+def _echo_invoke(calls):
+    """build_invoke stub that doubles every row's x."""
+    def build(content_type):
+        def invoke(payload):
+            calls.append((content_type, payload))
+            rows = [json.loads(line) for line in payload.splitlines()]
+            return b"".join(json.dumps({"y": r["x"] * 2}).encode() + b"\n" for r in rows)
+        return invoke
+    return build
+
+
+def _output_rows(store, key, bucket="in"):
+    parts = sorted(k for (b, k) in store.objects if b == bucket and k.startswith(f"output/{key}.out/"))
+    return [json.loads(line) for p in parts for line in store.get(bucket, p).splitlines()]
+
+
+class TestEvents:
+    """Test suite for recognising S3 events."""
+
+    def test_notification_keys_are_unquoted(self):
+        """Test that URL-encoded notification keys are decoded."""
+        event = {"Records": [{
+            "eventSource": "aws:s3", "eventName": "ObjectCreated:Put",
+            "s3": {"bucket": {"name": "in"}, "object": {"key": "data/my+file%281%29.jsonl"}},
+        }]}
+        assert s3_batch.s3_objects(event) == [("in", "data/my file(1).jsonl")]
+
+    def test_eventbridge_object_created(self):
+        """Test that EventBridge S3 events are recognised too."""
+        event = {
+            "source": "aws.s3", "detail-type": "Object Created",
+            "detail": {"bucket": {"name": "in"}, "object": {"key": "a.csv"}},
+        }
+        assert s3_batch.s3_objects(event) == [("in", "a.csv")]
+
+    @pytest.mark.parametrize("detail_type", ["Object Deleted", "Object Restore Completed", None])
+    def test_eventbridge_other_object_events_are_ignored(self, detail_type):
+        """Test that only EventBridge Object Created events start a batch."""
+        event = {
+            "source": "aws.s3", "detail-type": detail_type,
+            "detail": {"bucket": {"name": "in"}, "object": {"key": "a.csv"}},
+        }
+        assert not s3_batch.is_s3_event(event)
+
+    def test_other_events_are_not_s3(self):
+        """Test that inline bodies and SQS batches are not mistaken for S3 events."""
+        assert not s3_batch.is_s3_event({"body": "{}"})
+        assert not s3_batch.is_s3_event({"Records": [{"eventSource": "aws:sqs"}]})
+
+
+class TestIterBatches:
+    """Test suite for cutting lines into batches."""
+
+    def test_batches_respect_rows_and_bytes(self):
+        """Test that batches stop at the row or byte limit, whichever comes first."""
+        lines = [b"aaaa\n", b"bbbb\n", b"cccc\n", b"dddd\n", b"eeee\n"]
+        batches = list(s3_batch.iter_batches(iter(lines), 0, max_rows=2, max_bytes=100))
+        assert [b[0] for b in batches] == [b"aaaa\nbbbb\n", b"cccc\ndddd\n", b"eeee\n"]
+        assert [b[1] for b in batches] == [10, 20, 25]
+        batches = list(s3_batch.iter_batches(iter(lines), 0, max_rows=10, max_bytes=12))
+        assert [b[2] for b in batches] == [2, 2, 1]
+
+    def test_offsets_count_blank_lines_and_start_position(self):
+        """Test that end offsets are absolute input positions, blank lines included."""
+        batches = list(s3_batch.iter_batches(iter([b"a\n", b"\n", b"b"]), 100, max_rows=10, max_bytes=100))
+        assert batches == [(b"a\nb\n", 104, 2)]
+        batches = list(s3_batch.iter_batches(iter([b"a\n", b"\n", b"b"]), 0, max_rows=1, max_bytes=100))
+        assert batches == [(b"a\n", 3, 1), (b"b\n", 4, 1)]
+
+
+class TestProcessObject:
+    """Test suite for processing one object end to end."""
+
+    def test_rows_are_batched_and_written_in_order(self, fake_s3, monkeypatch):
+        """Test that every row's result lands in the output, in input order."""
+        monkeypatch.setenv("S3_BATCH_ROWS", "7")
+        fake_s3.store.put("in", "data.jsonl", _jsonl(50))
+        calls = []
+        summary = s3_batch.process_object(fake_s3, _echo_invoke(calls), "in", "data.jsonl", workers=3)
+        assert summary["complete"] and summary["rows"] == 50
+        assert len(calls) == 8
+        assert all(ct == "application/jsonlines" for ct, _ in calls)
+        assert _output_rows(fake_s3.store, "data.jsonl") == [{"y": i * 2} for i in range(50)]
+
+    def test_csv_header_is_skipped(self, fake_s3):
+        """Test that CSV inputs go out as text/csv without the header row."""
+        fake_s3.store.put("in", "data.csv", b"a,b\n1,2\n3,4\n")
+        calls = []
+
+        def build(content_type):
+            def invoke(payload):
+                calls.append((content_type, payload))
+                return b"0.5\n0.7\n"
+            return invoke
+
+        s3_batch.process_object(fake_s3, build, "in", "data.csv")
+        assert calls == [("text/csv", b"1,2\n3,4\n")]
+        assert fake_s3.store.get("in", "output/data.csv.out/part-00000") == b"0.5\n0.7\n"
+
+    def test_deadline_checkpoints_and_retry_resumes(self, fake_s3, monkeypatch):
+        """Test that a run cut short by the deadline resumes where it stopped."""
+        monkeypatch.setenv("S3_BATCH_ROWS", "10")
+        fake_s3.store.put("in", "data.jsonl", _jsonl(40))
+        deadline = FakeDeadline(60.0)
+        calls = []
+        build = _echo_invoke(calls)
+
+        def build_with_clock(content_type):
+            invoke = build(content_type)
+
+            def timed(payload):
+                result = invoke(payload)
+                if len(calls) == 2:
+                    deadline.remaining_seconds = 1.0
+                return result
+            return timed
+
+        first = s3_batch.process_object(fake_s3, build_with_clock, "in", "data.jsonl", deadline, workers=1)
+        assert not first["complete"]
+        assert first["rows"] == 20 and first["part"] == 1
+        checkpoint = json.loads(fake_s3.store.get("in", "output/data.jsonl.checkpoint.json"))
+        assert checkpoint["offset"] == len(_jsonl(20))
+
+        second = s3_batch.process_object(fake_s3, build, "in", "data.jsonl", FakeDeadline(60.0), workers=1)
+        assert second["complete"] and second["rows"] == 40 and second["part"] == 2
+        assert _output_rows(fake_s3.store, "data.jsonl") == [{"y": i * 2} for i in range(40)]
+        ranges = [h.get("Range") for m, k, h in fake_s3.store.calls if m == "GET" and k == "data.jsonl"]
+        assert ranges[-1] == f"bytes={len(_jsonl(20))}-".encode()
+
+    def test_failed_batch_keeps_earlier_results(self, fake_s3, monkeypatch):
+        """Test that rows before a failing batch are checkpointed and the error raised."""
+        monkeypatch.setenv("S3_BATCH_ROWS", "5")
+        fake_s3.store.put("in", "data.jsonl", _jsonl(20))
+        calls = []
+        echo = _echo_invoke(calls)
+
+        def build(content_type):
+            invoke = echo(content_type)
+
+            def failing(payload):
+                if len(calls) == 2:
+                    raise RuntimeError("endpoint down")
+                return invoke(payload)
+            return failing
+
+        with pytest.raises(RuntimeError):
+            s3_batch.process_object(fake_s3, build, "in", "data.jsonl", workers=1)
+        checkpoint = json.loads(fake_s3.store.get("in", "output/data.jsonl.checkpoint.json"))
+        assert checkpoint["rows"] == 10 and not checkpoint["complete"]
+
+    def test_completed_object_is_skipped(self, fake_s3):
+        """Test that a duplicate notification for a finished object does nothing."""
+        fake_s3.store.put("in", "data.jsonl", _jsonl(3))
+        calls = []
+        s3_batch.process_object(fake_s3, _echo_invoke(calls), "in", "data.jsonl")
+        s3_batch.process_object(fake_s3, _echo_invoke(calls), "in", "data.jsonl")
+        assert len(calls) == 1
+
+    def test_changed_object_starts_over(self, fake_s3):
+        """Test that a checkpoint for an older version of the object is ignored."""
+        fake_s3.store.put("in", "data.jsonl", _jsonl(3))
+        calls = []
+        s3_batch.process_object(fake_s3, _echo_invoke(calls), "in", "data.jsonl")
+        fake_s3.store.put("in", "data.jsonl", _jsonl(4))
+        summary = s3_batch.process_object(fake_s3, _echo_invoke(calls), "in", "data.jsonl")
+        assert summary["rows"] == 4
+
+    def test_large_output_uses_multipart_upload(self, fake_s3, monkeypatch):
+        """Test that output past the threshold is sent as a multipart upload."""
+        monkeypatch.setattr(s3_batch, "MB", 64 * 1024)
+        monkeypatch.setenv("S3_BATCH_ROWS", "1")
+        fake_s3.store.put("in", "big.jsonl", _jsonl(24))
+        row = b"z" * (256 * 1024) + b"\n"
+
+        def build(content_type):
+            return lambda payload: row
+
+        s3_batch.process_object(fake_s3, build, "in", "big.jsonl", workers=4)
+        assert fake_s3.store.multipart == [("output/big.jsonl.out/part-00000", 2)]
+        assert fake_s3.store.get("in", "output/big.jsonl.out/part-00000") == row * 24
+
+
+class TestHandlerIntegration:
+    """Test suite for S3 events in the Lambda handler."""
+
+    @pytest.fixture
+    def s3_event(self):
+        return {"Records": [{
+            "eventSource": "aws:s3", "eventName": "ObjectCreated:Put",
+            "s3": {"bucket": {"name": "in"}, "object": {"key": "data.jsonl"}},
+        }]}
+
+    def test_handler_processes_uploaded_object(self, mock_client, fake_s3, s3_event):
+        """Test that the handler streams the object through the endpoint."""
+        fake_s3.store.put("in", "data.jsonl", _jsonl(3))
+        mock_client.invoke_endpoint.return_value = {"Body": io.BytesIO(b'{"y": 1}\n{"y": 2}\n{"y": 3}\n')}
+        mock_client.factory.side_effect = lambda service, **kwargs: fake_s3 if service == "s3" else mock_client
+        response = lambda_function.lambda_handler(s3_event, None)
+        assert response["statusCode"] == 200
+        assert mock_client.invoke_endpoint.call_args.kwargs["ContentType"] == "application/jsonlines"
+        assert len(_output_rows(fake_s3.store, "data.jsonl")) == 3
+
+    def test_output_objects_are_ignored(self, mock_client, fake_s3, s3_event):
+        """Test that results written under the output prefix do not retrigger processing."""
+        s3_event["Records"][0]["s3"]["object"]["key"] = "output/data.jsonl.out/part-00000"
+        mock_client.factory.side_effect = lambda service, **kwargs: fake_s3 if service == "s3" else mock_client
+        response = lambda_function.lambda_handler(s3_event, None)
+        assert response["statusCode"] == 200
+        mock_client.invoke_endpoint.assert_not_called()
+
+    def test_failures_make_lambda_retry(self, mock_client, fake_s3, s3_event):
+        """Test that a failed object raises so the async invocation is retried."""
+        fake_s3.store.put("in", "data.jsonl", _jsonl(3))
+        mock_client.invoke_endpoint.side_effect = RuntimeError("endpoint down")
+        mock_client.factory.side_effect = lambda service, **kwargs: fake_s3 if service == "s3" else mock_client
+        with pytest.raises(s3_batch.ProcessingIncomplete):
+            lambda_function.lambda_handler(s3_event, None)
@@ -0,0 +1,124 @@
+"""Unit tests for the local SageMaker runtime stub used by the load test."""
+
+import http.client
+import json
+import random
+
+import pytest
+from botocore.config import Config
+
+import lambda_function
+from sagemaker_stub import Simulation, TokenBucket, parse_latency, start_server
+
+
+@pytest.fixture
+def stub():
+    """Start a stub server and stop it after the test."""
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_server(Simulation(**kwargs))
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(make_client, url):
+    return make_client("sagemaker-runtime", endpoint_url=url, config=Config(retries={"total_max_attempts": 1}))
+
+
+class TestLatency:
+    """Test suite for latency distribution specs."""
+
+    def test_fixed(self):
+        """Test that a fixed spec always returns the same delay in seconds."""
+        assert parse_latency("fixed:20")(random.Random(0)) == 0.02
+
+    def test_distributions_are_seeded(self):
+        """Test that every distribution samples reproducibly and in range."""
+        for spec in ("uniform:10,50", "normal:30,5", "lognormal:20,0.5", "exp:25"):
+            sample = parse_latency(spec)
+            first = [sample(random.Random(1)) for _ in range(5)]
+            assert first == [sample(random.Random(1)) for _ in range(5)]
+            assert all(s >= 0 for s in first)
+        assert all(0.01 <= parse_latency("uniform:10,50")(random.Random(i)) <= 0.05 for i in range(20))
+
+    def test_unknown_distribution(self):
+        """Test that unknown specs are rejected."""
+        with pytest.raises(ValueError):
+            parse_latency("pareto:1")
+
+
+class TestTokenBucket:
+    """Test suite for the throttling token bucket."""
+
+    def test_refills_at_rate(self):
+        """Test that the bucket allows its burst, then refills over time."""
+        now = [0.0]
+        bucket = TokenBucket(2, clock=lambda: now[0])
+        assert bucket.try_acquire() and bucket.try_acquire()
+        assert not bucket.try_acquire()
+        now[0] += 0.5
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+
+class TestWireProtocol:
+    """Test suite for the stub against real botocore clients."""
+
+    def test_invoke_endpoint_echoes(self, stub, make_client):
+        """Test that InvokeEndpoint round-trips through signing and HTTP."""
+        _, url = stub()
+        response = _client(make_client, url).invoke_endpoint(
+            EndpointName="ep", Body=b'{"x": 1}', ContentType="application/json", Accept="text/csv"
+        )
+        assert response["Body"].read() == b'{"x": 1}'
+        assert response["ContentType"] == "text/csv"
+        assert response["InvokedProductionVariant"] == "AllTraffic"
+
+    def test_response_stream(self, stub, make_client):
+        """Test that the response stream arrives as eventstream PayloadParts."""
+        _, url = stub(response=b"0123456789", stream_parts=3)
+        response = _client(make_client, url).invoke_endpoint_with_response_stream(EndpointName="ep", Body=b"{}")
+        parts = [event["PayloadPart"]["Bytes"] for event in response["Body"]]
+        assert parts == [b"0123", b"4567", b"89"]
+
+    def test_model_errors(self, stub, make_client):
+        """Test that simulated failures surface as ModelError."""
+        _, url = stub(error_rate=1.0)
+        client = _client(make_client, url)
+        with pytest.raises(client.exceptions.ModelError):
+            client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+
+    def test_throttling(self, stub, make_client):
+        """Test that requests over the rate limit get ThrottlingException."""
+        server, url = stub(throttle_rps=1)
+        client = _client(make_client, url)
+        client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        with pytest.raises(client.exceptions.ClientError) as raised:
+            client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        assert raised.value.response["Error"]["Code"] == "ThrottlingException"
+        assert server.simulation.counts["throttled"] == 1
+
+    def test_unsigned_requests_rejected(self, stub):
+        """Test that requests without SigV4 signatures get 403."""
+        _, url = stub()
+        conn = http.client.HTTPConnection(url[len("http://"):], timeout=5)
+        conn.request("POST", "/endpoints/ep/invocations", body=b"{}")
+        response = conn.getresponse()
+        assert response.status == 403
+        assert response.getheader("x-amzn-ErrorType") == "MissingAuthenticationTokenException"
+        conn.close()
+
+    def test_handler_against_stub(self, stub, lambda_env, monkeypatch):
+        """Test that the real handler reaches the stub through its endpoint URL."""
+        _, url = stub()
+        monkeypatch.setenv("SAGEMAKER_RUNTIME_ENDPOINT_URL", url)
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDTEST")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+        response = lambda_function.lambda_handler({"body": json.dumps({"x": 1})}, None)
+        assert response == {"statusCode": 200, "body": '{"x": 1}'}
@@ -0,0 +1,182 @@
+"""Unit tests for cached SigV4 signing."""
+
+import datetime
+import types
+
+import botocore.auth
+import pytest
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+
+import lambda_function
+import signing
+from signing import CachedSigV4Auth
+from tests.conftest import FakeRawResponse
+
+
+class FixedDatetime(datetime.datetime):
+    now_value = datetime.datetime(2026, 10, 18, 12, 0, 0)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now_value
+
+
+@pytest.fixture(autouse=True)
+def fixed_clock(monkeypatch):
+    """Freeze the signing timestamp so both signers see the same one."""
+    monkeypatch.setattr(botocore.auth, "datetime", types.SimpleNamespace(datetime=FixedDatetime))
+    signing.reset_signing_cache()
+    yield FixedDatetime
+    FixedDatetime.now_value = datetime.datetime(2026, 10, 18, 12, 0, 0)
+    signing.reset_signing_cache()
+
+
+def _request(url="https://runtime.sagemaker.us-east-2.amazonaws.com/endpoints/my-endpoint/invocations",
+             headers=None, body=b'{"features": [1, 2, 3]}', params=None):
+    headers = headers if headers is not None else {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "User-Agent": "Boto3/1.39.3",
+    }
+    return AWSRequest(method="POST", url=url, headers=headers, data=body, params=params or {})
+
+
+def _sign(cls, request, credentials=None):
+    credentials = credentials or Credentials("AKIDTEST", "secret", "session-token")
+    cls(credentials, "sagemaker", "us-east-2").add_auth(request)
+    return dict(request.headers.items())
+
+
+class TestSignatures:
+    """Test suite for signatures matching SigV4Auth exactly."""
+
+    @pytest.mark.parametrize("kwargs", [
+        {},
+        {"headers": {"Content-Type": "application/x-npy", "X-Amzn-SageMaker-Custom-Attributes": "a  b   c"}},
+        {"headers": {"Host": "runtime.sagemaker.us-east-2.amazonaws.com", "Content-Type": "text/csv"}},
+        {"url": "https://runtime.sagemaker.us-east-2.amazonaws.com/endpoints/my endpoint/./invocations"},
+        {"url": "http://localhost:8080/endpoints/ep/invocations", "body": b"1,2,3"},
+        {"params": {"b": "2", "a": "1 1"}},
+        {"body": b""},
+    ])
+    def test_matches_sigv4(self, kwargs):
+        """Test that Authorization and the other signed headers are identical."""
+        assert _sign(CachedSigV4Auth, _request(**kwargs)) == _sign(botocore.auth.SigV4Auth, _request(**kwargs))
+
+    def test_without_session_token(self):
+        """Test that static credentials sign identically."""
+        credentials = Credentials("AKIDTEST", "secret")
+        assert _sign(CachedSigV4Auth, _request(), credentials) == _sign(botocore.auth.SigV4Auth, _request(), credentials)
+
+    def test_repeated_header_takes_the_regular_path(self):
+        """Test that header names repeated in another case still sign like SigV4Auth."""
+        def request():
+            r = _request()
+            r.headers.add_header("accept", "text/csv")
+            return r
+
+        assert signing.header_layout(tuple(request().headers.keys())) is None
+        assert _sign(CachedSigV4Auth, request()) == _sign(botocore.auth.SigV4Auth, request())
+
+    def test_resigning_a_retry(self):
+        """Test that re-signing the same request replaces the old signature."""
+        request = _request()
+        first = _sign(CachedSigV4Auth, request)
+        FixedDatetime.now_value = datetime.datetime(2026, 10, 18, 12, 0, 5)
+        second = _sign(CachedSigV4Auth, request)
+        assert first["Authorization"] != second["Authorization"]
+        assert second == _sign(botocore.auth.SigV4Auth, _request())
+
+
+class TestCaches:
+    """Test suite for the signing key and layout caches."""
+
+    @pytest.fixture
+    def derivations(self, monkeypatch):
+        calls = []
+        derive = signing.derive_signing_key
+
+        def counting(*args):
+            calls.append(args[1:])
+            return derive(*args)
+
+        monkeypatch.setattr(signing, "derive_signing_key", counting)
+        return calls
+
+    def test_key_derived_once_per_day(self, derivations):
+        """Test that the key chain is only recomputed when the date changes."""
+        for _ in range(3):
+            _sign(CachedSigV4Auth, _request())
+        assert derivations == [("20261018", "us-east-2", "sagemaker")]
+
+        FixedDatetime.now_value = datetime.datetime(2026, 10, 19, 0, 0, 1)
+        _sign(CachedSigV4Auth, _request())
+        assert derivations[-1] == ("20261019", "us-east-2", "sagemaker")
+
+    def test_keys_are_per_credential(self, derivations):
+        """Test that rotated credentials get their own key."""
+        _sign(CachedSigV4Auth, _request(), Credentials("AKID1", "secret-1"))
+        _sign(CachedSigV4Auth, _request(), Credentials("AKID2", "secret-2"))
+        assert len(derivations) == 2
+
+    def test_bounded(self, monkeypatch):
+        """Test that the oldest keys are evicted first."""
+        monkeypatch.setattr(signing, "MAX_SIGNING_KEYS", 2)
+        for secret in ("s1", "s2", "s3"):
+            signing.signing_key(secret, "20261018", "us-east-2", "sagemaker")
+        assert [key[0] for key in signing._signing_keys] == ["s2", "s3"]
+
+    def test_header_layout(self):
+        """Test that header names are sorted, lower-cased and filtered once."""
+        ordered, signed = signing.header_layout(("X-Amz-Date", "Content-Type", "User-Agent", "host"))
+        assert signed == "content-type;host;x-amz-date"
+        assert ordered[0] == ("content-type", "Content-Type")
+
+
+class TestClientIntegration:
+    """Test suite for selecting the cached signer on clients."""
+
+    def test_invoke_endpoint_uses_cached_signer(self, make_client, monkeypatch):
+        """Test that InvokeEndpoint is signed by CachedSigV4Auth with a valid-looking header."""
+        signers = []
+        add_auth = CachedSigV4Auth.add_auth
+
+        def spy(self, request):
+            signers.append(type(self))
+            return add_auth(self, request)
+
+        monkeypatch.setattr(CachedSigV4Auth, "add_auth", spy)
+        sent = []
+
+        def respond(request):
+            sent.append(request)
+            return botocore.awsrequest.AWSResponse(request.url, 200, {}, FakeRawResponse(b"{}"))
+
+        client = signing.enable_signing_cache(make_client("sagemaker-runtime", respond=respond))
+        client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        assert signers == [CachedSigV4Auth]
+        assert sent[0].headers["Authorization"].startswith(b"AWS4-HMAC-SHA256 Credential=AKIDTEST/20261018/")
+
+    @pytest.mark.parametrize("signature_version, context", [
+        ("v4-query", {}),
+        ("v4a", {}),
+        ("bearer", {}),
+        ("v4", {"unsigned_payload": True}),
+    ])
+    def test_other_signers_are_kept(self, signature_version, context):
+        """Test that only plain v4 signing is replaced."""
+        assert signing._choose_cached_signer(signature_version=signature_version, context=context) is None
+
+    def test_handler_enables_the_cache(self, mock_client):
+        """Test that the handler registers the signer choice on its client."""
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        unique_ids = [call.kwargs.get("unique_id") for call in mock_client.meta.events.register.call_args_list]
+        assert "cached-sigv4-signer" in unique_ids
+
+    def test_disabled(self, mock_client, monkeypatch):
+        """Test that SIGNING_CACHE_ENABLED=false leaves the client's signer alone."""
+        monkeypatch.setenv("SIGNING_CACHE_ENABLED", "false")
+        lambda_function.lambda_handler({"body": "{}"}, None)
+        unique_ids = [call.kwargs.get("unique_id") for call in mock_client.meta.events.register.call_args_list]
+        assert "cached-sigv4-signer" not in unique_ids
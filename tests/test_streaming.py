@@ -0,0 +1,150 @@
+"""Unit tests for streaming inference via invoke_endpoint_with_response_stream."""
+
+import http.client
+import json
+import threading
+
+import botocore.session
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import EventStreamError
+
+import lambda_function
+import streaming
+from sagemaker_stub import encode_message, payload_part
+
+
+class _ChunkedRaw:
+    """Raw body that hands out one encoded frame at a time."""
+
+    def __init__(self, frames):
+        self._frames = list(frames)
+
+    def stream(self, **kwargs):
+        while self._frames:
+            yield self._frames.pop(0)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stream_client():
+    """Real sagemaker-runtime client answering with a canned event stream."""
+    session = botocore.session.get_session()
+    client = session.create_client(
+        "sagemaker-runtime",
+        region_name="us-east-2",
+        aws_access_key_id="AKIDTEST",
+        aws_secret_access_key="secret",
+    )
+    frames = []
+
+    def respond(request, **kwargs):
+        headers = {"Content-Type": "application/vnd.amazon.eventstream"}
+        return AWSResponse(request.url, 200, headers, _ChunkedRaw(frames))
+
+    client.meta.events.register("before-send", respond)
+    client.frames = frames
+    return client
+
+
+class TestIterPayloadParts:
+    """Test suite for incremental event stream decoding."""
+
+    def test_yields_eachpayload_part(self, stream_client):
+        """Test that every PayloadPart is yielded in order."""
+        stream_client.frames.extend(payload_part(b) for b in (b"Hel", b"lo", b" world"))
+        parts = list(streaming.iter_payload_parts(stream_client, "ep", b"{}"))
+        assert parts == [b"Hel", b"lo", b" world"]
+
+    def test_frame_split_across_reads_is_reassembled(self, stream_client):
+        """Test that frames split across socket reads are buffered and decoded."""
+        data = payload_part(b"abc") + payload_part(b"def")
+        stream_client.frames.extend([data[:7], data[7:30], data[30:]])
+        assert list(streaming.iter_payload_parts(stream_client, "ep", b"{}")) == [b"abc", b"def"]
+
+    def test_model_stream_error_is_raised(self, stream_client):
+        """Test that a ModelStreamError event surfaces as EventStreamError."""
+        stream_client.frames.append(payload_part(b"partial"))
+        stream_client.frames.append(encode_message(
+            {":message-type": "exception", ":exception-type": "ModelStreamError",
+             ":content-type": "application/json"},
+            b'{"Message": "model crashed", "ErrorCode": "StreamBroken"}',
+        ))
+        parts = streaming.iter_payload_parts(stream_client, "ep", b"{}")
+        assert next(parts) == b"partial"
+        with pytest.raises(EventStreamError):
+            next(parts)
+
+
+class TestHandlerStreamingMode:
+    """Test suite for the handler's stream flag."""
+
+    def test_stream_event_collects_parts(self, mock_client):
+        """Test that stream mode joins all parts into the response body."""
+        mock_client.invoke_endpoint_with_response_stream.return_value = {
+            "Body": [{"PayloadPart": {"Bytes": b'{"tok'}}, {"PayloadPart": {"Bytes": b'ens": 2}'}}],
+        }
+        response = lambda_function.lambda_handler({"body": "{}", "stream": True}, None)
+        assert response == {"statusCode": 200, "body": '{"tokens": 2}'}
+        mock_client.invoke_endpoint.assert_not_called()
+
+    def test_stream_is_routed_with_variant_and_accept(self, mock_client, monkeypatch):
+        """Test that streamed calls go to the routed target and request the accept type."""
+        monkeypatch.setenv("SAGEMAKER_ROUTES", json.dumps([{"endpoint": "model-a", "variant": "blue"}]))
+        mock_client.invoke_endpoint_with_response_stream.return_value = {"Body": []}
+        lambda_function.lambda_handler({"body": "{}", "stream": True, "accept": "text/plain"}, None)
+        kwargs = mock_client.invoke_endpoint_with_response_stream.call_args.kwargs
+        assert (kwargs["EndpointName"], kwargs["TargetVariant"], kwargs["Accept"]) == ("model-a", "blue", "text/plain")
+
+    def test_stream_is_shed_by_overload_protection(self, mock_client, monkeypatch):
+        """Test that streamed calls cannot get past the overload protector."""
+        monkeypatch.setenv("SAGEMAKER_OVERLOAD_PROTECTION", "true")
+        monkeypatch.setenv("SAGEMAKER_CONCURRENCY_LIMIT", "0")
+        response = lambda_function.lambda_handler({"body": "{}", "stream": True}, None)
+        assert response["statusCode"] == 503
+        mock_client.invoke_endpoint_with_response_stream.assert_not_called()
+
+    def test_stream_results_are_cached(self, mock_client, monkeypatch):
+        """Test that a repeated streamed payload is answered from the result cache."""
+        monkeypatch.setenv("INFERENCE_CACHE_ENABLED", "true")
+        mock_client.invoke_endpoint_with_response_stream.return_value = {"Body": [{"PayloadPart": {"Bytes": b"1"}}]}
+        for _ in range(2):
+            assert lambda_function.lambda_handler({"body": "{}", "stream": True}, None)["body"] == "1"
+        assert mock_client.invoke_endpoint_with_response_stream.call_count == 1
+
+
+class TestChunkedServer:
+    """Test suite for the chunked HTTP streaming server."""
+
+    def test_chunks_are_forwarded(self):
+        """Test that each streamed part is written as an HTTP chunk."""
+        first_sent = threading.Event()
+        release = threading.Event()
+
+        def stream(payload, content_type):
+            yield b"first:" + payload
+            first_sent.set()
+            release.wait(5)
+            yield b"second"
+
+        server = streaming.make_server("127.0.0.1", 0, stream=stream)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+            conn.request("POST", "/", body=b"x", headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            assert response.status == 200
+            assert response.getheader("Transfer-Encoding") == "chunked"
+            # The first chunk is readable before the model produces the second
+            assert first_sent.wait(5)
+            assert response.read1() == b"first:x"
+            release.set()
+            assert response.read() == b"second"
+            conn.close()
+        finally:
+            release.set()
+            server.shutdown()
+            server.server_close()
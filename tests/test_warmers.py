@@ -0,0 +1,134 @@
+"""Unit tests for scheduled warmer pings."""
+
+import json
+import socket
+
+import boto3
+import pytest
+
+import lambda_function
+import warmers
+from sagemaker_stub import Simulation, start_server
+
+SCHEDULED_EVENT = {
+    "version": "0",
+    "id": "53dc4d37-cffa-4f76-80c9-8b7d4a4d2eaa",
+    "detail-type": "Scheduled Event",
+    "source": "aws.events",
+    "account": "123456789012",
+    "time": "2026-10-18T12:00:00Z",
+    "region": "us-east-2",
+    "resources": ["arn:aws:events:us-east-2:123456789012:rule/trigger-lambda-rule"],
+    "detail": {},
+}
+
+
+@pytest.fixture
+def stub_url():
+    server, url = start_server(Simulation())
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def _pool(client):
+    url = client.meta.endpoint_url
+    return client._endpoint.http_session._get_connection_manager(url).connection_from_url(url)
+
+
+class TestDetection:
+    """Test suite for recognising warmer events."""
+
+    def test_scheduled_event(self, monkeypatch):
+        """Test that a bare EventBridge scheduled event is a warmer."""
+        monkeypatch.delenv("WARMER_ENABLED", raising=False)
+        assert warmers.is_warmer(SCHEDULED_EVENT)
+
+    def test_explicit_ping(self):
+        """Test that {"warmer": true} is a warmer."""
+        assert warmers.is_warmer({"warmer": True})
+
+    def test_events_with_a_body_are_requests(self):
+        """Test that scheduled events carrying a body still run inference."""
+        assert not warmers.is_warmer(dict(SCHEDULED_EVENT, body='{"x": 1}'))
+        assert not warmers.is_warmer({"body": "{}"})
+        assert not warmers.is_warmer({"Records": [{"eventSource": "aws:sqs"}]})
+        assert not warmers.is_warmer({"source": "aws.s3", "detail-type": "Object Created", "detail": {}})
+
+    def test_disabled(self, monkeypatch):
+        """Test that WARMER_ENABLED=false turns detection off."""
+        monkeypatch.setenv("WARMER_ENABLED", "false")
+        assert not warmers.is_warmer(SCHEDULED_EVENT)
+
+
+class TestPrefill:
+    """Test suite for pre-connecting the client's urllib3 pool."""
+
+    def test_connections_are_reused(self, make_client, stub_url):
+        """Test that the next request reuses a pre-opened connection."""
+        client = make_client("sagemaker-runtime", endpoint_url=stub_url)
+        assert warmers.prefill_pool(client, 2) == 2
+        pool = _pool(client)
+        assert pool.num_connections == 2
+
+        client.invoke_endpoint(EndpointName="ep", Body=b"{}")
+        assert pool.num_connections == 2
+
+    def test_capped_at_pool_size(self, make_client, stub_url):
+        """Test that no more connections are opened than the pool keeps."""
+        from botocore.config import Config
+
+        client = make_client("sagemaker-runtime", endpoint_url=stub_url, config=Config(max_pool_connections=3))
+        assert warmers.prefill_pool(client, 10) == 3
+
+    def test_connect_failure_is_not_fatal(self, make_client):
+        """Test that an unreachable endpoint only loses the pre-connect."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        client = make_client("sagemaker-runtime", endpoint_url=f"http://127.0.0.1:{port}")
+        response = warmers.warm(client)
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"])["connections"] == 0
+
+
+class TestCredentials:
+    """Test suite for credential resolution."""
+
+    def test_resolves_default_session_credentials(self, monkeypatch):
+        """Test that the default session's credentials are loaded and frozen."""
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDWARM")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+        monkeypatch.setattr(boto3, "DEFAULT_SESSION", None)
+        boto3.setup_default_session()
+        assert warmers.resolve_credentials().access_key == "AKIDWARM"
+
+    def test_no_session(self, monkeypatch):
+        """Test that a missing default session is reported, not raised."""
+        monkeypatch.setattr(boto3, "DEFAULT_SESSION", None)
+        assert warmers.resolve_credentials() is None
+
+
+class TestHandlerIntegration:
+    """Test suite for warmers in the Lambda handler."""
+
+    def test_scheduled_event_skips_inference(self, mock_client):
+        """Test that a scheduled ping does not call the endpoint."""
+        response = lambda_function.lambda_handler(SCHEDULED_EVENT, None)
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"])["warmed"] is True
+        mock_client.invoke_endpoint.assert_not_called()
+
+    def test_handler_prefills_real_client(self, lambda_env, monkeypatch, stub_url):
+        """Test that the handler's cached client keeps the warmed connections."""
+        monkeypatch.setenv("SAGEMAKER_RUNTIME_ENDPOINT_URL", stub_url)
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDTEST")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+        monkeypatch.setenv("WARMER_CONNECTIONS", "3")
+        response = lambda_function.lambda_handler(SCHEDULED_EVENT, None)
+        assert json.loads(response["body"]) == {"warmed": True, "credentials": True, "connections": 3}
+
+        client = lambda_function.get_client("sagemaker-runtime", endpoint_url=stub_url)
+        assert _pool(client).num_connections == 3
+        assert lambda_function.lambda_handler({"body": "{}"}, None)["statusCode"] == 200
+        assert _pool(client).num_connections == 3
@@ -0,0 +1,50 @@
+# Optional handler features. Each one left null stays disabled: the Lambda
+# gets neither its environment variable nor the IAM permissions it needs.
+
+variable "async_endpoint_name" {
+  description = "SageMaker endpoint for asynchronous inference (SAGEMAKER_ASYNC_ENDPOINT_NAME)"
+  type        = string
+  default     = null
+}
+
+variable "async_bucket" {
+  description = "Bucket async payloads are staged to and results read from (SAGEMAKER_ASYNC_INPUT_BUCKET)"
+  type        = string
+  default     = null
+}
+
+variable "async_input_prefix" {
+  description = "Key prefix async payloads are staged under (SAGEMAKER_ASYNC_INPUT_PREFIX)"
+  type        = string
+  default     = "async-inputs/"
+}
+
+variable "async_output_prefix" {
+  description = "Key prefix of the async endpoint's S3OutputPath in async_bucket"
+  type        = string
+  default     = "async-outputs/"
+}
+
+variable "batch_bucket" {
+  description = "Bucket whose uploads are run through S3 batch inference; output and checkpoints go to the same bucket"
+  type        = string
+  default     = null
+}
+
+variable "batch_output_prefix" {
+  description = "Key prefix batch output and checkpoints are written under (S3_OUTPUT_PREFIX)"
+  type        = string
+  default     = "output/"
+}
+
+variable "inference_cache_table" {
+  description = "DynamoDB table backing the shared inference result cache (INFERENCE_CACHE_TABLE)"
+  type        = string
+  default     = null
+}
+
+variable "idempotency_table" {
+  description = "DynamoDB table holding idempotency records (IDEMPOTENCY_TABLE)"
+  type        = string
+  default     = null
+}